@@ -0,0 +1,55 @@
+// Decoder for the compact "window" topic published by the Raspberry Pi
+// (hardware-code/raspberry-pi/codec.py). Layout v1, little-endian:
+// version u8, flags u8, seq u32, windowStart u32, windowEnd u32,
+// samples u16, posture u8, then 6 float16 sensor fields (NaN = missing)
+const WINDOW_FORMAT_VERSION = 1
+const WINDOW_FIELDS = ['heartRate', 'motion', 'humid', 'temp', 'sound', 'brightness']
+const FLAG_LIGHT = 0x01
+const POSTURES = [
+  'Unknown',
+  'Supine (Face Up)',
+  'Prone (Face Down)',
+  'Left Side',
+  'Right Side',
+  'No person detected',
+]
+
+function readFloat16(buf, offset) {
+  const h = buf.readUInt16LE(offset)
+  const sign = h & 0x8000 ? -1 : 1
+  const exp = (h >> 10) & 0x1f
+  const frac = h & 0x3ff
+  if (exp === 0) {
+    return sign * Math.pow(2, -14) * (frac / 1024)
+  }
+  if (exp === 0x1f) {
+    return frac ? NaN : sign * Infinity
+  }
+  return sign * Math.pow(2, exp - 15) * (1 + frac / 1024)
+}
+
+function decodeWindow(buf) {
+  if (buf.length < 17 + 2 * WINDOW_FIELDS.length || buf[0] !== WINDOW_FORMAT_VERSION) {
+    throw new Error('unsupported window format')
+  }
+  const window = {
+    seq: buf.readUInt32LE(2),
+    windowStart: buf.readUInt32LE(6),
+    windowEnd: buf.readUInt32LE(10),
+    samples: buf.readUInt16LE(14),
+  }
+
+  const sensor = { ...window, light: (buf[1] & FLAG_LIGHT) !== 0, missing: [] }
+  WINDOW_FIELDS.forEach((field, i) => {
+    const value = readFloat16(buf, 17 + 2 * i)
+    sensor[field] = Number.isNaN(value) ? null : value
+    if (sensor[field] === null) {
+      sensor.missing.push(field)
+    }
+  })
+
+  const posture = { ...window, posture: POSTURES[buf[16]] || 'Unknown' }
+  return { sensor, posture }
+}
+
+module.exports = { decodeWindow, POSTURES }
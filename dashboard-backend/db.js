@@ -1,6 +1,7 @@
 require('dotenv').config()
 const { InfluxDB, Point } = require('@influxdata/influxdb-client')
 const { computeSleepQuality } = require('./utils')
+const { POSTURES } = require('./codec')
 
 // config
 const token = process.env.INFLUX_TOKEN
@@ -19,29 +20,111 @@ const writeApi = influxDB.getWriteApi(org, bucket)
 const queryApi = influxDB.getQueryApi(org)
 
 // UTILS
+// Windowed payloads from the device send null for fields without samples
+const isPresent = (value) => value !== null && value !== undefined
+
+const stampWindow = (point, data) => {
+  if (isPresent(data.windowEnd)) {
+    point.timestamp(new Date(data.windowEnd * 1000))
+  }
+  return point
+}
+
 const createPoint = async (type, data) => {
   let point
 
   switch (type) {
     case 'sensor':
-      const quality = computeSleepQuality(data)
-
-      point = new Point('sensor')
-        .tag('deviceId', deviceId)
-        .intField('heartRate', data.heartRate)
-        .booleanField('motion', data.motion)
-        .intField('humid', data.humid)
-        .intField('temp', data.temp)
-        .intField('sound', data.sound)
-        .intField('brightness', data.brightness)
-        .booleanField('light', data.light)
-        .intField('dataPoint', quality)
+      point = stampWindow(new Point('sensor').tag('deviceId', deviceId), data)
+      ;['heartRate', 'humid', 'temp', 'sound', 'brightness'].forEach((field) => {
+        if (isPresent(data[field])) {
+          point.intField(field, data[field])
+        }
+      })
+      if (isPresent(data.motion)) {
+        point.booleanField('motion', data.motion)
+      }
+      point.booleanField('light', data.light)
+      if (!data.missing || data.missing.length === 0) {
+        point.intField('dataPoint', computeSleepQuality(data))
+      }
+      // Microphone features for the window (dB re 1 mV)
+      if (data.acoustics) {
+        point
+          .floatField('soundLeq', data.acoustics.leq)
+          .floatField('soundLmax', data.acoustics.lmax)
+          .floatField('soundZcr', data.acoustics.zcr)
+          .intField('noiseEvents', data.acoustics.noiseEvents)
+          .intField('snoreEvents', data.acoustics.snoreEvents)
+      }
       break
 
     case 'posture':
-      point = new Point('posture')
-        .tag('deviceId', deviceId)
+      point = stampWindow(new Point('posture').tag('deviceId', deviceId), data)
         .stringField('posture', data.posture)
+      if (isPresent(data.turns)) {
+        point.intField('turns', data.turns)
+      }
+      // Dwell seconds per posture code
+      ;(data.dwell || []).forEach((seconds, code) => {
+        if (seconds > 0) {
+          point.floatField(`dwell:${POSTURES[code] || POSTURES[0]}`, seconds)
+        }
+      })
+      // Run-length log, [code, start, end] in seconds from windowStart:
+      // one posture_run point per run (runs are split at window boundaries)
+      ;(data.transitions || []).forEach(([code, start, end]) => {
+        writeApi.writePoint(
+          new Point('posture_run')
+            .tag('deviceId', deviceId)
+            .tag('posture', POSTURES[code] || POSTURES[0])
+            .timestamp(new Date((data.windowStart + start) * 1000))
+            .floatField('duration', end - start)
+        )
+      })
+      break
+
+    // On-device rollups, stored as sensor_1m / sensor_5m measurements
+    case 'sensor/1m':
+    case 'sensor/5m':
+      point = stampWindow(
+        new Point(type.replace('/', '_'))
+          .tag('deviceId', deviceId)
+          .intField('windows', data.windows),
+        data
+      )
+      Object.entries(data.fields || {}).forEach(([field, stats]) => {
+        point.intField(`${field}Count`, stats.count)
+        if (stats.count > 0) {
+          point
+            .floatField(field, stats.mean)
+            .floatField(`${field}Min`, stats.min)
+            .floatField(`${field}Max`, stats.max)
+        }
+      })
+      Object.entries(data.posture || {}).forEach(([posture, count]) => {
+        point.intField(`posture:${posture}`, count)
+      })
+      Object.entries(data.dwell || {}).forEach(([posture, seconds]) => {
+        point.floatField(`dwell:${posture}`, seconds)
+      })
+      if (isPresent(data.turns)) {
+        point.intField('turns', data.turns)
+      }
+      break
+
+    // Noise bursts and snoring episodes detected on the device
+    case 'sound/event':
+      point = new Point('sound_event')
+        .tag('deviceId', deviceId)
+        .tag('type', data.type)
+        .timestamp(new Date(data.start * 1000))
+        .floatField('duration', data.end - data.start)
+      ;['leqDb', 'maxDb', 'peak', 'backgroundDb', 'period', 'strength', 'depthDb'].forEach((field) => {
+        if (isPresent(data[field])) {
+          point.floatField(field, data[field])
+        }
+      })
       break
 
     case 'setting':
@@ -1,6 +1,7 @@
 require('dotenv').config()
 const mqtt = require('mqtt')
 const { createPoint } = require('./db')
+const { decodeWindow } = require('./codec')
 
 console.log('⚙️ connecting to MQTT Broker')
 
@@ -23,19 +24,14 @@ mqttClient.on('connect', () => {
   console.log('✅ Connected to MQTT Broker')
 
   // Subscribe to topics you want to listen to
-  mqttClient.subscribe('sensor', (err) => {
-    if (!err) {
-      console.log(`Successfully subscribed to topic: sensor`)
-    } else {
-      console.error(`Subscription failed for topic sensor: ${err}`)
-    }
-  })
-  mqttClient.subscribe('posture', (err) => {
-    if (!err) {
-      console.log(`Successfully subscribed to topic: posture`)
-    } else {
-      console.error(`Subscription failed for topic posture: ${err}`)
-    }
+  ;['sensor', 'posture', 'window', 'sensor/1m', 'sensor/5m', 'sound/event'].forEach((topic) => {
+    mqttClient.subscribe(topic, (err) => {
+      if (!err) {
+        console.log(`Successfully subscribed to topic: ${topic}`)
+      } else {
+        console.error(`Subscription failed for topic ${topic}: ${err}`)
+      }
+    })
   })
 })
 
@@ -45,6 +41,19 @@ mqttClient.on('error', (err) => {
 
 // Handle Incoming MQTT Messages
 mqttClient.on('message', (topic, message) => {
+  // Binary window: one message carries both sensor and posture data
+  if (topic === 'window') {
+    try {
+      const { sensor, posture } = decodeWindow(message)
+      console.log(`Received ${topic} #${sensor.seq}: ${message.length} bytes`)
+      createPoint('sensor', sensor)
+      createPoint('posture', posture)
+    } catch (err) {
+      console.error(`Invalid window payload: ${err}`)
+    }
+    return
+  }
+
   const value = message.toString()
   console.log(`Received ${topic}: ${value}`)
 
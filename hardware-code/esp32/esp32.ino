@@ -13,6 +13,7 @@
 BLEServer* pServer = nullptr;
 BLECharacteristic* pCharacteristic = nullptr;
 bool deviceConnected = false;
+uint16_t connId = 0;
 
 // --- Define sensor ---
 #define HR_PIN 4
@@ -21,6 +22,25 @@ bool deviceConnected = false;
 
 // --- Define variable ---
 unsigned long lastSend = 0;
+unsigned long lastSample = 0;
+
+// --- BLE frame format ---
+// 1 = binary frames (parsed by raspberry-pi/ble_frame.py), 0 = legacy JSON
+#define USE_BINARY_FRAMES 1
+#define FRAME_VERSION 1
+#define SAMPLE_INTERVAL_MS 250      // one sample every 250 ms
+#define SEND_INTERVAL_MS 1000       // flush at least once per second
+#define MAX_SAMPLES_PER_FRAME 16
+#define FRAME_HEADER_SIZE 8         // version, count, seq (u16), millis (u32)
+#define FRAME_SAMPLE_SIZE 4         // dt ms (u16), heart rate (u8), flags (u8)
+#define FLAG_MOTION 0x01
+#define DEFAULT_ATT_MTU 23
+#define ATT_HEADER_SIZE 3           // a notification carries MTU - 3 bytes
+
+uint8_t frame[FRAME_HEADER_SIZE + MAX_SAMPLES_PER_FRAME * FRAME_SAMPLE_SIZE];
+uint8_t frameCount = 0;
+uint16_t frameSeq = 0;          // sequence number of the next sample
+unsigned long frameStart = 0;   // millis of the first sample in the frame
 
 // -- heart rate --
 int minHr = 40, maxHr = 150, maxHrInputValue = 4095;
@@ -41,7 +61,8 @@ float magPrev = 0.0, magCurr = 0.0;
 bool motionDetected = false;
 
 class MyServerCallbacks: public BLEServerCallbacks {
-  void onConnect(BLEServer* pServer) {
+  void onConnect(BLEServer* pServer, esp_ble_gatts_cb_param_t* param) {
+    connId = param->connect.conn_id;
     deviceConnected = true;
   };
 
@@ -52,6 +73,55 @@ class MyServerCallbacks: public BLEServerCallbacks {
   }
 };
 
+// --------------------- Binary frames --------------------- 
+// Samples that fit one notification. setMTU() only sets what the ESP32
+// accepts; the Pi starts the exchange, and until it does (or while
+// disconnected) the default MTU of 23 leaves 20 bytes: 3 samples.
+uint8_t maxSamplesPerFrame() {
+  uint16_t mtu = deviceConnected ? pServer->getPeerMTU(connId) : DEFAULT_ATT_MTU;
+  if (mtu < DEFAULT_ATT_MTU) {
+    mtu = DEFAULT_ATT_MTU;
+  }
+  int samples = (mtu - ATT_HEADER_SIZE - FRAME_HEADER_SIZE) / FRAME_SAMPLE_SIZE;
+  return samples < MAX_SAMPLES_PER_FRAME ? samples : MAX_SAMPLES_PER_FRAME;
+}
+
+void addSample(unsigned long now, int bpm, bool motion) {
+  if (frameCount == 0) {
+    frameStart = now;
+  }
+  uint8_t* p = frame + FRAME_HEADER_SIZE + frameCount * FRAME_SAMPLE_SIZE;
+  uint16_t dt = (uint16_t)(now - frameStart);
+  p[0] = dt & 0xFF;
+  p[1] = dt >> 8;
+  p[2] = (uint8_t)constrain(bpm, 0, 255);
+  p[3] = motion ? FLAG_MOTION : 0;
+  frameCount++;
+}
+
+void sendFrame() {
+  uint16_t firstSeq = frameSeq;
+  frame[0] = FRAME_VERSION;
+  frame[1] = frameCount;
+  frame[2] = firstSeq & 0xFF;
+  frame[3] = firstSeq >> 8;
+  frame[4] = frameStart & 0xFF;
+  frame[5] = (frameStart >> 8) & 0xFF;
+  frame[6] = (frameStart >> 16) & 0xFF;
+  frame[7] = (frameStart >> 24) & 0xFF;
+  size_t len = FRAME_HEADER_SIZE + frameCount * FRAME_SAMPLE_SIZE;
+
+  // Samples are numbered even while disconnected so the Pi sees the gap
+  frameSeq += frameCount;
+  frameCount = 0;
+
+  Serial.printf("Sent frame: seq=%u samples=%u bytes=%u\n", firstSeq, frame[1], len);
+  if (deviceConnected) {
+    pCharacteristic->setValue(frame, len);
+    pCharacteristic->notify();
+  }
+}
+
 void setup() {
   Serial.begin(115200);
 
@@ -83,6 +153,9 @@ void setup() {
   // --- Set up Bluetooth ---
   // Create BLE Device
   BLEDevice::init("ESP32S3_BLE");
+  // Accept an MTU big enough for a second of samples in one frame when the
+  // Pi asks for it (see maxSamplesPerFrame)
+  BLEDevice::setMTU(185);
 
   // Create BLE Server
   pServer = BLEDevice::createServer();
@@ -146,6 +219,18 @@ void loop() {
   prev_az = az_g;
 
   // --------------------- Send data via Bluetooth --------------------- 
+#if USE_BINARY_FRAMES
+  if (now - lastSample >= SAMPLE_INTERVAL_MS) {
+    lastSample = now;
+    addSample(now, hrBPM, motionDetected);
+    motionDetected = false;
+  }
+
+  if (frameCount > 0 && (frameCount >= maxSamplesPerFrame() || now - lastSend >= SEND_INTERVAL_MS)) {
+    lastSend = now;
+    sendFrame();
+  }
+#else
   if (now - lastSend >= 1000) {
     lastSend = now;
 
@@ -167,6 +252,7 @@ void loop() {
 
     motionDetected = false;
   }
+#endif
 
   delay(5);
 }
\ No newline at end of file
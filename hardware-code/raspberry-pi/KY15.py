@@ -1,45 +1,144 @@
 import time
+import threading
 from datetime import datetime
-import board
-import adafruit_dht
+import hal
+import metrics
+from acquisition import rate_from_env
 
-def get_dht_data():
-    dht = adafruit_dht.DHT11(board.D17)
-    try:
-        while True:
+# -----------------------------
+# DHT11 reader
+# -----------------------------
+# One long-lived driver polled by a background thread at the sensor's rated
+# rate. Callers get the last good reading without waiting on the sensor;
+# a failed read never replaces it with a made-up value.
+# The driver answers from its cache for 2 s after every attempt, failed
+# ones included, so neither reads nor retries can usefully come sooner.
+READ_INTERVAL = 2.1     # seconds between reads
+RETRY_INTERVAL = 2.1    # seconds before retrying a failed read
+MAX_READ_INTERVAL = 20  # seconds between reads while temperature and humidity are steady
+MAX_AGE = 30            # seconds before the last good reading counts as missing
+REINIT_AFTER = 10       # consecutive failures before the driver is recreated
+
+class DHTReader:
+    def __init__(self, pin="D17"):
+        self.pin = pin
+        self.temperature = None
+        self.humidity = None
+        self.updated = None        # monotonic time of the last good reading
+        self.reads = 0
+        self.errors = 0
+        self.consecutive_errors = 0
+        # The DHT11 reports whole degrees and percent, so it flickers by one.
+        # TEMP_/HUMID_MIN_INTERVAL and _MAX_INTERVAL override the ranges.
+        self.temperature_rate = rate_from_env("temp", READ_INTERVAL, MAX_READ_INTERVAL, 0.6, change=1.5)
+        self.humidity_rate = rate_from_env("humid", READ_INTERVAL, MAX_READ_INTERVAL, 1.5, change=4)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="dht-reader", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=3):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        dht = None
+        while not self._stop.is_set():
             try:
+                if dht is None:
+                    dht = hal.dht11(self.pin)
                 t = dht.temperature
                 h = dht.humidity
-                if t is not None and h is not None:
-                    ts = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                    print(f"[{ts}] Temp: {t:.1f} °C  Humidity: {h:.1f} %")
-                else:
-                    print("No data (retry)...")
-            except RuntimeError as e:
-                print("Read error:", e.args[0])
-            time.sleep(1)
+                if t is None or h is None:
+                    raise RuntimeError("no data")
+                with self._lock:
+                    self.temperature, self.humidity = t, h
+                    self.updated = time.monotonic()
+                    self.reads += 1
+                self.consecutive_errors = 0
+                # Read again as soon as either signal needs it
+                delay = min(self.temperature_rate.update(t), self.humidity_rate.update(h))
+            except Exception as e:
+                # Checksum and timing errors are routine for the DHT11; retry soon
+                self.errors += 1
+                self.consecutive_errors += 1
+                delay = RETRY_INTERVAL
+                if not isinstance(e, RuntimeError):
+                    print("DHT11 read error:", e)
+                if dht is not None and self.consecutive_errors % REINIT_AFTER == 0:
+                    print(f"DHT11 failed {self.consecutive_errors} times in a row, reinitializing")
+                    try:
+                        dht.exit()
+                    except Exception:
+                        pass
+                    dht = None
+            self._stop.wait(delay)
+        if dht is not None:
+            dht.exit()
+
+    def age(self):
+        """Seconds since the last good reading, or None if there is none."""
+        updated = self.updated
+        return time.monotonic() - updated if updated is not None else None
+
+    def get_reading(self):
+        """{"temperature", "humidity", "age", "reads", "errors"}; never blocks on the sensor."""
+        with self._lock:
+            temperature, humidity = self.temperature, self.humidity
+        return {"temperature": temperature, "humidity": humidity, "age": self.age(),
+                "reads": self.reads, "errors": self.errors}
+
+reader = DHTReader("D17")
+
+DHT_ERRORS = metrics.counter(
+    "sleepduck_dht_errors_total", "Failed DHT11 reads (retried)", fn=lambda: reader.errors)
+DHT_READ_INTERVAL = metrics.gauge(
+    "sleepduck_dht_read_interval_seconds", "Current DHT11 read interval",
+    fn=lambda: min(reader.temperature_rate.interval, reader.humidity_rate.interval))
+DHT_READING_AGE = metrics.gauge(
+    "sleepduck_dht_reading_age_seconds", "Age of the last good DHT11 reading", fn=reader.age)
+
+def _fresh(value):
+    age = reader.age()
+    return value if age is not None and age <= MAX_AGE else None
+
+def get_dht_data():
+    reader.start()
+    try:
+        while True:
+            time.sleep(READ_INTERVAL)
+            reading = reader.get_reading()
+            ts = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            if reading["age"] is not None:
+                print(f"[{ts}] Temp: {reading['temperature']:.1f} °C  Humidity: {reading['humidity']:.1f} % "
+                      f"(age {reading['age']:.1f} s, {reading['errors']} errors)")
+            else:
+                print("No data (retry)...")
     except KeyboardInterrupt:
         print("\nStopped by user.")
     finally:
-        dht.exit()
+        reader.stop()
 
+# Code for the send part: the latest good value, or None while there is
+# none (sent as missing rather than as 0)
 def send_temp():
-    try:
-        dht = adafruit_dht.DHT11(board.D17)
-        return dht.temperature
-    except:
-        return 0
-    finally:
-        dht.exit()
+    reader.start()
+    return _fresh(reader.temperature)
 
 def send_humidity():
-    try:
-        dht = adafruit_dht.DHT11(board.D17)
-        return dht.humidity
-    except:
-        return 0
-    finally:
-        dht.exit()
+    reader.start()
+    return _fresh(reader.humidity)
+
+def stop_reader():
+    reader.stop()
 
 if __name__ == "__main__":
-    get_dht_data()
\ No newline at end of file
+    get_dht_data()
@@ -1,32 +1,32 @@
-from adafruit_ads1x15.ads1115 import ADS1115
-from adafruit_ads1x15.analog_in import AnalogIn
-import board, busio, time
+import time
 from datetime import datetime
+from adc_bus import get_bus
 
-i2c = busio.I2C(board.SCL, board.SDA)
-ads = ADS1115(i2c, address=0x48)
-ads.gain = 1  
+# A0 on the shared ADS1115 (the bus opens the chip on first read). Light
+# changes slowly; sendData polls it every 1-5 s (BRIGHTNESS_MIN_INTERVAL,
+# BRIGHTNESS_MAX_INTERVAL), one conversion per reading.
+chan = get_bus(0x48).add_channel("brightness", 0, gain=1)
 
 def read_brightness():
-    chan = AnalogIn(ads, 0)
     print("Press Ctrl+C to stop")
     try:
         while True:
             ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            brightness = (32767 - chan.value)*100/32767
-            inverted_voltage = ads.gain * 4.096 - chan.voltage
-            print(f"[{ts}] light:{brightness:.2f}% V:{chan.voltage:.3f}")
+            value = chan.value
+            brightness = (32767 - value)*100/32767
+            print(f"[{ts}] light:{brightness:.2f}% V:{chan.to_voltage(value):.3f}")
             time.sleep(1)
     except KeyboardInterrupt:
         pass
 
 def send_brightness():
     try:
-        chan = AnalogIn(ads, 0)
         brightness = (32767 - chan.value)*100/32767
         return brightness
-    except:
-        return 0
+    except Exception as e:
+        # Reported as a missing sample, not as a 0% reading
+        print("Brightness read error:", e)
+        return None
 
 if __name__ == "__main__":
     read_brightness()
\ No newline at end of file
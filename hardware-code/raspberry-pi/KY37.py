@@ -1,82 +1,234 @@
-from adafruit_ads1x15.ads1115 import ADS1115
-from adafruit_ads1x15.analog_in import AnalogIn
-import board, busio, time
+import json
+import math
+import os
+import sys
+import time
+import threading
 from datetime import datetime
+import metrics
+from adc_bus import get_bus
+from adc_sampler import ContinuousSampler
+from acoustics import AcousticAnalyzer
 
-i2c = busio.I2C(board.SCL, board.SDA)
-ads = ADS1115(i2c, address=0x48)
-ads.data_rate = 860
-ads.gain = 2/3  # try 8 or 16 if needed
+# The microphone is sampled continuously at the ADS1115's top rate into a
+# ring buffer; readers compute levels over whatever window they need.
+SAMPLE_RATE = 860        # samples per second
+BUFFER_SECONDS = 60      # history kept in the ring buffer
+SOUND_WINDOW_MS = 1000   # shortest window behind a send_sound() value
 
-chan = AnalogIn(ads, 1)  # A1
+# A1 on the shared ADS1115, converting continuously. Nothing touches the
+# chip until the sampler starts, so importing this module doesn't block.
+# While it runs, reads of other channels (brightness) wait for the end of a
+# batch, and the acoustic frames skip the gap they leave.
+chan = get_bus(0x48).add_channel("sound", 1, gain=2/3, data_rate=SAMPLE_RATE,
+                                 continuous=True)  # try gain 8 or 16 if needed
+sampler = None
+_init_lock = threading.Lock()
 
-def calibrating_sound(samples=100):
-    """Find the quiet DC offset voltage by averaging readings."""
+# Features and noise/snore events, computed once per send_sound() call
+# over the samples that arrived since the previous call
+analyzer = AcousticAnalyzer(SAMPLE_RATE)
+_analyzed_until = None
+_analyzer_lock = threading.Lock()
+
+# Where the DC offset is kept between runs
+CALIBRATION_PATH = os.getenv(
+    "SOUND_CALIBRATION_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "sound_calibration.json"))
+
+def get_sampler():
+    """Start the background sampler on first use."""
+    global sampler
+    with _init_lock:
+        if sampler is None:
+            sampler = ContinuousSampler(lambda: chan.voltage, SAMPLE_RATE, BUFFER_SECONDS,
+                                        on_batch=_track_dc_offset, between_batches=chan.bus.run_deferred,
+                                        name="sound-sampler")
+            sampler.start()
+            chan.bus.defer_single_shot = True
+    return sampler
+
+def stop_sampler():
+    if sampler is not None:
+        chan.bus.defer_single_shot = False
+        sampler.stop()
+        chan.bus.run_deferred()   # reads that queued up meanwhile
+
+def calibrating_sound(seconds=1.0):
+    """Find the quiet DC offset voltage by averaging buffered samples."""
+    sampler = get_sampler()
     print("Calibrating... please be quiet.")
-    total = 0
-    for _ in range(samples):
-        total += chan.voltage
-        time.sleep(0.01)
+    time.sleep(seconds)
+    offset = sampler.mean(seconds)
+    if offset is None:
+        raise RuntimeError("no samples from the microphone")
     print("Calibration complete.")
-    return total / samples
+    return offset
+
+# -----------------------------
+# DC offset tracking
+# -----------------------------
+class DCOffsetTracker:
+    """The microphone's DC offset, saved to disk and followed all night.
+
+    Every sampler batch reports its mean, peak-to-peak voltage and length.
+    Quiet windows (peak-to-peak below `quiet_threshold`) pull the offset
+    towards their mean with an exponential filter whose time constant is
+    `time_constant` seconds of quiet signal, so the offset follows thermal
+    drift of the ADC over minutes but a sound that slips into a "quiet"
+    window barely moves it. Quietness is judged on the spread inside the
+    window, not the distance from the current offset, so a stale saved
+    offset still converges.
+    """
+
+    def __init__(self, path, time_constant=600, quiet_threshold=0.03, save_interval=600):
+        self.path = path
+        self.time_constant = time_constant       # seconds
+        self.quiet_threshold = quiet_threshold   # volts peak-to-peak
+        self.save_interval = save_interval       # seconds between saves
+        self.offset = None
+        self.quiet_windows = 0
+        self._saved_at = 0.0
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Use the offset saved by a previous run; False if there is none."""
+        try:
+            with open(self.path) as f:
+                offset = float(json.load(f)["dcOffset"])
+        except (OSError, ValueError, KeyError, TypeError):
+            return False
+        if not 0.0 < offset < 5.0:
+            return False
+        self.offset = offset
+        self._saved_at = time.monotonic()
+        return True
+
+    def set(self, offset):
+        with self._lock:
+            self.offset = offset
+        self.save()
 
-dc_offset = calibrating_sound()
+    def save(self):
+        # Write a temporary file and rename it so a crash never leaves a
+        # half-written calibration behind
+        self._saved_at = time.monotonic()
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump({"dcOffset": self.offset, "updated": time.time()}, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print("Saving sound calibration failed:", e)
+
+    def observe(self, mean, peak_to_peak, seconds):
+        """Feed one read window of `seconds`; quiet windows update the offset."""
+        if self.offset is None or peak_to_peak >= self.quiet_threshold:
+            return
+        # Weight by the window's length, so the filter doesn't depend on the batch size
+        alpha = 1.0 - math.exp(-seconds / self.time_constant)
+        with self._lock:
+            self.offset += alpha * (mean - self.offset)
+            self.quiet_windows += 1
+        if time.monotonic() - self._saved_at >= self.save_interval:
+            self.save()
+
+dc_tracker = DCOffsetTracker(CALIBRATION_PATH)
+
+def _track_dc_offset(values):
+    # Each sampler batch (~50 ms) is one tracking window
+    dc_tracker.observe(float(values.mean()), float(values.max() - values.min()), len(values) / SAMPLE_RATE)
+
+DC_OFFSET_VOLTS = metrics.gauge(
+    "sleepduck_sound_dc_offset_volts", "Tracked DC offset of the KY-037 microphone",
+    fn=lambda: dc_tracker.offset)
+SOUND_SAMPLE_RATE = metrics.gauge(
+    "sleepduck_sound_sample_rate_hz", "Microphone samples stored per second",
+    fn=lambda: sampler.achieved_rate() if sampler is not None else 0.0)
+SOUND_SAMPLER_OVERRUNS = metrics.counter(
+    "sleepduck_sound_sampler_overruns_total", "Times the microphone sampler fell a batch behind",
+    fn=lambda: sampler.overruns if sampler is not None else 0)
+SOUND_SAMPLER_GAPS = metrics.counter(
+    "sleepduck_sound_sampler_gaps_total", "Pauses in microphone sampling while the ADC read another channel",
+    fn=lambda: sampler.gaps if sampler is not None else 0)
+SOUND_SAMPLES_DROPPED = metrics.counter(
+    "sleepduck_sound_samples_dropped_total", "Microphone samples left out of acoustic frames by a gap",
+    fn=lambda: analyzer.dropped_samples)
+
+def get_dc_offset():
+    """The tracked offset; loaded from disk, or calibrated on the very first run."""
+    if dc_tracker.offset is None:
+        with _init_lock:
+            loaded = dc_tracker.offset is not None or dc_tracker.load()
+        if not loaded:
+            dc_tracker.set(calibrating_sound())
+    return dc_tracker.offset
 
 def read_sound_amplitude(offset, window_ms=50):
-    """Read the peak amplitude over a short window."""
-    t_end = time.monotonic() + (window_ms / 1000)
-    max_deviation = 0
-    
-    while time.monotonic() < t_end:
-        # Calculate how far the current reading is from the center/offset
-        deviation = abs(chan.voltage - offset)
-        if deviation > max_deviation:
-            max_deviation = deviation
-            
-    # This value represents the sound "volume"
-    return max_deviation
+    """Peak deviation from offset over the last window_ms of samples."""
+    return get_sampler().peak(window_ms / 1000, offset, default=0.0)
+
+def analyze_sound():
+    """Run the acoustic feature stage over the samples since the last call."""
+    global _analyzed_until
+    sampler = get_sampler()
+    offset = get_dc_offset()
+    with _analyzer_lock:
+        if _analyzed_until is None:
+            _analyzed_until = time.monotonic() - SOUND_WINDOW_MS / 1000
+        times, values = sampler.buffer.since(_analyzed_until)
+        if len(times):
+            # since() is inclusive; the next call starts after the last sample
+            _analyzed_until = times[-1] + 1e-9
+            analyzer.process(times, values, offset)
+
+def pop_acoustics():
+    """(feature summary, events) since the previous call, for one window."""
+    with _analyzer_lock:
+        return analyzer.pop_window()
 
 def read_sound():
     print("Press Ctrl+C to stop")
     try:
-        samples = []
-        last_print = time.monotonic()
-
         while True:
-            amplitude = read_sound_amplitude(dc_offset)
-            sound_level_percent = (amplitude / 0.01) * 10 # scale (1 V = 1000%)
-
-            if sound_level_percent > 100:
-                sound_level_percent = 100
-
-            samples.append(sound_level_percent)
-
-            # Once per second, calculate average
-            if time.monotonic() - last_print >= 1.0:
-                if samples:
-                    avg_level = sum(samples) / len(samples)
-                    print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] "
-                          f"Average Sound Level: {avg_level:.2f}% "
-                          f"(from {len(samples)} samples)")
-                # Reset for next second
-                samples.clear()
-                last_print = time.monotonic()
-
-            time.sleep(0.01)  # sample ~100 Hz
+            time.sleep(1.0)
+            offset = get_dc_offset()
+            amplitude = read_sound_amplitude(offset, 1000)
+            sound_level_percent = min((amplitude / 0.01) * 10, 100) # scale (1 V = 1000%)
+            rms = sampler.rms(1.0, offset, default=0.0)
+            print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] "
+                  f"Peak Sound Level: {sound_level_percent:.2f}% RMS: {rms * 1000:.1f} mV "
+                  f"(from {len(sampler.window(1.0))} samples, offset {offset:.4f} V)")
     except KeyboardInterrupt:
         pass
+    finally:
+        stop_sampler()
 
 if __name__ == "__main__":
-    print(f"DC Offset (Center Voltage): {dc_offset:.4f} V\n")
+    # python KY37.py --calibrate  re-measures the offset (room must be quiet)
+    if "--calibrate" in sys.argv:
+        dc_tracker.set(calibrating_sound())
+    print(f"DC Offset (Center Voltage): {get_dc_offset():.4f} V\n")
     print("Reading sound levels. Press Ctrl+C to stop.")
     read_sound()
 
 # Code for the send part
+_last_send = None   # monotonic time of the previous send_sound()
 
 def send_sound():
+    """Peak level since the previous call (at least SOUND_WINDOW_MS), so a
+    longer polling interval doesn't miss the loud moments in between."""
+    global _last_send
     try:
-        amplitude = read_sound_amplitude(dc_offset)
+        now = time.monotonic()
+        window_ms = SOUND_WINDOW_MS if _last_send is None else \
+            min(max(SOUND_WINDOW_MS, (now - _last_send) * 1000), BUFFER_SECONDS * 1000)
+        _last_send = now
+        analyze_sound()
+        amplitude = read_sound_amplitude(get_dc_offset(), window_ms)
         sound_level_percent = (amplitude / 0.01) * 10 # scale (1 V = 1000%)
         return sound_level_percent
-    except:
-        return 0
\ No newline at end of file
+    except Exception as e:
+        # Reported as a missing sample, not as silence
+        print("Sound read error:", e)
+        return None
\ No newline at end of file
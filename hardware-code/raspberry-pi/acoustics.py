@@ -0,0 +1,249 @@
+import math
+import time
+from collections import deque
+import numpy as np
+
+# -----------------------------
+# Acoustic features
+# -----------------------------
+# Microphone samples are cut into short frames and every frame's features
+# are computed in one vectorized pass per batch:
+#   level   RMS in dB re 1 mV (the KY-037 isn't calibrated to pressure)
+#   peak    largest deviation from the DC offset, volts
+#   zcr     zero crossings per second
+#   bands   energy per frequency band (FFT, Hann window)
+# Levels are averaged as energy, so a window's Leq is the equivalent
+# continuous level over all of its frames.
+REFERENCE_VOLTS = 0.001
+FRAME_SECONDS = 0.125    # "fast" time weighting
+BANDS = (("0-60", 0, 60), ("60-150", 60, 150), ("150-300", 150, 300), ("300+", 300, None))
+SNORE_BAND = (30, 300)   # Hz, where snoring puts most of its energy
+MAX_GAP_PERIODS = 4      # sample spacing (in sample periods) that counts as a gap
+
+def to_db(mean_square):
+    return 10 * math.log10(max(mean_square, 1e-12) / REFERENCE_VOLTS ** 2)
+
+def frame_features(frames, rate):
+    """Features of each row of `frames` (DC offset already removed).
+
+    Returns per-frame arrays: mean square, peak, zero-crossing rate and
+    band energies (frames x len(BANDS)), plus snore-band energy.
+    """
+    frame_len = frames.shape[1]
+    mean_square = np.einsum("ij,ij->i", frames, frames) / frame_len
+    peak = np.abs(frames).max(axis=1)
+    crossings = np.count_nonzero(np.diff(np.signbit(frames), axis=1), axis=1)
+    zcr = crossings * rate / frame_len
+
+    spectrum = np.abs(np.fft.rfft(frames * np.hanning(frame_len), axis=1)) ** 2
+    freqs = np.fft.rfftfreq(frame_len, 1.0 / rate)
+    bands = np.stack([
+        spectrum[:, (freqs >= low) & (freqs < (high if high is not None else np.inf))].sum(axis=1)
+        for _, low, high in BANDS
+    ], axis=1)
+    snore = spectrum[:, (freqs >= SNORE_BAND[0]) & (freqs < SNORE_BAND[1])].sum(axis=1)
+    return mean_square, peak, zcr, bands, snore
+
+# -----------------------------
+# Analyzer
+# -----------------------------
+class AcousticAnalyzer:
+    """Turns batches of microphone samples into per-window features and
+    noise/snore events.
+
+    Noise event: consecutive frames at least `noise_margin_db` above the
+    background level (median of the last `background_seconds`) and above
+    `noise_floor_db`.
+    Snore event: the snore-band envelope over the last `snore_seconds`
+    repeats with a breathing-like period (`snore_period` seconds) with an
+    autocorrelation of at least `snore_correlation`.
+    """
+
+    def __init__(self, rate, noise_margin_db=15, noise_floor_db=30, background_seconds=60,
+                 snore_seconds=30, snore_period=(2.0, 6.0), snore_correlation=0.5,
+                 snore_depth_db=6, max_event_seconds=300):
+        self.rate = rate
+        self.frame_len = max(8, int(rate * FRAME_SECONDS))
+        self.frame_seconds = self.frame_len / rate
+        self.max_step = MAX_GAP_PERIODS / rate
+        self.dropped_samples = 0   # cut off by a gap before they filled a frame
+        self.noise_margin_db = noise_margin_db
+        self.noise_floor_db = noise_floor_db
+        self.snore_correlation = snore_correlation
+        self.snore_depth_db = snore_depth_db
+        self.max_event_seconds = max_event_seconds
+        self.snore_lags = (int(snore_period[0] / self.frame_seconds),
+                           int(snore_period[1] / self.frame_seconds))
+        self.background = deque(maxlen=int(background_seconds / self.frame_seconds))
+        self.envelope = deque(maxlen=int(snore_seconds / self.frame_seconds))
+        self.envelope_times = deque(maxlen=self.envelope.maxlen)
+        # Samples short of a full frame, carried over to the next call
+        self._pending = np.empty(0, dtype=np.float32)
+        self._pending_times = np.empty(0, dtype=np.float64)
+        self._noise = None   # open noise event
+        self._snore = None   # open snore episode
+        self.events = []
+        self.reset_window()
+
+    def reset_window(self):
+        self.frames = 0
+        self.energy = 0.0
+        self.max_level = None
+        self.peak = 0.0
+        self.zcr_sum = 0.0
+        self.band_energy = np.zeros(len(BANDS))
+        self.noise_events = 0
+        self.snore_events = 0
+
+    def process(self, times, values, offset):
+        """Add samples (monotonic times, volts) since the previous call.
+
+        Frames never span a gap in the timestamps (the sampler paused, e.g.
+        while the ADC served another channel); the samples before a gap
+        that don't fill a frame are dropped.
+        """
+        values = np.concatenate((self._pending, values))
+        times = np.concatenate((self._pending_times, times))
+        # Gap-free runs of samples, each cut into whole frames
+        starts = np.concatenate(([0], np.flatnonzero(np.diff(times) > self.max_step) + 1))
+        ends = np.append(starts[1:], len(values))
+        counts = (ends - starts) // self.frame_len
+        frame_starts = np.concatenate([start + np.arange(count) * self.frame_len
+                                       for start, count in zip(starts, counts)])
+        self.dropped_samples += int((ends[:-1] - starts[:-1] - counts[:-1] * self.frame_len).sum())
+        used = starts[-1] + counts[-1] * self.frame_len
+        self._pending, self._pending_times = values[used:], times[used:]
+        n_frames = len(frame_starts)
+        if n_frames == 0:
+            return
+
+        index = frame_starts[:, np.newaxis] + np.arange(self.frame_len)
+        frames = values[index].astype(np.float64) - offset
+        mean_square, peak, zcr, bands, snore = frame_features(frames, self.rate)
+        frame_times = times[frame_starts]
+
+        # Window totals
+        self.frames += n_frames
+        self.energy += float(mean_square.sum())
+        levels = 10 * np.log10(np.maximum(mean_square, 1e-12) / REFERENCE_VOLTS ** 2)
+        loudest = float(levels.max())
+        self.max_level = loudest if self.max_level is None else max(self.max_level, loudest)
+        self.peak = max(self.peak, float(peak.max()))
+        self.zcr_sum += float(zcr.sum())
+        self.band_energy += bands.sum(axis=0)
+
+        self._detect_noise(frame_times, levels, peak)
+        self.envelope.extend(10 * np.log10(np.maximum(snore, 1e-12)))
+        self.envelope_times.extend(frame_times)
+        self._detect_snore()
+
+    # --- Events ---
+    def _emit(self, event):
+        # Event times are kept on the monotonic clock until they're emitted
+        wall_offset = time.time() - time.monotonic()
+        event["start"] = round(event["start"] + wall_offset, 3)
+        event["end"] = round(event["end"] + wall_offset, 3)
+        self.events.append(event)
+
+    def _detect_noise(self, frame_times, levels, peaks):
+        background = float(np.median(self.background)) if self.background else None
+        threshold = max(self.noise_floor_db, (background or 0) + self.noise_margin_db)
+        loud = levels >= threshold
+        for t, level, peak, is_loud in zip(frame_times, levels, peaks, loud):
+            if is_loud:
+                if self._noise is None:
+                    self._noise = {"start": t, "energy": 0.0, "frames": 0,
+                                   "maxDb": level, "peak": peak, "backgroundDb": background}
+                noise = self._noise
+                noise["end"] = t + self.frame_seconds
+                noise["energy"] += 10 ** (level / 10)
+                noise["frames"] += 1
+                noise["maxDb"] = max(noise["maxDb"], level)
+                noise["peak"] = max(noise["peak"], peak)
+            if self._noise is not None and (not is_loud or
+                                            t - self._noise["start"] >= self.max_event_seconds):
+                self._close_noise()
+        # Loud frames don't raise the background they're compared against
+        self.background.extend(levels[~loud])
+
+    def _close_noise(self):
+        noise = self._noise
+        self._noise = None
+        self._emit({
+            "type": "noise",
+            "start": noise["start"],
+            "end": noise["end"],
+            "leqDb": round(10 * math.log10(noise["energy"] / noise["frames"]), 1),
+            "maxDb": round(float(noise["maxDb"]), 1),
+            "peak": round(float(noise["peak"]), 4),
+            "backgroundDb": None if noise["backgroundDb"] is None else round(noise["backgroundDb"], 1),
+        })
+        self.noise_events += 1
+
+    def _detect_snore(self):
+        if len(self.envelope) < self.envelope.maxlen:
+            return
+        envelope = np.asarray(self.envelope)
+        depth = float(np.percentile(envelope, 90) - np.percentile(envelope, 10))
+        centered = envelope - envelope.mean()
+        denominator = float(np.dot(centered, centered))
+        period = strength = None
+        if denominator > 0 and depth >= self.snore_depth_db:
+            low, high = self.snore_lags
+            correlation = np.array([np.dot(centered[:-lag], centered[lag:]) for lag in range(low, high + 1)])
+            correlation /= denominator
+            best = int(correlation.argmax())
+            if correlation[best] >= self.snore_correlation:
+                period = (low + best) * self.frame_seconds
+                strength = float(correlation[best])
+
+        now = self.envelope_times[-1] + self.frame_seconds
+        if period is not None:
+            if self._snore is None:
+                self._snore = {"start": self.envelope_times[0], "periods": [], "strengths": []}
+            self._snore["end"] = now
+            self._snore["periods"].append(period)
+            self._snore["strengths"].append(strength)
+            self._snore["depth"] = depth
+            if now - self._snore["start"] >= self.max_event_seconds:
+                self._close_snore()
+        elif self._snore is not None:
+            self._close_snore()
+
+    def _close_snore(self):
+        snore = self._snore
+        self._snore = None
+        self._emit({
+            "type": "snore",
+            "start": snore["start"],
+            "end": snore["end"],
+            "period": round(float(np.median(snore["periods"])), 2),
+            "strength": round(float(np.mean(snore["strengths"])), 2),
+            "depthDb": round(snore["depth"], 1),
+        })
+        self.snore_events += 1
+
+    # --- Window output ---
+    def pop_window(self):
+        """Features since the previous call and the events emitted meanwhile.
+
+        Returns (summary or None if no full frame was analyzed, events).
+        """
+        events, self.events = self.events, []
+        if self.frames == 0:
+            self.reset_window()
+            return None, events
+        total_band = float(self.band_energy.sum())
+        summary = {
+            "leq": round(to_db(self.energy / self.frames), 1),
+            "lmax": round(self.max_level, 1),
+            "peak": round(self.peak, 4),
+            "zcr": round(self.zcr_sum / self.frames, 1),
+            "bands": {name: round(float(e) / total_band, 3) if total_band > 0 else 0.0
+                      for (name, _, _), e in zip(BANDS, self.band_energy)},
+            "noiseEvents": self.noise_events,
+            "snoreEvents": self.snore_events,
+            "seconds": round(self.frames * self.frame_seconds, 2),
+        }
+        self.reset_window()
+        return summary, events
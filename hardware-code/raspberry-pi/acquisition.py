@@ -0,0 +1,150 @@
+import asyncio
+import os
+import statistics
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import metrics
+
+SENSOR_READ_SECONDS = metrics.histogram(
+    "sleepduck_sensor_read_seconds", "Blocking read latency per Pi sensor")
+SENSOR_READ_ERRORS = metrics.counter(
+    "sleepduck_sensor_read_errors_total", "Failed Pi sensor reads")
+SENSOR_INTERVAL = metrics.gauge(
+    "sleepduck_sensor_interval_seconds", "Current polling interval per Pi sensor")
+
+# -----------------------------
+# Latest-sample buffer
+# -----------------------------
+# Each sensor task writes its newest reading here; readers never block on
+# hardware, they just take whatever sample is currently stored.
+# name -> (value, monotonic timestamp)
+_latest = {}
+_latest_lock = threading.Lock()
+_listeners = []
+
+def add_listener(fn):
+    """Call fn(name, value) for every published sample (e.g. the recorder)."""
+    _listeners.append(fn)
+
+def publish_sample(name, value):
+    with _latest_lock:
+        _latest[name] = (value, time.monotonic())
+    for fn in _listeners:
+        fn(name, value)
+
+def get_sample(name, default=None):
+    """Return the latest value for a sensor, or default if none yet."""
+    with _latest_lock:
+        sample = _latest.get(name)
+    return sample[0] if sample is not None else default
+
+def get_sample_age(name):
+    """Seconds since the sensor last published, or None if never."""
+    with _latest_lock:
+        sample = _latest.get(name)
+    return time.monotonic() - sample[1] if sample is not None else None
+
+# -----------------------------
+# Adaptive sampling rate
+# -----------------------------
+class AdaptiveRate:
+    """Stretches a polling interval while the signal is steady.
+
+    Once the last `history` readings have a standard deviation below
+    `threshold`, each reading multiplies the interval by `step`, up to
+    `max_interval`; a noisier signal shrinks it again. A reading more than
+    `change` away from the recent mean snaps straight back to
+    `min_interval`. Non-numeric readings (None, strings) also reset it.
+    """
+
+    def __init__(self, min_interval, max_interval, threshold, change=None, history=8, step=1.5):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.threshold = threshold
+        self.change = change if change is not None else 3 * threshold
+        self.step = step
+        self.interval = min_interval
+        self._values = deque(maxlen=history)
+
+    def update(self, value):
+        """Add a reading; returns the interval until the next one."""
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            self._values.clear()
+            self.interval = self.min_interval
+            return self.interval
+        if self._values and abs(value - sum(self._values) / len(self._values)) > self.change:
+            self._values.clear()
+            self.interval = self.min_interval
+        self._values.append(value)
+        if len(self._values) == self._values.maxlen:
+            if statistics.pstdev(self._values) < self.threshold:
+                self.interval = min(self.interval * self.step, self.max_interval)
+            else:
+                self.interval = max(self.interval / self.step, self.min_interval)
+        return self.interval
+
+def rate_from_env(name, min_interval, max_interval, threshold, change=None):
+    """AdaptiveRate for sensor `name`; <NAME>_MIN_INTERVAL and <NAME>_MAX_INTERVAL
+    (seconds) override the interval range. Equal values give a fixed rate."""
+    prefix = name.upper()
+    min_interval = float(os.getenv(f"{prefix}_MIN_INTERVAL", min_interval))
+    max_interval = max(min_interval, float(os.getenv(f"{prefix}_MAX_INTERVAL", max_interval)))
+    return AdaptiveRate(min_interval, max_interval, threshold, change)
+
+# -----------------------------
+# Sensor polling tasks
+# -----------------------------
+class Sensor:
+    """A blocking read function polled at its own interval.
+
+    Sensors that share a bus or a pin pass the same `lock` so their reads
+    never overlap in the executor. With an `adaptive` AdaptiveRate the
+    interval follows the signal instead of staying at `interval`.
+    """
+
+    def __init__(self, name, read_fn, interval, lock=None, adaptive=None):
+        self.name = name
+        self.read_fn = read_fn
+        self.interval = interval
+        self.lock = lock
+        self.adaptive = adaptive
+
+    def next_interval(self, value):
+        if self.adaptive is not None:
+            self.interval = self.adaptive.update(value)
+        return self.interval
+
+    def read(self):
+        if self.lock is None:
+            with SENSOR_READ_SECONDS.time(sensor=self.name):
+                return self.read_fn()
+        with self.lock:
+            # Time the read itself, not the wait for the shared lock
+            with SENSOR_READ_SECONDS.time(sensor=self.name):
+                return self.read_fn()
+
+async def poll_sensor(sensor, executor, stop_event):
+    """Read `sensor` in the executor every `sensor.interval` seconds (or as
+    its AdaptiveRate decides)."""
+    loop = asyncio.get_running_loop()
+    while not stop_event.is_set():
+        started = time.monotonic()
+        try:
+            value = await loop.run_in_executor(executor, sensor.read)
+            publish_sample(sensor.name, value)
+        except Exception as e:
+            SENSOR_READ_ERRORS.inc(sensor=sensor.name)
+            print(f"Sensor {sensor.name} read error:", e)
+            value = None
+        interval = sensor.next_interval(value)
+        SENSOR_INTERVAL.set(interval, sensor=sensor.name)
+        elapsed = time.monotonic() - started
+        await asyncio.sleep(max(0.0, interval - elapsed))
+
+def start_sensor_tasks(sensors, stop_event):
+    """Start one polling task per sensor, each with its own worker thread."""
+    executor = ThreadPoolExecutor(max_workers=len(sensors), thread_name_prefix="sensor")
+    tasks = [asyncio.create_task(poll_sensor(s, executor, stop_event)) for s in sensors]
+    return tasks, executor
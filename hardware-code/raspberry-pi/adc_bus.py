@@ -0,0 +1,149 @@
+import threading
+from collections import deque
+import hal
+import metrics
+
+# -----------------------------
+# Shared ADS1115 bus
+# -----------------------------
+# One owner per chip. KY18 (A0, brightness) and KY37 (A1, sound) register
+# their channel with its own gain, data rate and mode; every conversion goes
+# through the bus lock, and the device only rewrites its config register
+# when the next read needs a different channel or setting.
+# While a continuous sampler owns the chip (defer_single_shot), a
+# single-shot read of another channel would cut into its sample stream at a
+# random point. Such reads wait in a queue instead, and the sampler serves
+# them between two batches (run_deferred), where it can mark the gap.
+PGA_RANGE = {2/3: 6.144, 1: 4.096, 2: 2.048, 4: 1.024, 8: 0.512, 16: 0.256}   # volts full scale
+DEFERRED_TIMEOUT = 0.5   # seconds a deferred read waits for the sampler before reading directly
+
+class BusChannel:
+    """One ADS1115 input with fixed settings; `value` and `voltage` read it."""
+
+    def __init__(self, bus, name, index, gain, data_rate, continuous):
+        self.bus = bus
+        self.name = name
+        self.index = index
+        self.gain = gain
+        self.data_rate = data_rate
+        self.continuous = continuous
+
+    @property
+    def value(self):
+        return self.bus.read(self)
+
+    @property
+    def voltage(self):
+        return self.to_voltage(self.bus.read(self))
+
+    def to_voltage(self, value):
+        return value * PGA_RANGE[self.gain] / 32767
+
+class _DeferredRead:
+    __slots__ = ("channel", "done", "value", "error")
+
+    def __init__(self, channel):
+        self.channel = channel
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+class ADCBus:
+    def __init__(self, address=0x48):
+        self.address = address
+        self.device = None   # opened on the first read
+        self.channels = {}
+        self.reads = 0
+        self.deferred_reads = 0
+        self.defer_single_shot = False   # set while a continuous sampler calls run_deferred()
+        self._deferred = deque()
+        self._lock = threading.Lock()
+
+    def add_channel(self, name, index, gain=1, data_rate=128, continuous=False):
+        if gain not in PGA_RANGE:
+            raise ValueError(f"unsupported ADS1115 gain {gain}")
+        with self._lock:
+            existing = self.channels.get(name)
+            if existing is not None:
+                return existing
+            channel = self.channels[name] = BusChannel(self, name, index, gain, data_rate, continuous)
+        return channel
+
+    def read(self, channel):
+        """Raw conversion for `channel`, serialized with every other channel."""
+        if self.defer_single_shot and not channel.continuous:
+            return self._read_deferred(channel)
+        return self._convert(channel)
+
+    def _convert(self, channel):
+        with self._lock:
+            if self.device is None:
+                self.device = hal.ads1115(self.address)
+            value = self.device.read(channel.index, channel.gain, channel.data_rate, channel.continuous)
+            self.reads += 1
+        return value
+
+    def _read_deferred(self, channel):
+        request = _DeferredRead(channel)
+        with self._lock:
+            self._deferred.append(request)
+        if not request.done.wait(DEFERRED_TIMEOUT):
+            with self._lock:
+                try:
+                    self._deferred.remove(request)
+                    taken = False
+                except ValueError:
+                    taken = True   # the sampler is serving it right now
+            if not taken:
+                # The sampler stopped or stalled; don't wait on it any longer
+                return self._convert(channel)
+            request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.value
+
+    def run_deferred(self):
+        """Serve the queued single-shot reads; returns how many there were.
+
+        Called by the continuous sampler between batches.
+        """
+        served = 0
+        while True:
+            with self._lock:
+                if not self._deferred:
+                    return served
+                request = self._deferred.popleft()
+            try:
+                request.value = self._convert(request.channel)
+            except Exception as e:
+                request.error = e
+            self.deferred_reads += 1
+            served += 1
+            request.done.set()
+
+    def config_writes(self):
+        return self.device.config_writes if self.device is not None else 0
+
+    def stats(self):
+        return {"reads": self.reads, "deferredReads": self.deferred_reads, "configWrites": self.config_writes()}
+
+_buses = {}
+_buses_lock = threading.Lock()
+
+def get_bus(address=0x48):
+    """The shared bus for the chip at `address`."""
+    with _buses_lock:
+        bus = _buses.get(address)
+        if bus is None:
+            bus = _buses[address] = ADCBus(address)
+    return bus
+
+ADC_READS = metrics.counter(
+    "sleepduck_adc_reads_total", "ADS1115 conversions read over I2C",
+    fn=lambda: sum(bus.reads for bus in _buses.values()))
+ADC_DEFERRED_READS = metrics.counter(
+    "sleepduck_adc_deferred_reads_total", "Single-shot reads served between continuous sampler batches",
+    fn=lambda: sum(bus.deferred_reads for bus in _buses.values()))
+ADC_CONFIG_WRITES = metrics.counter(
+    "sleepduck_adc_config_writes_total", "ADS1115 config register writes (channel/gain/mode switches)",
+    fn=lambda: sum(bus.config_writes() for bus in _buses.values()))
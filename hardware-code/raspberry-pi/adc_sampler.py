@@ -0,0 +1,198 @@
+import threading
+import time
+import numpy as np
+
+# -----------------------------
+# Ring buffer
+# -----------------------------
+class RingBuffer:
+    """Preallocated (timestamp, value) samples; the oldest are overwritten.
+
+    One writer, any number of readers. Reads return copies in
+    chronological order.
+    """
+
+    def __init__(self, capacity, dtype=np.float32):
+        self.capacity = capacity
+        self.values = np.zeros(capacity, dtype=dtype)
+        self.times = np.zeros(capacity, dtype=np.float64)
+        self.count = 0   # samples ever written
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def extend(self, times, values):
+        n = len(values)
+        if n > self.capacity:
+            times, values = times[-self.capacity:], values[-self.capacity:]
+            n = self.capacity
+        with self._lock:
+            start = self.count % self.capacity
+            first = min(n, self.capacity - start)
+            self.values[start:start + first] = values[:first]
+            self.times[start:start + first] = times[:first]
+            if first < n:
+                self.values[:n - first] = values[first:]
+                self.times[:n - first] = times[first:]
+            self.count += n
+
+    def _slice(self, begin, end):
+        """Copy logical samples [begin, end); call with the lock held."""
+        length = end - begin
+        b = begin % self.capacity
+        if b + length <= self.capacity:
+            return self.times[b:b + length].copy(), self.values[b:b + length].copy()
+        split = self.capacity - b
+        return (np.concatenate((self.times[b:], self.times[:length - split])),
+                np.concatenate((self.values[b:], self.values[:length - split])))
+
+    def latest(self, n):
+        """The newest n samples as (times, values)."""
+        with self._lock:
+            end = self.count
+            return self._slice(end - min(n, len(self)), end)
+
+    def since(self, cutoff):
+        """Samples with timestamp >= cutoff as (times, values).
+
+        Binary search over the ring, then one copy: O(log n + window).
+        """
+        with self._lock:
+            end = self.count
+            lo, hi = end - len(self), end
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if self.times[mid % self.capacity] < cutoff:
+                    lo = mid + 1
+                else:
+                    hi = mid
+            return self._slice(lo, end)
+
+# -----------------------------
+# Continuous sampler
+# -----------------------------
+class ContinuousSampler:
+    """Calls `read_fn` at `rate` Hz on a background thread into a RingBuffer
+    holding the last `seconds` of samples.
+
+    Samples are stored a batch at a time; `on_batch(values)` is called with
+    every batch (the array is reused, so copy it to keep it). Between
+    batches `between_batches()` may use the device for something else
+    (e.g. adc_bus.ADCBus.run_deferred); when it returns a true value the
+    pause is counted as a gap and sampling restarts without catching up,
+    so the gap shows in the timestamps instead of as a burst of reads.
+    """
+
+    def __init__(self, read_fn, rate, seconds=60, batch_size=None, on_batch=None, between_batches=None,
+                 name="adc-sampler"):
+        self.read_fn = read_fn
+        self.rate = rate
+        self.batch_size = batch_size or max(1, rate // 20)   # ~50 ms
+        self.on_batch = on_batch
+        self.between_batches = between_batches
+        self.name = name
+        self.buffer = RingBuffer(int(rate * seconds))
+        self.errors = 0
+        self.overruns = 0   # times the reader fell a whole batch behind
+        self.gaps = 0       # pauses for between_batches()
+        self.gap_seconds = 0.0
+        self._running = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._running.set()
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=1):
+        self._running.clear()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        period = 1.0 / self.rate
+        times = np.empty(self.batch_size, dtype=np.float64)
+        values = np.empty(self.batch_size, dtype=np.float32)
+        n = 0
+        next_tick = time.monotonic()
+        while self._running.is_set():
+            try:
+                value = self.read_fn()
+            except Exception as e:
+                self.errors += 1
+                print(f"{self.name} read error:", e)
+                time.sleep(0.1)
+                next_tick = time.monotonic()
+                continue
+            times[n] = time.monotonic()
+            values[n] = value
+            n += 1
+            if n == self.batch_size:
+                self.buffer.extend(times, values)
+                if self.on_batch is not None:
+                    try:
+                        self.on_batch(values)
+                    except Exception as e:
+                        print(f"{self.name} batch callback error:", e)
+                n = 0
+                if self.between_batches is not None:
+                    paused = time.monotonic()
+                    try:
+                        used = self.between_batches()
+                    except Exception as e:
+                        print(f"{self.name} between-batches error:", e)
+                        used = True
+                    if used:
+                        self.gaps += 1
+                        self.gap_seconds += time.monotonic() - paused
+                        next_tick = time.monotonic()
+                        continue
+
+            # Sleep until the next conversion instead of spinning on the bus
+            next_tick += period
+            delay = next_tick - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            elif delay < -period * self.batch_size:
+                # Too far behind to catch up; don't burst, restart the clock
+                self.overruns += 1
+                next_tick = time.monotonic()
+
+    # --- Readers (vectorized over the requested window) ---
+    def window(self, seconds):
+        """Samples from the last `seconds`, oldest first."""
+        return self.buffer.since(time.monotonic() - seconds)[1]
+
+    def mean(self, seconds, default=None):
+        values = self.window(seconds)
+        return float(values.mean()) if len(values) else default
+
+    def peak(self, seconds, offset=0.0, default=None):
+        """Largest |value - offset| over the window."""
+        values = self.window(seconds)
+        return float(np.abs(values - offset).max()) if len(values) else default
+
+    def rms(self, seconds, offset=0.0, default=None):
+        """Root mean square of value - offset over the window."""
+        values = self.window(seconds)
+        if not len(values):
+            return default
+        deviation = values - offset
+        return float(np.sqrt(np.dot(deviation, deviation) / len(deviation)))
+
+    def achieved_rate(self, seconds=1.0):
+        """Samples actually stored per second over the last `seconds`."""
+        return len(self.window(seconds)) / seconds
+
+    def stats(self):
+        return {
+            "samples": self.buffer.count,
+            "rate": round(self.achieved_rate(), 1),
+            "errors": self.errors,
+            "overruns": self.overruns,
+            "gaps": self.gaps,
+            "gapSeconds": round(self.gap_seconds, 3),
+        }
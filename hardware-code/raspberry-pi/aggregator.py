@@ -0,0 +1,119 @@
+import math
+
+# -----------------------------
+# Streaming window statistics
+# -----------------------------
+class FieldStats:
+    """Running count/mean/variance/min/max/last for one field.
+
+    Mean and variance use Welford's algorithm so nothing is buffered; a
+    None sample is counted as missing instead of being averaged in.
+    """
+
+    __slots__ = ("count", "missing", "mean", "m2", "min", "max", "last")
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.missing = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.last = None
+
+    def add(self, value):
+        if value is None:
+            self.missing += 1
+            return
+        value = float(value)
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        self.last = value
+
+    def merge(self, other):
+        """Fold another FieldStats into this one (Chan et al. combination)."""
+        self.missing += other.missing
+        if other.count == 0:
+            return
+        if self.count == 0:
+            self.count = other.count
+            self.mean = other.mean
+            self.m2 = other.m2
+        else:
+            count = self.count + other.count
+            delta = other.mean - self.mean
+            self.mean += delta * other.count / count
+            self.m2 += other.m2 + delta * delta * self.count * other.count / count
+            self.count = count
+        if other.min < self.min:
+            self.min = other.min
+        if other.max > self.max:
+            self.max = other.max
+        self.last = other.last
+
+    @property
+    def variance(self):
+        """Population variance, or None without samples."""
+        return self.m2 / self.count if self.count else None
+
+    def summary(self):
+        if self.count == 0:
+            return {"count": 0, "missing": self.missing, "mean": None,
+                    "std": None, "min": None, "max": None, "last": None}
+        return {
+            "count": self.count,
+            "missing": self.missing,
+            "mean": self.mean,
+            "std": math.sqrt(self.variance),
+            "min": self.min,
+            "max": self.max,
+            "last": self.last,
+        }
+
+class WindowAggregator:
+    """A fixed set of FieldStats, one per field, reset between windows.
+
+    The aggregator doesn't know its window length, so the same class backs
+    the 10 s window and any coarser rollup built by merging windows.
+    """
+
+    __slots__ = ("_stats",)
+
+    def __init__(self, fields):
+        self._stats = {name: FieldStats() for name in fields}
+
+    def __getitem__(self, name):
+        return self._stats[name]
+
+    def fields(self):
+        return self._stats.keys()
+
+    def add(self, name, value):
+        self._stats[name].add(value)
+
+    def mean(self, name, default=None):
+        stats = self._stats[name]
+        return stats.mean if stats.count else default
+
+    def counts(self):
+        return {name: stats.count for name, stats in self._stats.items()}
+
+    def missing(self):
+        return {name: stats.missing for name, stats in self._stats.items()}
+
+    def merge(self, other):
+        for name, stats in self._stats.items():
+            stats.merge(other[name])
+
+    def reset(self):
+        for stats in self._stats.values():
+            stats.reset()
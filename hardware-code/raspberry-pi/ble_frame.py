@@ -0,0 +1,126 @@
+import json
+import struct
+
+# -----------------------------
+# ESP32 BLE notification frames
+# -----------------------------
+# Binary frame (v1, little-endian), see hardware-code/esp32/esp32.ino:
+#
+#   header  B version, B sample count, H seq of first sample, I device millis of first sample
+#   sample  H ms since first sample, B heart rate (bpm), B flags (bit 0: motion)
+#
+# Legacy frames are the JSON strings {"heartRate": 72, "motion": false}.
+#
+# A notification carries at most ATT MTU - 3 bytes: 20 with the default MTU
+# of 23, exactly the header and 3 samples. The ESP32 sizes its frames to the
+# MTU it negotiated with the Pi, so decoding must not assume a sample count.
+FRAME_VERSION = 1
+FLAG_MOTION = 0x01
+DEFAULT_ATT_MTU = 23
+ATT_HEADER_SIZE = 3        # opcode + attribute handle
+_HEADER = struct.Struct("<BBHI")
+_SAMPLE = struct.Struct("<HBB")
+
+def frame_size(count):
+    return _HEADER.size + count * _SAMPLE.size
+
+def max_samples(mtu):
+    """Samples that fit one notification at ATT MTU `mtu`."""
+    return max(0, (mtu - ATT_HEADER_SIZE - _HEADER.size) // _SAMPLE.size)
+
+def encode_frame(seq, t0, samples):
+    """Build a binary frame from (dt ms, heart rate, motion) tuples, like the ESP32."""
+    header = _HEADER.pack(FRAME_VERSION, len(samples), seq & 0xFFFF, t0 & 0xFFFFFFFF)
+    return header + b"".join(
+        _SAMPLE.pack(dt, max(0, min(255, int(hr))), FLAG_MOTION if motion else 0)
+        for dt, hr, motion in samples
+    )
+
+class FrameDecoder:
+    """Decode binary or legacy JSON notifications into sample dicts.
+
+    Each sample is {"seq", "deviceTime", "heartRate", "motion"}; fields a
+    frame doesn't carry are None. Gaps in the binary sequence numbers are
+    counted in `lost`. The ESP32 restarting shows as its clock (millis)
+    going backwards; its new sequence numbers start over and aren't a gap.
+    """
+
+    def __init__(self):
+        self.next_seq = None
+        self.last_time = None   # device time of the last sample
+        self.restarts = 0
+        self.frames = 0
+        self.legacy_frames = 0
+        self.bad_frames = 0
+        self.samples = 0
+        self.lost = 0
+
+    def decode(self, data):
+        if not data:
+            self.bad_frames += 1
+            return []
+        if data[0] == FRAME_VERSION:
+            samples = self._decode_binary(data)
+        elif data[:1] == b"{":
+            samples = self._decode_json(data)
+        else:
+            samples = None
+        if samples is None:
+            self.bad_frames += 1
+            return []
+        self.frames += 1
+        self.samples += len(samples)
+        return samples
+
+    def _decode_binary(self, data):
+        if len(data) < _HEADER.size:
+            return None
+        _, count, seq, t0 = _HEADER.unpack_from(data)
+        end = _HEADER.size + count * _SAMPLE.size
+        if len(data) < end:
+            return None
+
+        if self.next_seq is not None:
+            if t0 < self.last_time:
+                self.restarts += 1
+            else:
+                self.lost += (seq - self.next_seq) & 0xFFFF
+        self.next_seq = (seq + count) & 0xFFFF
+
+        body = memoryview(data)[_HEADER.size:end]
+        samples = [
+            {
+                "seq": (seq + i) & 0xFFFF,
+                "deviceTime": t0 + dt,
+                "heartRate": hr,
+                "motion": bool(flags & FLAG_MOTION),
+            }
+            for i, (dt, hr, flags) in enumerate(_SAMPLE.iter_unpack(body))
+        ]
+        self.last_time = samples[-1]["deviceTime"] if samples else t0
+        return samples
+
+    def _decode_json(self, data):
+        try:
+            payload = json.loads(bytes(data).decode())
+        except Exception:
+            return None
+        if not isinstance(payload, dict):
+            return None
+        self.legacy_frames += 1
+        return [{
+            "seq": None,
+            "deviceTime": None,
+            "heartRate": payload.get("heartRate"),
+            "motion": payload.get("motion"),
+        }]
+
+    def stats(self):
+        return {
+            "frames": self.frames,
+            "legacyFrames": self.legacy_frames,
+            "badFrames": self.bad_frames,
+            "samples": self.samples,
+            "lost": self.lost,
+            "restarts": self.restarts,
+        }
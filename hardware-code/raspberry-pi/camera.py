@@ -1,21 +1,51 @@
 # camera_test_stream.py
-import cv2
-import mediapipe as mp
-from picamera2 import Picamera2
+import hal
+import atexit
+import json
+import os
 import time
 import math
+import signal
+import threading
+import multiprocessing
+import numpy as np
+import metrics
+from frame_ring import FrameRing
+from motion_gate import MotionGate
+from pose_quality import PoseQualityController, level_name
+from landmark_recorder import LANDMARK_RECORD_DIR, recorder_from_env
+from posture import posture_code
+from pose_classifier import Z_MARGIN, SIDE_DX
 
 # -----------------------------
 # Picamera2 + MediaPipe init
 # -----------------------------
-picam2 = Picamera2()
-picam2.configure(picam2.create_preview_configuration(
-    main={"format": "BGR888", "size": (640, 480)}
-))
-picam2.start()
+# Capture and pose inference run in two processes of their own, so
+# MediaPipe gets a full core and never holds the GIL of sendData's BLE/MQTT
+# loop. Frames travel from capture to inference through a shared-memory
+# ring (frame_ring.py); the pose comes back through SharedPose, which
+# sendData (send_pose) and the web streamer (cameraWithWeb.py) read.
+# OpenCV and MediaPipe take seconds to load, so only the inference process
+# imports them, in load(); the capture process opens the camera.
+FRAME_SIZE = (640, 480)
+FRAME_SHAPE = (FRAME_SIZE[1], FRAME_SIZE[0], 3)   # BGR888
+FRAME_SLOTS = 4
 
-mp_drawing = mp.solutions.drawing_utils
-mp_pose = mp.solutions.pose
+cv2 = None
+mp = None
+mp_drawing = None
+mp_pose = None
+_load_lock = threading.Lock()
+
+def load():
+    global cv2, mp, mp_drawing, mp_pose
+    with _load_lock:
+        if mp_pose is not None:
+            return
+        import cv2
+        import mediapipe as mp
+        mp_drawing = mp.solutions.drawing_utils
+        mp_pose = mp.solutions.pose
 
 # -----------------------------
 # Your detection helpers (use same logic you had)
@@ -31,7 +61,7 @@ def shoulder_line_angle(left_shoulder, right_shoulder):
 def detect_sleep_pose(landmarks, vis_threshold=0.4):
     if landmarks is None:
         return "No person detected"
-    
+
     nose = landmarks.landmark[mp_pose.PoseLandmark.NOSE]
     left_shoulder = landmarks.landmark[mp_pose.PoseLandmark.LEFT_SHOULDER]
     right_shoulder = landmarks.landmark[mp_pose.PoseLandmark.RIGHT_SHOULDER]
@@ -43,11 +73,12 @@ def detect_sleep_pose(landmarks, vis_threshold=0.4):
     shoulder_dx = abs(left_shoulder.x - right_shoulder.x)
     hip_dx = abs(left_hip.x - right_hip.x)
 
-    if nose.z < shoulder_z - 0.05:
+    # Thresholds shared with the vectorized classifier (pose_classifier.py)
+    if nose.z < shoulder_z - Z_MARGIN:
         return "Supine (Face Up)"
-    elif nose.z > shoulder_z + 0.05:
+    elif nose.z > shoulder_z + Z_MARGIN:
         return "Prone (Face Down)"
-    elif shoulder_dx < 0.15 and hip_dx < 0.15:  # tune threshold
+    elif shoulder_dx < SIDE_DX and hip_dx < SIDE_DX:  # tune with pose_sweep.py
         if left_shoulder.y > right_shoulder.y:
             return "Left Side"
         elif right_shoulder.y > left_shoulder.y:
@@ -57,60 +88,448 @@ def detect_sleep_pose(landmarks, vis_threshold=0.4):
     else:
         return 'Unknown'
 
+# Landmarks used by detect_sleep_pose; their mean visibility is the
+# confidence reported with each pose.
+# (MediaPipe PoseLandmark indices, so mediapipe isn't needed at import.)
+POSE_KEY_LANDMARKS = (
+    0,    # NOSE
+    11,   # LEFT_SHOULDER
+    12,   # RIGHT_SHOULDER
+    23,   # LEFT_HIP
+    24,   # RIGHT_HIP
+)
+
+def pose_confidence(landmarks):
+    if landmarks is None:
+        return 0.0
+    vis = [landmarks.landmark[i].visibility or 0.0 for i in POSE_KEY_LANDMARKS]
+    return sum(vis) / len(vis)
+
 # -----------------------------
-# Send pose once
-# -----------------------------`
+# Pose shared between processes
+# -----------------------------
+# The processes are forked: spawn or forkserver would re-import sendData's
+# __main__ in each child and run its whole setup again. A child forked while
+# other threads run could inherit a lock one of them holds (stdout, I2C, ...)
+# and hang, so the main process forks once, a supervisor, before it starts
+# any thread; the supervisor has no threads of its own and forks (and
+# restarts) the capture and inference processes.
+_mp = multiprocessing.get_context("fork")
 
-def send_pose():
+MAX_LANDMARKS = 33
+POSE_TEXT_BYTES = 64
+STATS_BYTES = 4096
+STATS_INTERVAL = 1.0    # seconds between stats updates from the inference process
+LOCK_TIMEOUT = 1.0      # seconds a pose reader waits for the lock
+
+class SharedPose:
+    """Latest pose, confidence and landmarks (x, y, visibility), plus the
+    inference process's stats as JSON. Written by the inference process,
+    read by sendData and the streamer without touching the camera."""
+
+    def __init__(self, ctx=_mp):
+        self.lock = ctx.Lock()
+        self.text = ctx.Array('c', POSE_TEXT_BYTES, lock=False)
+        self.text.value = b"Unknown"
+        self.timestamp = ctx.Value('d', 0.0, lock=False)    # wall time the pose was last confirmed
+        self.confidence = ctx.Value('d', 0.0, lock=False)
+        self.landmarks = ctx.Array('f', MAX_LANDMARKS * 3, lock=False)
+        self.count = ctx.Value('i', 0, lock=False)
+        self.skip_ratio = ctx.Value('d', 0.0, lock=False)
+        self.quality = ctx.Array('c', POSE_TEXT_BYTES, lock=False)
+        self.stats = ctx.Array('c', STATS_BYTES, lock=False)
+        self.ready = ctx.Event()   # set after the first inference
+        self.restarts = ctx.Value('i', 0, lock=False)   # written by the supervisor only
+
+    def publish(self, text, confidence, landmarks=None):
+        with self.lock:
+            self.text.value = text.encode()[:POSE_TEXT_BYTES - 1]
+            self.confidence.value = confidence
+            self.timestamp.value = time.time()
+            points = landmarks.landmark[:MAX_LANDMARKS] if landmarks else []
+            values = np.frombuffer(self.landmarks, dtype=np.float32).reshape(MAX_LANDMARKS, 3)
+            for i, lm in enumerate(points):
+                values[i] = (lm.x, lm.y, lm.visibility or 0.0)
+            self.count.value = len(points)
+
+    def touch(self):
+        """The scene didn't change: the current pose still holds."""
+        with self.lock:
+            self.timestamp.value = time.time()
+
+    def set_quality(self, text):
+        with self.lock:
+            self.quality.value = text.encode()[:POSE_TEXT_BYTES - 1]
+
+    def set_stats(self, stats):
+        data = json.dumps(stats, separators=(",", ":")).encode()
+        if len(data) >= STATS_BYTES:
+            return
+        with self.lock:
+            self.stats.value = data
+
+    def latest(self, timeout=LOCK_TIMEOUT):
+        """{"pose", "timestamp", "confidence"}; no pose while the lock is
+        stuck with a dead inference process (until the supervisor frees it)."""
+        if not self.lock.acquire(timeout=timeout):
+            return {"pose": "Unknown", "timestamp": 0.0, "confidence": 0.0}
+        try:
+            return {"pose": self.text.value.decode(), "timestamp": self.timestamp.value,
+                    "confidence": self.confidence.value}
+        finally:
+            self.lock.release()
+
+    def get(self):
+        """(pose text, landmarks array [n x 3], skip ratio, quality text)."""
+        with self.lock:
+            values = np.frombuffer(self.landmarks, dtype=np.float32).reshape(MAX_LANDMARKS, 3)
+            return (self.text.value.decode(), values[:self.count.value].copy(),
+                    self.skip_ratio.value, self.quality.value.decode())
+
+    def get_stats(self):
+        with self.lock:
+            data = self.stats.value
+        try:
+            return json.loads(data) if data else {}
+        except ValueError:
+            return {}
+
+    def recover_lock(self, timeout=1.0):
+        """Release the lock if a killed writer left it held."""
+        if self.lock.acquire(timeout=timeout):
+            self.lock.release()
+            return False
+        self.lock.release()   # its holder is gone; a plain Lock can be released by anyone
+        return True
+
+shared_pose = SharedPose()
+
+def ignore_signals():
+    # Ctrl+C reaches the whole process group; only the main process handles it
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+
+def _parent_alive(parent):
+    # Don't outlive a main process that was killed without stopping us
+    return os.getppid() == parent
+
+# -----------------------------
+# Capture process
+# -----------------------------
+def capture_process(ring, stop, parent):
+    ignore_signals()
+    print('>> Capture start')
+    picam2 = hal.camera(FRAME_SIZE)
     try:
-        with mp_pose.Pose(static_image_mode=False, model_complexity=1,
-                          min_detection_confidence=0.5, min_tracking_confidence=0.5) as pose:
+        while not stop.is_set() and _parent_alive(parent):
             try:
-                frame = picam2.capture_array() # might raise
+                frame = picam2.capture_array()   # might raise
+                ring.write(frame)
             except Exception as e:
                 print("Camera capture error:", e)
                 time.sleep(0.1)
-                return "Unknown"
+    finally:
+        try:
+            picam2.close()
+        except Exception:
+            pass
+        ring.close()
 
-            # MediaPipe expects RGB
-            try:
-                rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                results = pose.process(rgb)
-                landmarks = results.pose_landmarks
-            except Exception as e:
-                print("MediaPipe processing error:", e)
-                landmarks = None
-                time.sleep(0.1)
-                return "Unknown"
+# -----------------------------
+# Inference process (keeps the model warm)
+# -----------------------------
+POSE_TIMEOUT = 5        # seconds before the latest pose is considered stale
+
+def _pose_model(models, complexity):
+    """The warm model for `complexity`, created on first use."""
+    if complexity not in models:
+        models[complexity] = mp_pose.Pose(static_image_mode=False, model_complexity=complexity,
+                                          min_detection_confidence=0.5, min_tracking_confidence=0.5)
+    return models[complexity]
+
+def inference_process(ring, pose_state, stop, parent):
+    ignore_signals()
+    print('>> Pose inference start')
+    load()
+    # Frames that barely differ from the last inferred one reuse its pose
+    # (thresholds: POSE_MOTION_THRESHOLD, POSE_PIXEL_DELTA, POSE_MAX_STALENESS).
+    # Model complexity, inference size and rate follow the measured latency
+    # (budgets: POSE_LATENCY_BUDGET, POSE_CPU_BUDGET; see pose_quality.py).
+    gate = MotionGate()
+    quality = PoseQualityController()
+    models = {}
+    # Optional: every inference's landmarks to LANDMARK_RECORD_DIR (landmark_recorder.py)
+    landmark_recorder = recorder_from_env()
+    seq = 0
+    missed = 0    # frames never looked at (captured faster than the inference rate)
+    reused = 0    # slots overwritten before the frame was converted
+    published = logged = time.monotonic()
+    try:
+        while not stop.is_set() and _parent_alive(parent):
+            started = time.monotonic()
+            new_seq, _, frame = ring.read(after=seq, timeout=0.5)
+            if new_seq is None:
+                continue
+            if seq:
+                missed += new_seq - seq - 1
+            seq = new_seq
 
-            # convert to gray for display
-            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            frame_disp = cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR)
+            run, reason = gate.check(frame)
+            if run:
+                # MediaPipe expects RGB (the conversion leaves the shared slot alone)
+                inferred = time.monotonic()
+                image, roi = quality.prepare(frame)
+                rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+            if not ring.valid(seq):
+                reused += 1
+                continue
 
-            if landmarks:
-                mp_drawing.draw_landmarks(frame_disp, landmarks, mp_pose.POSE_CONNECTIONS)
-                new_pose = detect_sleep_pose(landmarks)
-                return new_pose
+            if not run:
+                # Scene unchanged: the previous pose still holds, keep it fresh
+                pose_state.touch()
             else:
-                return "Unknown"
+                level = quality.level
+                try:
+                    pose = _pose_model(models, quality.complexity)
+                except Exception as e:
+                    print(f"Pose model {level_name(level)} unavailable:", e)
+                    quality.disable(level, "model unavailable")
+                    time.sleep(1)
+                    continue
+                try:
+                    with POSE_INFERENCE_SECONDS.time():
+                        results = pose.process(rgb)
+                    quality.observe(time.monotonic() - inferred)
+                    landmarks = quality.to_frame(results.pose_landmarks, roi)
+                except Exception as e:
+                    print("MediaPipe processing error:", e)
+                    landmarks = None
+                quality.update_roi(landmarks)
+                gate.accept(reason)
+
+                if landmarks:
+                    pose_value = detect_sleep_pose(landmarks)
+                    pose_state.publish(pose_value, pose_confidence(landmarks), landmarks)
+                    if landmark_recorder is not None:
+                        landmark_recorder.record(landmarks, posture_code(pose_value))
+                else:
+                    pose_state.publish("Unknown", 0.0)
+                pose_state.ready.set()
+                latency = quality.current_latency() or 0.0
+                pose_state.set_quality(f"{level_name(quality.level)} {latency * 1000:.0f}ms")
+            pose_state.skip_ratio.value = gate.skip_ratio()
+
+            now = time.monotonic()
+            if now - published >= STATS_INTERVAL:
+                stats = {"gate": gate.stats(), "motionScore": round(gate.score, 4), "quality": quality.stats(),
+                         "missed": missed, "reused": reused, "inference": POSE_INFERENCE_SECONDS.state()}
+                if landmark_recorder is not None:
+                    stats["landmarks"] = dict(landmark_recorder.stats(), diskBytes=landmark_recorder.disk_bytes())
+                pose_state.set_stats(stats)
+                published = now
+            if now - logged >= 60:
+                print('>> motion gate', gate.stats(), f"missed {missed}, reused {reused}")
+                print('>> pose quality', quality.stats())
+                logged = now
+            time.sleep(max(0.001, quality.interval() - (now - started)))
     except Exception as e:
-        print("Unhandled error in capture_loop:", e)
-        time.sleep(0.1)
+        print("Unhandled error in pose inference:", e)
+    finally:
+        for model in models.values():
+            model.close()
+        if landmark_recorder is not None:
+            landmark_recorder.close()
+        ring.close()
+        print('>> Pose inference stopped')
+
+# -----------------------------
+# Supervisor process
+# -----------------------------
+RESTART_INTERVAL = 30   # seconds between restarts of dead pose processes
+
+def _stop_children(processes, pose_state, timeout=2):
+    for p in processes:
+        p.join(timeout)
+        if p.is_alive():
+            p.kill()   # they ignore SIGTERM
+            p.join(timeout)
+    # An inference process that crashed or was killed may have held the pose lock
+    if processes and pose_state.recover_lock():
+        print("Pose lock released after a pose process stopped")
+
+def supervisor_process(ring, pose_state, stop, parent):
+    ignore_signals()
+    me = os.getpid()
+    restart = _mp.Event()   # stops only the current children, for a restart
+    processes = []
+    started = 0.0
+    try:
+        while not stop.is_set() and _parent_alive(parent):
+            if not processes or not all(p.is_alive() for p in processes):
+                if processes:
+                    if time.monotonic() - started < RESTART_INTERVAL:
+                        stop.wait(0.5)
+                        continue
+                    print("Pose processes stopped, restarting")
+                    restart.set()
+                    _stop_children(processes, pose_state)
+                    restart.clear()
+                    pose_state.restarts.value += 1
+                processes = [
+                    _mp.Process(target=capture_process, args=(ring, restart, me), name="pose-capture"),
+                    _mp.Process(target=inference_process, args=(ring, pose_state, restart, me),
+                                name="pose-inference"),
+                ]
+                for p in processes:
+                    p.start()
+                started = time.monotonic()
+            stop.wait(0.5)
+    finally:
+        restart.set()
+        _stop_children(processes, pose_state)
+
+# -----------------------------
+# Pose worker (main process side)
+# -----------------------------
+_stop = _mp.Event()
+_ring = None
+_supervisor = None
+
+def pose_stats():
+    """The inference process's latest stats ({} until it has published any)."""
+    return shared_pose.get_stats()
+
+def _stat(*keys):
+    value = pose_stats()
+    for key in keys:
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value
+
+# Kept by the inference process; these read what it publishes in SharedPose
+POSE_INFERENCE_SECONDS = metrics.histogram(
+    "sleepduck_pose_inference_seconds", "MediaPipe pose inference latency per frame",
+    fn=lambda: _stat("inference"))
+POSE_FRAMES = metrics.counter(
+    "sleepduck_pose_frames_total", "Frames processed by the pose worker", fn=lambda: _stat("gate", "frames"))
+POSE_FRAMES_MISSED = metrics.counter(
+    "sleepduck_pose_frames_missed_total", "Captured frames the inference process never looked at",
+    fn=lambda: _stat("missed"))
+POSE_FRAMES_SKIPPED = metrics.counter(
+    "sleepduck_pose_frames_skipped_total", "Frames whose pose was reused because the scene didn't change",
+    fn=lambda: _stat("gate", "skipped"))
+POSE_SKIP_RATIO = metrics.gauge(
+    "sleepduck_pose_skip_ratio", "Fraction of frames that skipped pose inference",
+    fn=lambda: shared_pose.skip_ratio.value)
+POSE_MOTION_SCORE = metrics.gauge(
+    "sleepduck_pose_motion_score", "Fraction of pixels changed since the last inferred frame",
+    fn=lambda: _stat("motionScore"))
+POSE_MOTION_THRESHOLD = metrics.gauge(
+    "sleepduck_pose_motion_threshold", "Motion score that triggers pose inference",
+    fn=lambda: _stat("gate", "threshold"))
+POSE_MODEL_COMPLEXITY = metrics.gauge(
+    "sleepduck_pose_model_complexity", "MediaPipe pose model complexity in use",
+    fn=lambda: _stat("quality", "complexity"))
+POSE_INPUT_WIDTH = metrics.gauge(
+    "sleepduck_pose_input_width_pixels", "Width frames are shrunk to before inference",
+    fn=lambda: _stat("quality", "width"))
+POSE_TARGET_RATE = metrics.gauge(
+    "sleepduck_pose_target_rate", "Frames per second the pose worker aims for",
+    fn=lambda: _stat("quality", "rate"))
+POSE_LEVEL_LATENCY = metrics.gauge(
+    "sleepduck_pose_level_latency_seconds", "Smoothed inference latency per quality level")
+POSE_WORKER_RESTARTS = metrics.counter(
+    "sleepduck_pose_worker_restarts_total", "Times the capture/inference processes were restarted",
+    fn=lambda: shared_pose.restarts.value)
+
+if LANDMARK_RECORD_DIR:
+    LANDMARK_RECORDS = metrics.counter(
+        "sleepduck_landmark_records_total", "Landmark sets recorded", fn=lambda: _stat("landmarks", "records"))
+    LANDMARK_DISK_BYTES = metrics.gauge(
+        "sleepduck_landmark_disk_bytes", "Disk used by landmark segments",
+        fn=lambda: _stat("landmarks", "diskBytes"))
+
+def pose_worker_alive():
+    return _supervisor is not None and _supervisor.is_alive()
+
+def start_pose_worker():
+    """Start the pose processes; call it from the main thread before
+    starting any other thread (see the note on forking above).
+
+    The supervisor restarts capture and inference if they die.
+    Returns the frame ring, for other readers such as the web streamer.
+    """
+    global _ring, _supervisor
+    if _supervisor is not None:
+        return _ring
+    if threading.active_count() > 1:
+        print("Warning: forking the pose processes while other threads run")
+    _stop.clear()
+    _ring = FrameRing(FRAME_SHAPE, slots=FRAME_SLOTS)
+    # Not daemonic, so it may have children; if the main process dies
+    # without stop_pose_worker() the supervisor notices and stops
+    _supervisor = _mp.Process(target=supervisor_process, args=(_ring, shared_pose, _stop, os.getpid()),
+                              name="pose-supervisor")
+    _supervisor.start()
+    return _ring
+
+def stop_pose_worker(timeout=5):
+    global _ring, _supervisor
+    _stop.set()
+    if _supervisor is not None:
+        _supervisor.join(timeout)
+        if _supervisor.is_alive():
+            _supervisor.kill()   # its children follow when they see it gone
+            _supervisor.join(timeout)
+        _supervisor = None
+    if _ring is not None:
+        _ring.close()
+        _ring.unlink()
+        _ring = None
+
+# Before multiprocessing's own exit handler, which would wait forever for
+# the supervisor
+atexit.register(stop_pose_worker)
+
+def wait_pose_ready(timeout=None):
+    """Block until the inference process has run its first inference."""
+    return shared_pose.ready.wait(timeout)
+
+def get_gate_stats():
+    """Motion gate counters and thresholds (see motion_gate.MotionGate.stats)."""
+    return _stat("gate") or {}
+
+def get_pose_quality():
+    """Current pose settings, the latency they give and the budgets."""
+    return _stat("quality") or {}
+
+def get_latest_pose():
+    """Return {"pose", "timestamp", "confidence"} without blocking on the camera."""
+    return shared_pose.latest()
+
+# -----------------------------
+# Send latest pose
+# -----------------------------
+def send_pose():
+    for name, ms in (_stat("quality", "levelLatencyMs") or {}).items():
+        POSE_LEVEL_LATENCY.set(ms / 1000, level=name)
+    latest = get_latest_pose()
+    if time.time() - latest["timestamp"] > POSE_TIMEOUT:
         return "Unknown"
+    return latest["pose"]
 
 if __name__ == "__main__":
     try:
-        result = send_pose()
-        print("Detected pose:", result)
+        start_pose_worker()
+        wait_pose_ready(60)
+        time.sleep(2)   # let the stats catch up
+        latest = get_latest_pose()
+        print("Detected pose:", latest["pose"], f"(confidence {latest['confidence']:.2f})")
+        print("Motion gate:", get_gate_stats())
+        print("Pose quality:", get_pose_quality())
     except Exception as e:
         print("Runtime error in send_pose:", e)
     finally:
-        # give Flask a brief moment to exit
-        time.sleep(0.5)
-        try:
-            picam2.close()
-        except Exception:
-            pass
-        except Exception:
-            pass
+        stop_pose_worker()
         print("Shutdown complete")
@@ -1,93 +1,103 @@
 # camera_test_stream.py
 import cv2
 import mediapipe as mp
-from picamera2 import Picamera2
 import time
-import math
 import signal
 import threading
 from flask import Flask, Response
+import camera
+from camera import shared_pose, ignore_signals
 
 # -----------------------------
 # Picamera2 + MediaPipe init
 # -----------------------------
-picam2 = Picamera2()
-picam2.configure(picam2.create_preview_configuration(
-    main={"format": "BGR888", "size": (640, 480)}
-))
-picam2.start()
-
-mp_drawing = mp.solutions.drawing_utils
+# Capture and pose inference are camera.py's processes (the same ones
+# sendData runs); this script adds a third process that draws the pose on
+# the frames from the shared ring and streams them as MJPEG.
 mp_pose = mp.solutions.pose
 
 # -----------------------------
-# Globals for streaming
-# -----------------------------
-latest_frame = None
-frame_lock = threading.Lock()
-running = True
-
-# -----------------------------
-# Your detection helpers (use same logic you had)
-# -----------------------------
-def valid_landmark(lm, vis_threshold=0.4):
-    return lm is not None and (hasattr(lm, 'visibility') and lm.visibility is not None and lm.visibility >= vis_threshold)
-
-def shoulder_line_angle(left_shoulder, right_shoulder):
-    dx = right_shoulder.x - left_shoulder.x
-    dy = right_shoulder.y - left_shoulder.y
-    return math.degrees(math.atan2(dy, dx))
-
-def detect_sleep_pose(landmarks, vis_threshold=0.4):
-    if landmarks is None:
-        return "No person detected"
-    
-    nose = landmarks.landmark[mp_pose.PoseLandmark.NOSE]
-    left_shoulder = landmarks.landmark[mp_pose.PoseLandmark.LEFT_SHOULDER]
-    right_shoulder = landmarks.landmark[mp_pose.PoseLandmark.RIGHT_SHOULDER]
-    left_hip = landmarks.landmark[mp_pose.PoseLandmark.LEFT_HIP]
-    right_hip = landmarks.landmark[mp_pose.PoseLandmark.RIGHT_HIP]
-
-
-    shoulder_z = (left_shoulder.z + right_shoulder.z) / 2
-    shoulder_dx = abs(left_shoulder.x - right_shoulder.x)
-    hip_dx = abs(left_hip.x - right_hip.x)
-
-    if nose.z < shoulder_z - 0.05:
-        return "Supine (Face Up)"
-    elif nose.z > shoulder_z + 0.05:
-        return "Prone (Face Down)"
-    elif shoulder_dx < 0.15 and hip_dx < 0.15:  # tune threshold
-        if left_shoulder.y > right_shoulder.y:
-            return "Left Side"
-        elif right_shoulder.y > left_shoulder.y:
-            return "Right Side"
-        else:
-            return 'Unknown'
-    else:
-        return 'Unknown'
-
-# -----------------------------
-# Flask MJPEG streamer
+# Flask MJPEG streamer (streaming process)
 # -----------------------------
+# Frames are rendered and encoded only while a client is connected, once
+# per captured frame however many clients there are.
 app = Flask(__name__)
 
-def gen_mjpeg():
-    global latest_frame, frame_lock, running
+latest_jpeg = None
+jpeg_seq = 0
+jpeg_ready = threading.Condition()
+clients = 0
+running = True
+
+def draw_landmarks(image, landmarks, vis_threshold=0.5):
+    h, w = image.shape[:2]
+    points = {i: (int(x * w), int(y * h)) for i, (x, y, vis) in enumerate(landmarks) if vis >= vis_threshold}
+    for a, b in mp_pose.POSE_CONNECTIONS:
+        if a in points and b in points:
+            cv2.line(image, points[a], points[b], (255, 255, 255), 2)
+    for point in points.values():
+        cv2.circle(image, point, 3, (0, 0, 255), -1)
+
+def render_loop(ring, pose_state):
+    global latest_jpeg, jpeg_seq
+    seq = 0
+    pTime = time.time()
     while running:
-        with frame_lock:
-            if latest_frame is None:
-                # no frame yet
-                time.sleep(0.01)
-                continue
-            # encode latest_frame as jpeg
-            ret, jpeg = cv2.imencode('.jpg', latest_frame)
+        if clients == 0:
+            time.sleep(0.1)
+            continue
+        new_seq, _, frame = ring.read(after=seq, timeout=0.5)
+        if new_seq is None:
+            continue
+        seq = new_seq
+
+        # convert to gray for display (the conversion leaves the shared slot alone)
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        if not ring.valid(seq):
+            continue
+        frame_disp = cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR)
+
+        local_pose, landmarks, skip_ratio, quality_text = pose_state.get()
+        if len(landmarks):
+            draw_landmarks(frame_disp, landmarks)
+        cv2.putText(frame_disp, local_pose, (20, 80),
+                    cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
+
+        # FPS
+        cTime = time.time()
+        fps = 1.0 / max((cTime - pTime), 1e-6)
+        pTime = cTime
+        cv2.putText(frame_disp, f"FPS: {int(fps)}  skip: {skip_ratio:.0%}", (20, 40),
+                    cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 0), 2)
+        cv2.putText(frame_disp, quality_text, (20, 120),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 0), 2)
+
+        ret, jpeg = cv2.imencode('.jpg', frame_disp)
         if not ret:
-            time.sleep(0.01)
             continue
-        yield (b'--frame\r\n'
-               b'Content-Type: image/jpeg\r\n\r\n' + jpeg.tobytes() + b'\r\n')
-    # when exiting, yield nothing
+        with jpeg_ready:
+            latest_jpeg = jpeg.tobytes()
+            jpeg_seq += 1
+            jpeg_ready.notify_all()
+
+def gen_mjpeg():
+    global clients
+    with jpeg_ready:
+        clients += 1
+    try:
+        seen = 0
+        while running:
+            with jpeg_ready:
+                if jpeg_seq == seen:
+                    jpeg_ready.wait(1.0)
+                    if jpeg_seq == seen:
+                        continue
+                seen, jpeg = jpeg_seq, latest_jpeg
+            yield (b'--frame\r\n'
+                   b'Content-Type: image/jpeg\r\n\r\n' + jpeg + b'\r\n')
+    finally:
+        with jpeg_ready:
+            clients -= 1
 
 @app.route('/stream')
 def stream():
@@ -97,112 +107,49 @@ def run_flask():
     # set threaded=True so multiple connections OK
     app.run(host='0.0.0.0', port=5000, threaded=True)
 
-# -----------------------------
-# Capture loop (runs in main thread)
-# -----------------------------
-latest_frame = None
-frame_lock = threading.Lock()
-pose_text = "No Pose"
-pose_lock = threading.Lock()
-running = True
-            
-def send_pose():
-    print('>> current pose', pose_text)
-    with pose_lock:
-        return pose_text
-
-def capture_loop():
-    print('>> Loop start')
-    global latest_frame, running, pose_text
-    pTime = time.time()
-    try:
-        with mp_pose.Pose(static_image_mode=False, model_complexity=1,
-                          min_detection_confidence=0.5, min_tracking_confidence=0.5) as pose:
-            while running:
-                try:
-                    frame = picam2.capture_array()   # might raise
-                except Exception as e:
-                    print("Camera capture error:", e)
-                    time.sleep(0.1)
-                    continue
-
-                # MediaPipe expects RGB
-                try:
-                    rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                    results = pose.process(rgb)
-                    landmarks = results.pose_landmarks
-                except Exception as e:
-                    print("MediaPipe processing error:", e)
-                    landmarks = None
-
-                # convert to gray for display
-                gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-                frame_disp = cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR)
-
-                if landmarks:
-                    mp_drawing.draw_landmarks(frame_disp, landmarks, mp_pose.POSE_CONNECTIONS)
-                    new_pose = detect_sleep_pose(landmarks)
-                    print('>> log', new_pose)
-                    with pose_lock:
-                        pose_text = new_pose
-                else:
-                    # optional: update to say "No person detected"
-                    with pose_lock:
-                        # keep previous pose or set explicit:
-                        # pose_text = "No person detected"
-                        pass
-
-                # read a local copy of pose_text under lock for thread-safety
-                with pose_lock:
-                    local_pose = pose_text
-
-                cv2.putText(frame_disp, local_pose, (20, 80),
-                            cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
-
-                # FPS
-                cTime = time.time()
-                fps = 1.0 / max((cTime - pTime), 1e-6)
-                pTime = cTime
-                cv2.putText(frame_disp, f"FPS: {int(fps)}", (20, 40),
-                            cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 0), 2)
-
-                # push final frame
-                with frame_lock:
-                    latest_frame = frame_disp.copy()
-
-                # small sleep to release CPU
-                time.sleep(0.001)
-    except Exception as e:
-        print("Unhandled error in capture_loop:", e)
-        running = False
+def stream_process(ring, pose_state, stop):
+    global running
+    ignore_signals()
+    render_thread = threading.Thread(target=render_loop, args=(ring, pose_state), daemon=True)
+    render_thread.start()
+    flask_thread = threading.Thread(target=run_flask, daemon=True)
+    print(">>>>>>>>>> Flask thread started")
+    flask_thread.start()
+    stop.wait()
+    running = False
+    render_thread.join(1)
 
 # -----------------------------
 # Signal handler for clean exit
 # -----------------------------
-def handle_sigint(sig, frame):
-    global running
-    running = False
+# Only a flag here: setting the multiprocessing Event from a handler can
+# deadlock on the lock its wait() holds.
+stopping = False
 
-signal.signal(signal.SIGINT, handle_sigint)
-signal.signal(signal.SIGTERM, handle_sigint)
+def handle_sigint(sig, frame):
+    global stopping
+    stopping = True
 
 if __name__ == "__main__":
-    # start Flask in background thread
-    flask_thread = threading.Thread(target=run_flask, daemon=True)
-    print(">>>>>>>>>> Flask thread started")
-    flask_thread.start()
+    signal.signal(signal.SIGINT, handle_sigint)
+    signal.signal(signal.SIGTERM, handle_sigint)
+    stop_event = camera._mp.Event()
+    streamer = None
     try:
-        capture_loop()
+        ring = camera.start_pose_worker()
+        # Same start method as the pose processes
+        streamer = camera._mp.Process(target=stream_process, args=(ring, shared_pose, stop_event), name="stream")
+        streamer.start()
+        # Run until a signal arrives or one of the processes dies
+        while not stopping and streamer.is_alive() and camera.pose_worker_alive():
+            time.sleep(0.5)
     except Exception as e:
-        print("Runtime error in capture_loop:", e)
+        print("Runtime error in main:", e)
     finally:
-        running = False
-        # give Flask a brief moment to exit
-        time.sleep(0.5)
-        try:
-            picam2.close()
-        except Exception:
-            pass
-        except Exception:
-            pass
+        stop_event.set()
+        if streamer is not None:
+            streamer.join(3)
+            if streamer.is_alive():
+                streamer.terminate()
+        camera.stop_pose_worker()
         print("Shutdown complete")
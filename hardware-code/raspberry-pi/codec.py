@@ -0,0 +1,59 @@
+import math
+import struct
+from posture import posture_code, posture_name
+
+# -----------------------------
+# Compact binary window format
+# -----------------------------
+# One message per window on the "window" topic, replacing the separate
+# "sensor" and "posture" JSON strings. Little-endian layout (v1, 29 bytes):
+#
+#   B  version        WINDOW_FORMAT_VERSION
+#   B  flags          bit 0: light on
+#   I  seq            window sequence number (wraps at 2**32)
+#   I  windowStart    epoch seconds (floored)
+#   I  windowEnd      epoch seconds (rounded up)
+#   H  samples        BLE notifications in the window
+#   B  posture        posture code (posture.POSTURES)
+#   6e sensor fields  float16 in WINDOW_FIELDS order, NaN = missing
+WINDOW_FORMAT_VERSION = 1
+WINDOW_FIELDS = ("heartRate", "motion", "humid", "temp", "sound", "brightness")
+FLAG_LIGHT = 0x01
+
+_WINDOW = struct.Struct("<BBIIIHB%de" % len(WINDOW_FIELDS))
+_F16_MAX = 65504.0
+
+def _f16(value):
+    if value is None:
+        return math.nan
+    return max(-_F16_MAX, min(_F16_MAX, float(value)))
+
+def encode_window(seq, window_start, window_end, samples, sensor, posture, light):
+    """Pack one window; `sensor` maps WINDOW_FIELDS names to value or None,
+    `posture` is a posture code or name."""
+    return _WINDOW.pack(
+        WINDOW_FORMAT_VERSION,
+        FLAG_LIGHT if light else 0,
+        seq & 0xFFFFFFFF,
+        int(math.floor(window_start)),
+        int(math.ceil(window_end)),
+        min(samples, 0xFFFF),
+        posture_code(posture),
+        *[_f16(sensor.get(name)) for name in WINDOW_FIELDS],
+    )
+
+def decode_window(data):
+    if not data or data[0] != WINDOW_FORMAT_VERSION:
+        raise ValueError("unsupported window format version")
+    version, flags, seq, start, end, samples, posture, *values = _WINDOW.unpack(data)
+    sensor = {name: (None if math.isnan(v) else v) for name, v in zip(WINDOW_FIELDS, values)}
+    return {
+        "version": version,
+        "seq": seq,
+        "windowStart": start,
+        "windowEnd": end,
+        "samples": samples,
+        "light": bool(flags & FLAG_LIGHT),
+        "posture": posture_name(posture),
+        **sensor,
+    }
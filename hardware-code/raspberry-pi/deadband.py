@@ -0,0 +1,67 @@
+# -----------------------------
+# Change-driven publishing
+# -----------------------------
+class ChangeFilter:
+    """Suppress windows that don't differ from the last published one.
+
+    `deadbands` maps a field to the absolute change needed to publish it,
+    or None for fields compared exactly (posture, light). Values are
+    compared against the last *published* window so slow drift still gets
+    through once it adds up. A heartbeat is forced every `heartbeat`
+    seconds regardless.
+    """
+
+    def __init__(self, deadbands, heartbeat):
+        self.deadbands = deadbands
+        self.heartbeat = heartbeat
+        self.last_values = None
+        self.last_publish = None
+        self.published = 0
+        self.heartbeats = 0
+        self.suppressed = 0
+        self.suppressed_since_publish = 0
+
+    def changed_fields(self, values):
+        if self.last_values is None:
+            return list(self.deadbands)
+        changed = []
+        for name, band in self.deadbands.items():
+            new, old = values.get(name), self.last_values.get(name)
+            if new is None or old is None:
+                if new is not old:
+                    changed.append(name)
+            elif band is None:
+                if new != old:
+                    changed.append(name)
+            elif abs(new - old) > band:
+                changed.append(name)
+        return changed
+
+    def check(self, values, now):
+        """Return (publish, reason); reason is "change", "heartbeat" or None."""
+        if self.changed_fields(values):
+            return True, "change"
+        if self.last_publish is None or now - self.last_publish >= self.heartbeat:
+            return True, "heartbeat"
+        return False, None
+
+    def record(self, values, now, publish, reason=None):
+        if not publish:
+            self.suppressed += 1
+            self.suppressed_since_publish += 1
+            return
+        self.last_values = {name: values.get(name) for name in self.deadbands}
+        self.last_publish = now
+        self.published += 1
+        if reason == "heartbeat":
+            self.heartbeats += 1
+        self.suppressed_since_publish = 0
+
+    def stats(self):
+        total = self.published + self.suppressed
+        return {
+            "published": self.published,
+            "heartbeats": self.heartbeats,
+            "suppressed": self.suppressed,
+            "suppressionRatio": self.suppressed / total if total else 0.0,
+        }
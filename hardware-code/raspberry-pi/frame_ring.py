@@ -0,0 +1,124 @@
+import time
+import numpy as np
+from multiprocessing import resource_tracker, shared_memory
+
+# -----------------------------
+# Shared-memory frame ring
+# -----------------------------
+# The capture process copies each camera frame once, into the next of a few
+# preallocated slots in one shared memory block. Other processes get numpy
+# views of those slots, so reading a frame copies nothing however many
+# readers there are.
+# Every slot records the sequence number of the frame it holds, or -1 while
+# it is being rewritten. A reader that holds a view for longer than the ring
+# takes to wrap around can tell with valid(seq): check it after converting
+# the frame, and drop the result if the slot was reused.
+#
+# Layout: int64 header [latest seq, slot seqs...], float64 timestamps, frames.
+POLL_INTERVAL = 0.002   # seconds between checks while waiting for a frame
+
+class FrameRing:
+    def __init__(self, shape, slots=4, dtype=np.uint8, name=None, create=True):
+        self.shape = tuple(shape)
+        self.slots = slots
+        self.dtype = np.dtype(dtype)
+        frame_bytes = int(np.prod(self.shape)) * self.dtype.itemsize
+        self._header_bytes = 8 * (1 + slots)
+        size = self._header_bytes + 8 * slots + frame_bytes * slots
+        self.owner = create
+        if create:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        else:
+            self.shm = _attach(name)
+        self._map()
+        if create:
+            self._header[:] = 0
+            self._times[:] = 0.0
+
+    def _map(self):
+        buf = self.shm.buf
+        self._header = np.ndarray((1 + self.slots,), dtype=np.int64, buffer=buf)
+        self._latest = self._header[:1]
+        self._slot_seq = self._header[1:]
+        self._times = np.ndarray((self.slots,), dtype=np.float64, buffer=buf, offset=self._header_bytes)
+        self._frames = np.ndarray((self.slots,) + self.shape, dtype=self.dtype, buffer=buf,
+                                  offset=self._header_bytes + 8 * self.slots)
+
+    # Passed to a spawned process, the ring re-attaches by name
+    def __getstate__(self):
+        return {"name": self.shm.name, "shape": self.shape, "slots": self.slots, "dtype": self.dtype.str}
+
+    def __setstate__(self, state):
+        self.__init__(state["shape"], state["slots"], state["dtype"], name=state["name"], create=False)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    # --- Writer (one process) ---
+    def write(self, frame, timestamp=None):
+        """Copy `frame` into the next slot; returns its sequence number."""
+        seq = int(self._latest[0]) + 1
+        slot = seq % self.slots
+        self._slot_seq[slot] = -1
+        np.copyto(self._frames[slot], frame)
+        self._times[slot] = time.monotonic() if timestamp is None else timestamp
+        self._slot_seq[slot] = seq
+        self._latest[0] = seq
+        return seq
+
+    # --- Readers ---
+    def latest_seq(self):
+        """Sequence number of the newest frame (0 before the first)."""
+        return int(self._latest[0])
+
+    def valid(self, seq):
+        """True while frame `seq` is still in its slot."""
+        return int(self._slot_seq[seq % self.slots]) == seq
+
+    def read(self, after=0, timeout=None):
+        """Wait for a frame newer than `after`.
+
+        Returns (seq, monotonic timestamp, read-only view), or
+        (None, None, None) on timeout. The view is only good while
+        valid(seq) holds.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            seq = self.latest_seq()
+            if seq > after:
+                slot = seq % self.slots
+                timestamp = float(self._times[slot])
+                view = self._frames[slot]
+                view.flags.writeable = False
+                if self.valid(seq):
+                    return seq, timestamp, view
+            if deadline is not None and time.monotonic() >= deadline:
+                return None, None, None
+            time.sleep(POLL_INTERVAL)
+
+    def close(self):
+        self._header = self._latest = self._slot_seq = self._times = self._frames = None
+        try:
+            self.shm.close()
+        except BufferError:
+            # A caller still holds a frame view; the mapping goes away with the process
+            pass
+
+    def unlink(self):
+        if self.owner:
+            self.shm.unlink()
+
+def _attach(name):
+    # Only the creating process may unlink the block. Before Python 3.13 an
+    # attaching process registers it with the resource tracker too, which
+    # would remove it when that process exits; skip the registration.
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        register = resource_tracker.register
+        resource_tracker.register = lambda name, rtype: None
+        try:
+            return shared_memory.SharedMemory(name=name)
+        finally:
+            resource_tracker.register = register
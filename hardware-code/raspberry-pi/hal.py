@@ -0,0 +1,346 @@
+import asyncio
+import math
+import os
+import random
+import time
+
+# -----------------------------
+# Hardware abstraction layer
+# -----------------------------
+# Every Pi module gets its devices from here instead of importing board,
+# busio, adafruit_dht, gpiod, gpiozero, Picamera2 or bleak directly.
+# SLEEPDUCK_DRIVERS selects the implementation:
+#   real  the hardware libraries (imported only when a device is created)
+#   sim   simulated devices with realistic latency and failure rates, so
+#         the whole pipeline runs and can be profiled on any Linux box
+DRIVERS = os.getenv("SLEEPDUCK_DRIVERS", "real").lower()
+
+# Simulation knobs
+SIM_DHT_FAILURE_RATE = float(os.getenv("SIM_DHT_FAILURE_RATE", "0.2"))
+SIM_DHT_READ_SECONDS = float(os.getenv("SIM_DHT_READ_SECONDS", "0.25"))
+SIM_BLE_DROP_RATE = float(os.getenv("SIM_BLE_DROP_RATE", "0.01"))
+SIM_BLE_MTU = int(os.getenv("SIM_BLE_MTU", "23"))   # default ATT MTU: 3 samples per frame
+SIM_CAMERA_FPS = float(os.getenv("SIM_CAMERA_FPS", "30"))
+SIM_NOISE_INTERVAL = float(os.getenv("SIM_NOISE_INTERVAL", "30"))   # mean seconds between noise bursts
+
+def simulated():
+    return DRIVERS == "sim"
+
+# -----------------------------
+# ADS1115 ADC
+# -----------------------------
+# A bare device: every read names its channel and settings, and the config
+# register is only rewritten when they differ from the previous read. In
+# continuous mode, repeated reads of one channel only fetch the conversion
+# register. adc_bus.py owns the devices and serializes access.
+class RealADS1115:
+    def __init__(self, address=0x48):
+        import board, busio
+        from adafruit_ads1x15.ads1115 import ADS1115
+        from adafruit_ads1x15.ads1x15 import Mode
+        from adafruit_ads1x15.analog_in import AnalogIn
+        self._Mode = Mode
+        self._AnalogIn = AnalogIn
+        self.address = address
+        self.i2c = busio.I2C(board.SCL, board.SDA)
+        self.ads = ADS1115(self.i2c, address=address)
+        self._inputs = {}
+        self._config = None
+        self.config_writes = 0
+
+    def read(self, index, gain, data_rate, continuous):
+        """Raw signed 16-bit conversion of input `index`."""
+        config = (index, gain, data_rate, continuous)
+        if config != self._config:
+            self.ads.gain = gain
+            self.ads.data_rate = data_rate
+            self.ads.mode = self._Mode.CONTINUOUS if continuous else self._Mode.SINGLE
+            # The driver only rewrites the config register when the channel
+            # changes; gain/rate/mode changes need it too
+            self.ads._last_pin_read = None
+            self._config = config
+            self.config_writes += 1
+        analog_in = self._inputs.get(index)
+        if analog_in is None:
+            analog_in = self._inputs[index] = self._AnalogIn(self.ads, index)
+        return analog_in.value
+
+class SimADS1115:
+    """Channel 0 behaves like the KY-018 divider in a dark room, channel 1
+    like the KY-037 microphone idling at mid-rail with some noise.
+
+    Single-shot reads take one conversion time; continuous reads of the
+    channel converted last return immediately, like the real chip.
+    """
+
+    def __init__(self, address=0x48):
+        self.address = address
+        self._config = None
+        self.config_writes = 0
+        self._last_convert = time.monotonic()
+        self._burst_until = 0.0
+
+    def _voltage(self, index):
+        if index == 1:
+            # Quiet hiss, with a short loud burst every SIM_NOISE_INTERVAL on average
+            now = time.monotonic()
+            if now >= self._burst_until and random.random() < (now - self._last_convert) / SIM_NOISE_INTERVAL:
+                self._burst_until = now + random.uniform(0.1, 0.5)
+            self._last_convert = now
+            burst = random.uniform(-0.3, 0.3) if now < self._burst_until else 0.0
+            return 1.65 + random.gauss(0, 0.004) + burst
+        return 3.0 + random.gauss(0, 0.01)
+
+    def read(self, index, gain, data_rate, continuous):
+        config = (index, gain, data_rate, continuous)
+        if config != self._config:
+            self._config = config
+            self.config_writes += 1
+            time.sleep(1.0 / data_rate)
+        elif not continuous:
+            time.sleep(1.0 / data_rate)
+        full_scale = 4.096 / gain
+        return max(-32768, min(32767, int(self._voltage(index) / full_scale * 32767)))
+
+def ads1115(address=0x48):
+    cls = SimADS1115 if simulated() else RealADS1115
+    return cls(address=address)
+
+# -----------------------------
+# DHT11
+# -----------------------------
+class SimDHT11:
+    """Mimics adafruit_dht: slow reads, frequent RuntimeError, and cached
+    values when polled faster than every 2 seconds."""
+
+    MIN_INTERVAL = 2.0
+
+    def __init__(self, pin):
+        self.pin = pin
+        self._last_read = 0.0
+        self._temperature = None
+        self._humidity = None
+
+    def _measure(self):
+        now = time.monotonic()
+        if now - self._last_read < self.MIN_INTERVAL:
+            return
+        self._last_read = now
+        time.sleep(SIM_DHT_READ_SECONDS)
+        if random.random() < SIM_DHT_FAILURE_RATE:
+            raise RuntimeError("Checksum did not validate. Try again.")
+        # Slow drift plus the occasional one-count flicker of the integer readings
+        flicker = (-1,) + (0,) * 8 + (1,)
+        self._temperature = 25 + math.sin(now / 3600) + random.choice(flicker)
+        self._humidity = 55 + 5 * math.sin(now / 5400) + random.choice(flicker)
+
+    @property
+    def temperature(self):
+        self._measure()
+        return self._temperature
+
+    @property
+    def humidity(self):
+        self._measure()
+        return self._humidity
+
+    def exit(self):
+        pass
+
+def dht11(pin="D17"):
+    if simulated():
+        return SimDHT11(pin)
+    import board
+    import adafruit_dht
+    return adafruit_dht.DHT11(getattr(board, pin))
+
+# -----------------------------
+# GPIO output line
+# -----------------------------
+class RealGPIOLine:
+    def __init__(self, chip, line, consumer):
+        import gpiod
+        self.chip = gpiod.Chip(chip)
+        self.line = self.chip.get_line(line)
+        self.line.request(consumer=consumer, type=gpiod.LINE_REQ_DIR_OUT)
+
+    def set_value(self, value):
+        self.line.set_value(value)
+
+    def release(self):
+        self.line.release()
+
+class SimGPIOLine:
+    def __init__(self, chip, line, consumer):
+        self.chip = chip
+        self.line = line
+        self.consumer = consumer
+        self.value = 0
+
+    def set_value(self, value):
+        self.value = value
+
+    def release(self):
+        pass
+
+def gpio_output(chip, line, consumer):
+    cls = SimGPIOLine if simulated() else RealGPIOLine
+    return cls(chip, line, consumer)
+
+# -----------------------------
+# Servo
+# -----------------------------
+class SimServo:
+    def __init__(self, pin, **kwargs):
+        self.pin = pin
+        self.angle = None
+        self.value = None
+
+def servo(pin, **kwargs):
+    if simulated():
+        return SimServo(pin, **kwargs)
+    from gpiozero import AngularServo
+    return AngularServo(pin, **kwargs)
+
+# -----------------------------
+# Camera
+# -----------------------------
+class SimCamera:
+    """Returns BGR frames at SIM_CAMERA_FPS: a dim, slightly noisy room."""
+
+    def __init__(self, size):
+        import numpy as np
+        self._np = np
+        width, height = size
+        self._base = np.full((height, width, 3), 40, dtype=np.uint8)
+        self._next_frame = time.monotonic()
+
+    def capture_array(self):
+        now = time.monotonic()
+        if now < self._next_frame:
+            time.sleep(self._next_frame - now)
+        self._next_frame = max(now, self._next_frame) + 1.0 / SIM_CAMERA_FPS
+        noise = self._np.random.randint(0, 8, size=self._base.shape, dtype=self._np.uint8)
+        return self._base + noise
+
+    def close(self):
+        pass
+
+def camera(size=(640, 480)):
+    if simulated():
+        return SimCamera(size)
+    from picamera2 import Picamera2
+    picam2 = Picamera2()
+    picam2.configure(picam2.create_preview_configuration(
+        main={"format": "BGR888", "size": size}
+    ))
+    picam2.start()
+    return picam2
+
+# -----------------------------
+# BLE notification source
+# -----------------------------
+def _no_mark(name):
+    pass
+
+# The ESP32 allows an MTU of 185 but only the client can start the exchange.
+# BlueZ does it when the connection is made; bleak reads the result back
+# only on request, so ask for it before notifications are enabled and log
+# how many samples the ESP32 can put in each frame.
+FRAME_SAMPLES = 4   # samples the ESP32 collects per second
+
+class RealBLESource:
+    def __init__(self, device_name, characteristic_uuid, scan_timeout=10.0):
+        self.device_name = device_name
+        self.characteristic_uuid = characteristic_uuid
+        self.scan_timeout = scan_timeout
+        self.mtu = None   # negotiated ATT MTU of the current connection
+
+    async def _negotiated_mtu(self, client):
+        # _acquire_mtu() only exists on the BlueZ backend; elsewhere mtu_size
+        # is already the negotiated value
+        acquire = getattr(getattr(client, "_backend", None), "_acquire_mtu", None)
+        if acquire is not None:
+            try:
+                await acquire()
+            except Exception as e:
+                print("BLE MTU exchange failed, assuming the default:", e)
+        return client.mtu_size
+
+    async def run(self, callback, stop_event, mark=None):
+        """Connect to the ESP32 and deliver notifications until stop_event.
+
+        `mark(name)` is called as the scan and connection progress (used
+        for the startup report).
+        """
+        from bleak import BleakClient, BleakScanner
+        mark = mark or _no_mark
+
+        # Scan for the device, stopping as soon as it advertises instead of
+        # waiting for a full discovery round
+        device = await BleakScanner.find_device_by_name(self.device_name, timeout=self.scan_timeout)
+        if device is None:
+            print("ESP32 device not found!")
+            return
+        mark("BLE device found")
+
+        print(f"Connecting to {self.device_name} ({device.address})...")
+
+        async with BleakClient(device) as ble_client:
+            connected = ble_client.is_connected
+            if connected:
+                print("Connected!")
+                from ble_frame import max_samples
+                self.mtu = await self._negotiated_mtu(ble_client)
+                samples = max_samples(self.mtu)
+                print(f"BLE MTU {self.mtu}: up to {samples} samples per frame")
+                if samples < FRAME_SAMPLES:
+                    print(f"BLE MTU too small for {FRAME_SAMPLES}-sample frames, the ESP32 will send them split")
+                await ble_client.start_notify(self.characteristic_uuid, callback)
+                mark("BLE notifications started")
+                print("Listening for notifications... Press Ctrl+C to exit")
+                try:
+                    while not stop_event.is_set():
+                        await asyncio.sleep(1)
+                except asyncio.CancelledError:
+                    pass
+            else:
+                print("BLE connection failed (is_connected is False)")
+
+class SimBLESource:
+    """Emits binary ESP32 frames (see ble_frame.py) with a sample every
+    250 ms, as many per frame as fit SIM_BLE_MTU (at most four, once per
+    second), dropping SIM_BLE_DROP_RATE of them in the air."""
+
+    def __init__(self, device_name, characteristic_uuid, sample_interval=0.25, mtu=SIM_BLE_MTU):
+        from ble_frame import max_samples
+        self.device_name = device_name
+        self.characteristic_uuid = characteristic_uuid
+        self.mtu = mtu
+        self.samples_per_frame = max(1, min(FRAME_SAMPLES, max_samples(mtu)))
+        self.interval = sample_interval * self.samples_per_frame
+
+    async def run(self, callback, stop_event, mark=None):
+        from ble_frame import encode_frame
+        print(f"Simulating {self.device_name}")
+        mark = mark or _no_mark
+        mark("BLE device found")
+        mark("BLE notifications started")
+        seq = 0
+        started = time.monotonic()
+        step_ms = int(self.interval * 1000 / self.samples_per_frame)
+        while not stop_event.is_set():
+            await asyncio.sleep(self.interval)
+            t0 = int((time.monotonic() - started) * 1000)
+            samples = [
+                (i * step_ms, random.randint(55, 70), random.random() < 0.05)
+                for i in range(self.samples_per_frame)
+            ]
+            frame = encode_frame(seq, t0, samples)
+            seq = (seq + self.samples_per_frame) & 0xFFFF
+            if random.random() >= SIM_BLE_DROP_RATE:
+                callback(None, frame)
+
+def ble_source(device_name, characteristic_uuid):
+    cls = SimBLESource if simulated() else RealBLESource
+    return cls(device_name, characteristic_uuid)
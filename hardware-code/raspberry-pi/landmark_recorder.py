@@ -0,0 +1,174 @@
+import io
+import os
+import re
+import threading
+import time
+from datetime import datetime, timedelta
+import numpy as np
+
+# -----------------------------
+# Landmark recorder
+# -----------------------------
+# Keeps the 33 MediaPipe landmarks of every inference so the posture
+# thresholds can be re-tuned against real nights. Records go into
+# preallocated .npy segments written through a memory map: appending is
+# one row assignment, no syscalls; pages are flushed every FLUSH_INTERVAL.
+#
+#   file    landmarks-<night>-<index>.npy, night = date the evening started
+#   record  t (epoch seconds, f8), pose (posture code, u1),
+#           landmarks (33 x [x, y, z, visibility], float16 or float32)
+#
+# Rows are filled in order and unused ones stay zero, so a segment cut short
+# (new night, crash) ends at the first row with t == 0; read_landmarks()
+# trims it. The oldest segments are deleted to keep the directory under
+# max_bytes (counted at full preallocated size, header included).
+LANDMARK_RECORD_DIR = os.getenv("LANDMARK_RECORD_DIR")   # unset = not recording
+LANDMARK_DTYPE = os.getenv("LANDMARK_DTYPE", "float16")
+MAX_BYTES = int(float(os.getenv("LANDMARK_RECORD_MAX_MB", "1024")) * 1024 * 1024)
+SEGMENT_RECORDS = 65536    # ~18 MB per segment in float16
+NIGHT_START_HOUR = 12      # a night runs noon to noon, so it isn't split at midnight
+FLUSH_INTERVAL = 30        # seconds between msync of the current segment
+NUM_LANDMARKS = 33
+
+_SEGMENT_NAME = re.compile(r"^landmarks-(\d{4}-\d{2}-\d{2})-(\d{3})\.npy$")
+
+def record_dtype(landmark_dtype=LANDMARK_DTYPE):
+    return np.dtype([("t", "<f8"), ("pose", "u1"), ("landmarks", landmark_dtype, (NUM_LANDMARKS, 4))])
+
+def night_of(ts):
+    return (datetime.fromtimestamp(ts) - timedelta(hours=NIGHT_START_HOUR)).strftime("%Y-%m-%d")
+
+def landmark_array(landmarks, out=None):
+    """(33, 4) float32 array of x, y, z, visibility from MediaPipe landmarks."""
+    out = np.empty((NUM_LANDMARKS, 4), dtype=np.float32) if out is None else out
+    for i, lm in enumerate(landmarks.landmark[:NUM_LANDMARKS]):
+        out[i] = (lm.x, lm.y, lm.z, lm.visibility or 0.0)
+    return out
+
+def list_segments(directory):
+    """Segment paths in recording order."""
+    try:
+        names = [name for name in os.listdir(directory) if _SEGMENT_NAME.match(name)]
+    except FileNotFoundError:
+        return []
+    return [os.path.join(directory, name) for name in sorted(names)]
+
+def read_landmarks(path):
+    """The written records of one segment (read-only memory map, trimmed)."""
+    records = np.load(path, mmap_mode="r")
+    empty = np.flatnonzero(records["t"] == 0)
+    return records[:empty[0]] if len(empty) else records
+
+class LandmarkRecorder:
+    def __init__(self, directory, landmark_dtype=LANDMARK_DTYPE, segment_records=SEGMENT_RECORDS,
+                 max_bytes=MAX_BYTES):
+        self.directory = directory
+        self.dtype = record_dtype(landmark_dtype)
+        self.segment_records = segment_records
+        self.max_bytes = max_bytes
+        self.segment = None       # memory-mapped record array
+        self.path = None
+        self.night = None
+        self.index = 0            # next row in the segment
+        self.records = 0
+        self.errors = 0
+        self.enabled = True
+        self._flushed = time.monotonic()
+        self._row = np.empty((NUM_LANDMARKS, 4), dtype=np.float32)
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _segment_bytes(self):
+        # The .npy header grows with the record dtype's description, so
+        # write it the way open_memmap() does and measure it
+        header = {"descr": np.lib.format.dtype_to_descr(self.dtype), "fortran_order": False,
+                  "shape": (self.segment_records,)}
+        buffer = io.BytesIO()
+        try:
+            np.lib.format.write_array_header_1_0(buffer, header)
+        except ValueError:
+            np.lib.format.write_array_header_2_0(buffer, header)   # header too long for format 1.0
+        return buffer.tell() + self.dtype.itemsize * self.segment_records
+
+    def disk_bytes(self):
+        total = 0
+        for path in list_segments(self.directory):
+            try:
+                total += os.path.getsize(path)
+            except OSError:
+                pass
+        return total
+
+    def _make_room(self):
+        # Oldest first, until the next segment fits
+        segments = list_segments(self.directory)
+        sizes = {path: os.path.getsize(path) for path in segments}
+        total = sum(sizes.values())
+        for path in segments:
+            if total + self._segment_bytes() <= self.max_bytes:
+                break
+            os.remove(path)
+            total -= sizes[path]
+            print(f"Landmark recorder: removed {os.path.basename(path)} to stay under "
+                  f"{self.max_bytes // (1024 * 1024)} MB")
+
+    def _open(self, night):
+        self._close_segment()
+        if night != self.night:
+            self.night = night
+            existing = [int(_SEGMENT_NAME.match(os.path.basename(p)).group(2))
+                        for p in list_segments(self.directory) if night in os.path.basename(p)]
+            number = max(existing) + 1 if existing else 0
+        else:
+            number = int(_SEGMENT_NAME.match(os.path.basename(self.path)).group(2)) + 1
+        self._make_room()
+        self.path = os.path.join(self.directory, f"landmarks-{night}-{number:03d}.npy")
+        self.segment = np.lib.format.open_memmap(self.path, mode="w+", dtype=self.dtype,
+                                                 shape=(self.segment_records,))
+        self.index = 0
+        print(f"Landmark recorder: writing {self.path}")
+
+    def _close_segment(self):
+        if self.segment is not None:
+            self.segment.flush()
+            self.segment = None   # dropping the last reference unmaps it
+
+    def record(self, landmarks, pose=0, ts=None):
+        """Append one inference's landmarks (MediaPipe result or (33, 4) array)."""
+        if not self.enabled or landmarks is None:
+            return
+        ts = time.time() if ts is None else ts
+        with self._lock:
+            try:
+                night = night_of(ts)
+                if self.segment is None or night != self.night or self.index >= self.segment_records:
+                    self._open(night)
+                row = self.segment[self.index]
+                row["landmarks"] = landmarks if isinstance(landmarks, np.ndarray) else \
+                    landmark_array(landmarks, self._row)
+                row["pose"] = pose
+                row["t"] = ts   # written last: a row counts once t is set
+                self.index += 1
+                self.records += 1
+                if time.monotonic() - self._flushed >= FLUSH_INTERVAL:
+                    self.segment.flush()
+                    self._flushed = time.monotonic()
+            except Exception as e:
+                # Recording is best effort; never let it stop pose detection
+                self.errors += 1
+                self.enabled = False
+                print("Landmark recorder error, recording stopped:", e)
+
+    def close(self):
+        with self._lock:
+            self._close_segment()
+
+    def stats(self):
+        return {"records": self.records, "segment": self.path, "row": self.index,
+                "errors": self.errors, "enabled": self.enabled}
+
+def recorder_from_env():
+    """A recorder for LANDMARK_RECORD_DIR, or None when it isn't set."""
+    if not LANDMARK_RECORD_DIR:
+        return None
+    return LandmarkRecorder(LANDMARK_RECORD_DIR)
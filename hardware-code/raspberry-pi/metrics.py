@@ -0,0 +1,198 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# -----------------------------
+# Pipeline metrics
+# -----------------------------
+# A tiny in-process registry rendered in the Prometheus text format, so a
+# deployed Pi can be scraped (or polled over MQTT) without extra packages.
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+
+_registry = []
+_registry_lock = threading.Lock()
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+def _format_labels(key):
+    if not key:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in key) + "}"
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+class _Metric:
+    """Labelled values that are set directly, or read from `fn` at scrape time."""
+
+    kind = "untyped"
+
+    def __init__(self, name, help, fn=None):
+        self.name = name
+        self.help = help
+        self.fn = fn
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def samples(self):
+        # None means "no value yet" (e.g. before a sensor's first reading);
+        # the sample is left out rather than rendered
+        if self.fn is not None:
+            try:
+                value = self.fn()
+            except Exception:
+                return []
+            return [(self.name, (), value)] if value is not None else []
+        with self._lock:
+            return [(self.name, key, value) for key, value in self._values.items() if value is not None]
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[_label_key(labels)] = value
+
+class Histogram:
+    """Observed values in buckets; `fn`, if given, returns the state() to
+    render instead (e.g. one kept by another process)."""
+
+    kind = "histogram"
+
+    def __init__(self, name, help, buckets=DEFAULT_BUCKETS, fn=None):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self.fn = fn
+        self._values = {}   # label key -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def time(self, **labels):
+        return _Timer(self, labels)
+
+    def state(self, **labels):
+        """[bucket counts..., sum, count] for `labels`, or None before the first observation."""
+        with self._lock:
+            state = self._values.get(_label_key(labels))
+            return list(state) if state is not None else None
+
+    def samples(self):
+        out = []
+        if self.fn is not None:
+            try:
+                state = self.fn()
+            except Exception:
+                return []
+            items = [((), list(state))] if state is not None and len(state) == len(self.buckets) + 2 else []
+        else:
+            with self._lock:
+                items = [(key, list(state)) for key, state in self._values.items()]
+        for key, state in items:
+            for bound, count in zip(self.buckets, state):
+                out.append((self.name + "_bucket", key + (("le", _format_value(bound)),), count))
+            out.append((self.name + "_bucket", key + (("le", "+Inf"),), state[-1]))
+            out.append((self.name + "_sum", key, state[-2]))
+            out.append((self.name + "_count", key, state[-1]))
+        return out
+
+class _Timer:
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started, **self.labels)
+        return False
+
+def _register(metric):
+    with _registry_lock:
+        for existing in _registry:
+            if existing.name == metric.name:
+                return existing
+        _registry.append(metric)
+    return metric
+
+def counter(name, help, fn=None):
+    return _register(Counter(name, help, fn))
+
+def gauge(name, help, fn=None):
+    return _register(Gauge(name, help, fn))
+
+def histogram(name, help, buckets=DEFAULT_BUCKETS, fn=None):
+    return _register(Histogram(name, help, buckets, fn))
+
+# -----------------------------
+# Exposition
+# -----------------------------
+def render():
+    """Return every registered metric in Prometheus text format."""
+    lines = []
+    with _registry_lock:
+        metrics = list(_registry)
+    for metric in metrics:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for name, key, value in metric.samples():
+            lines.append(f"{name}{_format_labels(key)} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+def snapshot():
+    """Flat {"name{labels}": value} dict, used for the MQTT metrics topic."""
+    out = {}
+    with _registry_lock:
+        metrics = list(_registry)
+    for metric in metrics:
+        for name, key, value in metric.samples():
+            if name.endswith("_bucket"):
+                continue
+            out[name + _format_labels(key)] = value
+    return out
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_http_server(port, host="0.0.0.0"):
+    """Serve /metrics from a daemon thread; returns the server."""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
@@ -0,0 +1,74 @@
+import os
+import time
+import numpy as np
+
+# -----------------------------
+# Motion gate for pose inference
+# -----------------------------
+# A sleeping person barely moves, so most frames would give MediaPipe the
+# same answer. Each frame is reduced to a small grayscale image (strided,
+# no resampling) and compared with the frame the last inference saw; the
+# model only runs when enough pixels changed or the pose got too old.
+MOTION_THRESHOLD = float(os.getenv("POSE_MOTION_THRESHOLD", "0.01"))   # fraction of pixels that must change
+PIXEL_DELTA = int(os.getenv("POSE_PIXEL_DELTA", "12"))                 # gray levels that count as a change
+MAX_STALENESS = float(os.getenv("POSE_MAX_STALENESS", "10"))           # seconds between forced inferences
+DOWNSCALE = 8                                                          # keep every 8th pixel (640x480 -> 80x60)
+
+class MotionGate:
+    def __init__(self, threshold=MOTION_THRESHOLD, pixel_delta=PIXEL_DELTA,
+                 max_staleness=MAX_STALENESS, downscale=DOWNSCALE):
+        self.threshold = threshold
+        self.pixel_delta = pixel_delta
+        self.max_staleness = max_staleness
+        self.downscale = downscale
+        self.reference = None        # small gray frame of the last inference
+        self.reference_time = None
+        self.score = 0.0             # changed-pixel fraction of the last frame
+        self.frames = 0
+        self.skipped = 0
+        self.reasons = {"first": 0, "motion": 0, "stale": 0}
+
+    def small_gray(self, frame):
+        small = frame[::self.downscale, ::self.downscale]
+        if small.ndim == 3:
+            # Integer BT.601 luma; channel order doesn't matter much for differencing
+            small = (small[..., 0].astype(np.uint16) * 29 + small[..., 1].astype(np.uint16) * 150
+                     + small[..., 2].astype(np.uint16) * 77) >> 8
+        return small.astype(np.int16)
+
+    def check(self, frame, now=None):
+        """Returns (run inference?, reason). Call accept() after running it."""
+        now = time.monotonic() if now is None else now
+        self.frames += 1
+        gray = self.small_gray(frame)
+        self._pending = gray
+        if self.reference is None or self.reference.shape != gray.shape:
+            return True, "first"
+        changed = np.count_nonzero(np.abs(gray - self.reference) > self.pixel_delta)
+        self.score = float(changed) / gray.size
+        if self.score >= self.threshold:
+            return True, "motion"
+        if now - self.reference_time >= self.max_staleness:
+            return True, "stale"
+        self.skipped += 1
+        return False, None
+
+    def accept(self, reason, now=None):
+        """The frame passed to the last check() was inferred; make it the reference."""
+        self.reference = self._pending
+        self.reference_time = time.monotonic() if now is None else now
+        self.reasons[reason] = self.reasons.get(reason, 0) + 1
+
+    def skip_ratio(self):
+        return self.skipped / self.frames if self.frames else 0.0
+
+    def stats(self):
+        return {
+            "frames": self.frames,
+            "skipped": self.skipped,
+            "skipRatio": round(self.skip_ratio(), 3),
+            "reasons": dict(self.reasons),
+            "threshold": self.threshold,
+            "pixelDelta": self.pixel_delta,
+            "maxStaleness": self.max_staleness,
+        }
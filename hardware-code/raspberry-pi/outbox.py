@@ -0,0 +1,150 @@
+import sqlite3
+import time
+import paho.mqtt.client as mqtt
+
+# -----------------------------
+# Durable outbox (SQLite, WAL)
+# -----------------------------
+class Outbox:
+    """On-disk FIFO of messages waiting for a broker acknowledgement.
+
+    Messages are written before they are published and only deleted once
+    acknowledged, so an outage or a restart loses nothing. When more than
+    `max_messages` are stored, the oldest are evicted first.
+    """
+
+    def __init__(self, path, max_messages=50000):
+        self.max_messages = max_messages
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS outbox ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " topic TEXT NOT NULL,"
+            " payload BLOB NOT NULL,"
+            " created REAL NOT NULL)"
+        )
+        self.conn.commit()
+        self.count = self.conn.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+        self.evicted = 0
+
+    def __len__(self):
+        return self.count
+
+    def put(self, topic, payload):
+        cur = self.conn.execute(
+            "INSERT INTO outbox (topic, payload, created) VALUES (?, ?, ?)",
+            (topic, payload, time.time()),
+        )
+        self.count += 1
+        if self.count > self.max_messages:
+            overflow = self.count - self.max_messages
+            self.conn.execute(
+                "DELETE FROM outbox WHERE id IN (SELECT id FROM outbox ORDER BY id LIMIT ?)",
+                (overflow,),
+            )
+            self.count -= overflow
+            self.evicted += overflow
+        self.conn.commit()
+        return cur.lastrowid
+
+    def oldest(self, limit, skip=()):
+        """Return up to `limit` (id, topic, payload) rows, oldest first."""
+        rows = self.conn.execute(
+            "SELECT id, topic, payload FROM outbox ORDER BY id LIMIT ?",
+            (limit + len(skip),),
+        ).fetchall()
+        return [row for row in rows if row[0] not in skip][:limit]
+
+    def ack(self, msg_ids):
+        if not msg_ids:
+            return
+        deleted = self.conn.executemany(
+            "DELETE FROM outbox WHERE id = ?", [(i,) for i in msg_ids]
+        ).rowcount
+        self.conn.commit()
+        self.count -= deleted
+
+    def close(self):
+        self.conn.close()
+
+# -----------------------------
+# Outbox -> MQTT sender
+# -----------------------------
+class OutboxSender:
+    """Publishes outbox messages with QoS 1 and acks them on PUBACK.
+
+    `send` stores a message and publishes it right away when connected.
+    `poll` must be called periodically from the same thread: it acks
+    delivered messages, forgets publishes that timed out and replays at
+    most `batch_size` backlogged messages per call, so catch-up after an
+    outage never starves live traffic.
+    """
+
+    def __init__(self, client, outbox, qos=1, batch_size=20, max_inflight=100, inflight_timeout=60):
+        self.client = client
+        self.outbox = outbox
+        self.qos = qos
+        self.batch_size = batch_size
+        self.max_inflight = max_inflight
+        self.inflight_timeout = inflight_timeout
+        self.connected = False
+        self.inflight = {}   # outbox id -> (MQTTMessageInfo, sent monotonic time)
+        self.sent = 0
+        self.failed = 0
+        self.replayed = 0
+
+    def _publish(self, msg_id, topic, payload):
+        try:
+            info = self.client.publish(topic, payload, qos=self.qos)
+        except Exception as e:
+            print("MQTT publish failed:", e)
+            self.failed += 1
+            return None
+        if info.rc != mqtt.MQTT_ERR_SUCCESS:
+            self.failed += 1
+            return None
+        self.inflight[msg_id] = (info, time.monotonic())
+        self.sent += 1
+        return info
+
+    def send(self, topic, payload):
+        """Store then publish; returns the MQTTMessageInfo or None if deferred."""
+        msg_id = self.outbox.put(topic, payload)
+        if not self.connected or len(self.inflight) >= self.max_inflight:
+            return None
+        return self._publish(msg_id, topic, payload)
+
+    def poll(self):
+        now = time.monotonic()
+        acked = []
+        for msg_id, (info, sent_at) in list(self.inflight.items()):
+            if info.is_published():
+                acked.append(msg_id)
+                del self.inflight[msg_id]
+            elif now - sent_at > self.inflight_timeout:
+                # Left in the outbox, so it gets replayed
+                del self.inflight[msg_id]
+                self.failed += 1
+        self.outbox.ack(acked)
+
+        if not self.connected:
+            return
+        budget = min(self.batch_size, self.max_inflight - len(self.inflight))
+        if budget <= 0:
+            return
+        for msg_id, topic, payload in self.outbox.oldest(budget, skip=self.inflight):
+            if self._publish(msg_id, topic, payload) is None:
+                break
+            self.replayed += 1
+
+    def stats(self):
+        return {
+            "queued": len(self.outbox),
+            "inflight": len(self.inflight),
+            "sent": self.sent,
+            "failed": self.failed,
+            "replayed": self.replayed,
+            "evicted": self.outbox.evicted,
+        }
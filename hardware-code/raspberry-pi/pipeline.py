@@ -0,0 +1,183 @@
+import json
+import math
+import time
+from datetime import datetime
+from aggregator import WindowAggregator
+from rollup import RollupCascade
+from codec import encode_window
+from deadband import ChangeFilter
+from ble_frame import FrameDecoder
+from posture import PostureWindow, posture_name
+
+# -----------------------------
+# Window aggregation and publishing
+# -----------------------------
+# Everything between "a BLE notification arrived" and "a message is handed
+# to the outbox". It has no hardware dependencies, so sendData and the
+# replay harness (replay.py) run exactly the same code.
+SENSOR_FIELDS = ("heartRate", "motion", "humid", "temp", "sound", "brightness")
+PI_FIELDS = ("brightness", "humid", "temp", "sound")
+
+# --- Deadbands for change-driven publishing (None = exact match) ---
+PUBLISH_DEADBANDS = {
+    "heartRate": 3,     # bpm
+    "motion": 0.1,      # fraction of notifications with motion
+    "humid": 2,         # %
+    "temp": 0.5,        # °C
+    "sound": 5,         # %
+    "brightness": 5,    # %
+    "light": None,
+    "posture": None,
+}
+# Windows with turns go out even when nothing above changed (see flush)
+
+# --- On-device rollups, published on sensor/<name> ---
+ROLLUP_LEVELS = [("1m", 60), ("5m", 300)]
+
+def _quiet(*args, **kwargs):
+    pass
+
+class WindowPipeline:
+    """Collects samples for the current window and publishes it on flush.
+
+    `send(topic, payload)` is called for every outgoing message and may
+    return an MQTTMessageInfo (or None). `payload_format` is "json",
+    "binary" or "both"; `publish_mode` is "always" or "change".
+    """
+
+    def __init__(self, send, payload_format="json", publish_mode="always",
+                 heartbeat=300, log=print):
+        self.send = send
+        self.payload_format = payload_format
+        self.publish_mode = publish_mode
+        self.log = log or _quiet
+        self.decoder = FrameDecoder()
+        self.window = WindowAggregator(SENSOR_FIELDS)
+        self.change_filter = ChangeFilter(PUBLISH_DEADBANDS, heartbeat)
+        self.rollups = RollupCascade(ROLLUP_LEVELS, SENSOR_FIELDS)
+        self.postures = PostureWindow()
+        self.light = False
+        self.acoustics = None         # (summary, events) from the microphone, set before flush
+        self.notification_count = 0   # notifications received in the current window
+        self.window_seq = 0           # sequence number of the next published window
+
+    def add_notification(self, data, pi_samples, posture, ts=None):
+        """Add one ESP32 notification plus the Pi readings and posture (code
+        or name) taken with it at `ts` (epoch seconds, default now).
+
+        Returns the decoded ESP32 samples (empty if the frame was invalid).
+        """
+        self.notification_count += 1
+
+        # Decode the binary (or legacy JSON) frame from ESP32
+        lost_before = self.decoder.lost
+        samples = self.decoder.decode(data)
+        if not samples:
+            return samples
+        if self.decoder.lost != lost_before:
+            self.log(f"    Lost {self.decoder.lost - lost_before} ESP32 sample(s) ({self.decoder.lost} total)")
+
+        # Collect from ESP32
+        for sample in samples:
+            self.window.add("heartRate", sample["heartRate"])
+            self.window.add("motion", sample["motion"])
+
+        # Collect from Raspberry PI5
+        for name in PI_FIELDS:
+            self.window.add(name, pi_samples.get(name))
+        self.postures.add(posture, time.time() if ts is None else ts)
+        return samples
+
+    def _send(self, topic, payload, label):
+        try:
+            info = self.send(topic, payload)
+            self.log(f"    Published {label}, mid={getattr(info, 'mid', None)}, rc={getattr(info, 'rc', None)}")
+        except Exception as e:
+            self.log(f"Outbox write {topic} failed:", e)
+
+    def flush(self, window_start, window_end):
+        """Publish the window [window_start, window_end) and start a new one."""
+        self.log("=======================================================")
+        now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        self.log(f"[{now}] Pushing data to MQTT broker...")
+
+        # Fields without any sample in this window are sent as null and listed
+        # in "missing" instead of being averaged to 0
+        counts = self.window.counts()
+        counts["posture"] = self.postures.total
+        missing = [name for name, count in counts.items() if count == 0]
+        window_info = {
+            "windowStart": round(window_start, 3),
+            "windowEnd": round(window_end, 3),
+            "samples": self.notification_count,
+            "counts": counts,
+            "missing": missing,
+            "missingSamples": self.window.missing(),
+        }
+
+        sensor_obj = {name: self.window.mean(name) for name in SENSOR_FIELDS}
+        sensor_obj["light"] = self.light or False
+        sensor_obj.update(window_info)
+        acoustics, events = self.acoustics or (None, [])
+        if acoustics is not None:
+            sensor_obj["acoustics"] = acoustics
+
+        # Posture: the window's mode plus counts and dwell seconds indexed by
+        # posture code, and the run-length log as [code, start, end] offsets
+        postures = self.postures.close(window_start, window_end)
+        window_posture = posture_name(postures["posture"])
+        posture_obj = {
+            "posture": window_posture,
+            "postureCode": postures["posture"],
+            "postureCounts": postures["counts"],
+            "dwell": postures["dwell"],
+            "transitions": postures["transitions"],
+            "turns": postures["turns"],
+            **window_info,
+        }
+
+        publish, reason = True, None
+        if self.publish_mode == "change":
+            current = dict(sensor_obj, posture=window_posture)
+            publish, reason = self.change_filter.check(current, window_end)
+            if not publish and postures["turns"] > 0:
+                publish, reason = True, "turns"
+            # Windows skipped since the previous publish, for the backend
+            sensor_obj["suppressed"] = posture_obj["suppressed"] = self.change_filter.suppressed_since_publish
+            self.change_filter.record(current, window_end, publish, reason)
+            if not publish:
+                self.log(f"    Window unchanged, not published ({self.change_filter.stats()})")
+            else:
+                self.log(f"    Publishing on {reason} ({self.change_filter.stats()})")
+
+        if publish and self.payload_format in ("json", "both"):
+            sensorPayload = json.dumps(sensor_obj)
+            posturePayload = json.dumps(posture_obj)
+            self._send("sensor", sensorPayload, f"sensor: {sensorPayload}")
+            self._send("posture", posturePayload, f"posture: {posturePayload}")
+
+        if publish and self.payload_format in ("binary", "both"):
+            windowPayload = encode_window(self.window_seq, window_start, window_end, self.notification_count,
+                                          sensor_obj, postures["posture"], self.light)
+            self._send("window", windowPayload, f"window #{self.window_seq}: {len(windowPayload)} bytes")
+        if publish:
+            self.window_seq += 1
+
+        # Sound events are discrete, so they bypass the change filter
+        for event in events:
+            eventPayload = json.dumps(event)
+            self._send("sound/event", eventPayload, f"sound/event: {eventPayload}")
+
+        for name, rollup_obj in self.rollups.add(self.window, postures, window_start, window_end):
+            rollupPayload = json.dumps(rollup_obj)
+            self._send(f"sensor/{name}", rollupPayload, f"sensor/{name}: {rollupPayload}")
+
+        # reset buffers
+        self.window.reset()
+        self.acoustics = None
+        self.notification_count = 0
+        return publish
+
+def next_window_boundary(ts, interval):
+    """First multiple of interval strictly after ts."""
+    return (math.floor(ts / interval) + 1) * interval
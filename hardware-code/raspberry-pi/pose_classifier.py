@@ -0,0 +1,57 @@
+import numpy as np
+from posture import UNKNOWN, SUPINE, PRONE, LEFT_SIDE, RIGHT_SIDE
+
+# -----------------------------
+# Vectorized sleep pose classifier
+# -----------------------------
+# Same rules as camera.detect_sleep_pose, applied to a whole (N, 33, 4)
+# landmark array (x, y, z, visibility per MediaPipe landmark, as written by
+# landmark_recorder.py) at once:
+#   nose in front of the shoulders by more than Z_MARGIN   supine
+#   nose behind the shoulders by more than Z_MARGIN        prone
+#   shoulders and hips both narrower than SIDE_DX in x     left/right side,
+#                                                          by the lower shoulder
+#   otherwise                                              unknown
+# Values are compared in float64, like the scalar code does with the
+# landmarks' Python floats, so both give identical results.
+Z_MARGIN = 0.05
+SIDE_DX = 0.15
+
+# MediaPipe PoseLandmark indices and landmark columns
+NOSE = 0
+LEFT_SHOULDER = 11
+RIGHT_SHOULDER = 12
+LEFT_HIP = 23
+RIGHT_HIP = 24
+X, Y, Z, VISIBILITY = 0, 1, 2, 3
+
+def features(landmarks):
+    """The threshold-independent part: per-row arrays the rules compare."""
+    lm = np.asarray(landmarks, dtype=np.float64)
+    if lm.ndim == 2:
+        lm = lm[np.newaxis]
+    return {
+        "nose_z": lm[:, NOSE, Z],
+        "shoulder_z": (lm[:, LEFT_SHOULDER, Z] + lm[:, RIGHT_SHOULDER, Z]) / 2,
+        "shoulder_dx": np.abs(lm[:, LEFT_SHOULDER, X] - lm[:, RIGHT_SHOULDER, X]),
+        "hip_dx": np.abs(lm[:, LEFT_HIP, X] - lm[:, RIGHT_HIP, X]),
+        "left_shoulder_y": lm[:, LEFT_SHOULDER, Y],
+        "right_shoulder_y": lm[:, RIGHT_SHOULDER, Y],
+    }
+
+def classify_features(f, z_margin=Z_MARGIN, side_dx=SIDE_DX):
+    """Posture codes (uint8) from features(); cheap enough to call per threshold setting."""
+    side = (f["shoulder_dx"] < side_dx) & (f["hip_dx"] < side_dx)
+    # np.select takes the first true condition, like the scalar if/elif chain
+    return np.select(
+        [f["nose_z"] < f["shoulder_z"] - z_margin,
+         f["nose_z"] > f["shoulder_z"] + z_margin,
+         side & (f["left_shoulder_y"] > f["right_shoulder_y"]),
+         side & (f["right_shoulder_y"] > f["left_shoulder_y"])],
+        [SUPINE, PRONE, LEFT_SIDE, RIGHT_SIDE],
+        UNKNOWN,
+    ).astype(np.uint8)
+
+def classify(landmarks, z_margin=Z_MARGIN, side_dx=SIDE_DX):
+    """Posture codes for an (N, 33, 4) landmark array (or one (33, 4) set)."""
+    return classify_features(features(landmarks), z_margin, side_dx)
@@ -0,0 +1,217 @@
+import os
+import time
+from collections import deque
+
+# -----------------------------
+# Pose quality controller
+# -----------------------------
+# Picks the pose settings from a ladder of levels, cheapest first, using
+# the measured inference latency (EWMA per level):
+#   - step down when an inference takes longer than LATENCY_BUDGET, or when
+#     staying within CPU_BUDGET (share of one core) would need fewer than
+#     MIN_RATE inferences per second;
+#   - step up after UPGRADE_COOLDOWN when the next level's latency is known
+#     to fit with room to spare, or hasn't been measured for a while.
+# Within a level the inference rate is lowered further to stay in the CPU
+# budget. The camera keeps capturing at full size; frames are cropped to the
+# sleeper's region of interest and downscaled to the level's size first.
+LEVELS = (
+    # (model complexity, inference width, height, max inferences per second)
+    (0, 320, 240, 2),
+    (0, 480, 360, 5),
+    (1, 480, 360, 5),
+    (1, 640, 480, 10),
+    (2, 640, 480, 10),
+)
+DEFAULT_LEVEL = int(os.getenv("POSE_QUALITY_LEVEL", "3"))      # level 3 = the old fixed settings
+LATENCY_BUDGET = float(os.getenv("POSE_LATENCY_BUDGET", "0.2"))  # seconds per inference
+CPU_BUDGET = float(os.getenv("POSE_CPU_BUDGET", "0.5"))          # share of one core
+USE_ROI = os.getenv("POSE_ROI", "1") != "0"
+
+MIN_RATE = 1.0           # inferences per second a level must still allow
+MIN_SAMPLES = 10         # inferences at a level before judging it
+UPGRADE_MARGIN = 0.7     # the next level must fit in this share of the budget
+UPGRADE_COOLDOWN = 60    # seconds after a change before stepping up
+LATENCY_MEMORY = 300     # seconds a level's measured latency is trusted
+
+ROI_HISTORY = 10         # recent landmark boxes merged into the region
+ROI_MARGIN = 0.15        # added around the merged box, share of the frame
+ROI_MAX_AREA = 0.6       # larger regions aren't worth cropping
+ROI_MISSES = 2           # inferences without a person before going back to full frame
+ROI_VISIBILITY = 0.5
+
+def level_name(level):
+    complexity, width, height, _ = LEVELS[level]
+    return f"c{complexity}-{width}x{height}"
+
+class PoseQualityController:
+    def __init__(self, latency_budget=LATENCY_BUDGET, cpu_budget=CPU_BUDGET, level=DEFAULT_LEVEL,
+                 use_roi=USE_ROI, alpha=0.2):
+        self.latency_budget = latency_budget
+        self.cpu_budget = cpu_budget
+        self.level = max(0, min(level, len(LEVELS) - 1))
+        self.use_roi = use_roi
+        self.alpha = alpha
+        self.latency = {}        # level -> (EWMA seconds, monotonic time of the last sample)
+        self.samples = 0         # inferences at the current level
+        self.disabled = set()    # levels whose model couldn't be loaded
+        self.changes = 0
+        self.changed = time.monotonic()
+        self.roi = None          # (x0, y0, x1, y1) normalized, or None for the full frame
+        self._boxes = deque(maxlen=ROI_HISTORY)
+        self._misses = 0
+
+    # --- Current settings ---
+    @property
+    def complexity(self):
+        return LEVELS[self.level][0]
+
+    @property
+    def size(self):
+        return LEVELS[self.level][1:3]
+
+    @property
+    def max_rate(self):
+        return LEVELS[self.level][3]
+
+    def current_latency(self):
+        entry = self.latency.get(self.level)
+        return entry[0] if entry else None
+
+    def interval(self):
+        """Seconds between inferences: the level's rate cap, lowered further
+        so inference stays within the CPU budget."""
+        interval = 1.0 / self.max_rate
+        latency = self.current_latency()
+        if latency is not None:
+            interval = max(interval, latency / self.cpu_budget)
+        return interval
+
+    # --- Control ---
+    def _fits(self, latency, margin=1.0):
+        return latency <= self.latency_budget * margin and self.cpu_budget / latency >= MIN_RATE
+
+    def _set_level(self, level, now, reason):
+        print(f"Pose quality: {level_name(self.level)} -> {level_name(level)} ({reason})")
+        self.level = level
+        self.samples = 0
+        self.changes += 1
+        self.changed = now
+
+    def _neighbour(self, step):
+        level = self.level + step
+        while 0 <= level < len(LEVELS) and level in self.disabled:
+            level += step
+        return level if 0 <= level < len(LEVELS) else None
+
+    def observe(self, latency, now=None):
+        """Record one inference's latency (seconds) and adjust the level."""
+        now = time.monotonic() if now is None else now
+        entry = self.latency.get(self.level)
+        if entry is None or now - entry[1] > LATENCY_MEMORY:
+            ewma = latency   # nothing recent to smooth with
+        else:
+            ewma = entry[0] + self.alpha * (latency - entry[0])
+        self.latency[self.level] = (ewma, now)
+        self.samples += 1
+        if self.samples < MIN_SAMPLES:
+            return
+
+        if not self._fits(ewma):
+            lower = self._neighbour(-1)
+            if lower is not None:
+                self._set_level(lower, now, f"{ewma * 1000:.0f} ms over budget")
+            return
+        if now - self.changed < UPGRADE_COOLDOWN:
+            return
+        higher = self._neighbour(1)
+        if higher is None:
+            return
+        known = self.latency.get(higher)
+        if known is None or now - known[1] > LATENCY_MEMORY:
+            self._set_level(higher, now, "probing")
+        elif self._fits(known[0], UPGRADE_MARGIN):
+            self._set_level(higher, now, f"{known[0] * 1000:.0f} ms fits")
+
+    def disable(self, level, reason):
+        """Take a level out of the ladder (e.g. its model failed to load)."""
+        self.disabled.add(level)
+        if level == self.level:
+            lower = self._neighbour(-1)
+            if lower is None:
+                lower = self._neighbour(1)
+            if lower is not None:
+                self._set_level(lower, time.monotonic(), reason)
+
+    # --- Region of interest ---
+    def update_roi(self, landmarks):
+        """Grow or drop the crop region from an inference's landmarks
+        (already in full-frame coordinates), or None when nobody was found."""
+        if not self.use_roi:
+            return
+        points = [(lm.x, lm.y) for lm in landmarks.landmark
+                  if (lm.visibility or 0.0) >= ROI_VISIBILITY] if landmarks else []
+        if not points:
+            self._misses += 1
+            if self._misses >= ROI_MISSES:
+                self.roi = None
+                self._boxes.clear()
+            return
+        self._misses = 0
+        xs, ys = zip(*points)
+        self._boxes.append((min(xs), min(ys), max(xs), max(ys)))
+        x0 = max(0.0, min(b[0] for b in self._boxes) - ROI_MARGIN)
+        y0 = max(0.0, min(b[1] for b in self._boxes) - ROI_MARGIN)
+        x1 = min(1.0, max(b[2] for b in self._boxes) + ROI_MARGIN)
+        y1 = min(1.0, max(b[3] for b in self._boxes) + ROI_MARGIN)
+        self.roi = (x0, y0, x1, y1) if (x1 - x0) * (y1 - y0) < ROI_MAX_AREA else None
+
+    def prepare(self, frame):
+        """Crop `frame` to the region of interest and shrink it to the
+        level's size (aspect kept, never enlarged).
+
+        Returns (image, roi used); pass the roi to to_frame().
+        """
+        import cv2
+        roi = self.roi
+        if roi is not None:
+            h, w = frame.shape[:2]
+            frame = frame[int(roi[1] * h):int(roi[3] * h), int(roi[0] * w):int(roi[2] * w)]
+        h, w = frame.shape[:2]
+        width, height = self.size
+        scale = min(1.0, width / w, height / h)
+        if scale < 1.0:
+            frame = cv2.resize(frame, (max(1, int(w * scale)), max(1, int(h * scale))),
+                               interpolation=cv2.INTER_AREA)
+        return frame, roi
+
+    @staticmethod
+    def to_frame(landmarks, roi):
+        """Map landmarks from a cropped image back to full-frame coordinates, in place."""
+        if landmarks is None or roi is None:
+            return landmarks
+        x0, y0, x1, y1 = roi
+        for lm in landmarks.landmark:
+            lm.x = x0 + lm.x * (x1 - x0)
+            lm.y = y0 + lm.y * (y1 - y0)
+            lm.z = lm.z * (x1 - x0)   # z uses the image width's scale
+        return landmarks
+
+    def stats(self):
+        latency = self.current_latency()
+        return {
+            "level": self.level,
+            "complexity": self.complexity,
+            "width": self.size[0],
+            "height": self.size[1],
+            "maxRate": self.max_rate,
+            "rate": round(1.0 / self.interval(), 2),
+            "latencyMs": round(latency * 1000, 1) if latency is not None else None,
+            "levelLatencyMs": {level_name(level): round(entry[0] * 1000, 1)
+                               for level, entry in sorted(self.latency.items())},
+            "roi": [round(v, 3) for v in self.roi] if self.roi is not None else None,
+            "latencyBudgetMs": round(self.latency_budget * 1000, 1),
+            "cpuBudget": self.cpu_budget,
+            "disabled": sorted(level_name(level) for level in self.disabled),
+            "changes": self.changes,
+        }
@@ -0,0 +1,145 @@
+"""Re-label recorded landmarks with other pose classifier thresholds.
+
+Record on the Pi with LANDMARK_RECORD_DIR=landmarks python sendData.py, then:
+
+    python pose_sweep.py landmarks                     # current thresholds
+    python pose_sweep.py landmarks --z-margin 0.03 0.05 0.08 --side-dx 0.1 0.15 0.2
+    python pose_sweep.py landmarks --nights 2026-10-17 2026-10-18 --json
+
+Every combination of --z-margin and --side-dx is applied to every recorded
+set of landmarks (segments are spread over --workers processes) and the
+posture distribution, transitions and turns are reported per setting.
+"Relabeled" counts records whose posture differs from the one recorded
+live; with float16 recordings a few near a threshold differ even at the
+current setting, from rounding.
+"""
+import argparse
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from landmark_recorder import list_segments, read_landmarks, night_of
+from pose_classifier import Z_MARGIN, SIDE_DX, features, classify_features
+from posture import POSTURES, LYING
+
+MAX_GAP = 30   # seconds a record's posture can hold before the next one (camera off, ...)
+_LYING = np.array(sorted(LYING), dtype=np.uint8)
+
+# -----------------------------
+# Per-segment work (runs in the worker processes)
+# -----------------------------
+def _sequence_stats(codes):
+    """Transitions and turns within `codes`, plus the ends needed to join
+    segments (turns skip non-lying postures, like posture.PostureWindow)."""
+    lying = codes[np.isin(codes, _LYING)]
+    return {
+        "transitions": int(np.count_nonzero(codes[1:] != codes[:-1])),
+        "turns": int(np.count_nonzero(lying[1:] != lying[:-1])),
+        "first": int(codes[0]),
+        "last": int(codes[-1]),
+        "firstLying": int(lying[0]) if len(lying) else None,
+        "lastLying": int(lying[-1]) if len(lying) else None,
+    }
+
+def sweep_segment(path, settings):
+    """Classify one segment with every (z_margin, side_dx) setting."""
+    records = read_landmarks(path)
+    if len(records) == 0:
+        return path, None
+    f = features(records["landmarks"])
+    recorded = np.asarray(records["pose"])
+    # Each record's posture holds until the next record, at most MAX_GAP
+    dt = np.minimum(np.diff(records["t"]), MAX_GAP)
+    results = []
+    for z_margin, side_dx in settings:
+        codes = classify_features(f, z_margin, side_dx)
+        result = {
+            "records": len(codes),
+            "counts": np.bincount(codes, minlength=len(POSTURES)).tolist(),
+            "dwell": np.bincount(codes[:-1], weights=dt, minlength=len(POSTURES)).tolist(),
+            "relabeled": int(np.count_nonzero(codes != recorded)),
+        }
+        result.update(_sequence_stats(codes))
+        results.append(result)
+    return path, {"night": night_of(float(records["t"][0])), "results": results}
+
+# -----------------------------
+# Sweep
+# -----------------------------
+def sweep(directory, z_margins, side_dxs, nights=None, workers=None):
+    settings = list(itertools.product(z_margins, side_dxs))
+    segments = list_segments(directory)
+    if nights:
+        segments = [path for path in segments if any(night in os.path.basename(path) for night in nights)]
+
+    totals = [{"zMargin": z, "sideDx": dx, "records": 0, "counts": [0] * len(POSTURES),
+               "dwell": [0.0] * len(POSTURES), "transitions": 0, "turns": 0, "relabeled": 0}
+              for z, dx in settings]
+    previous = None   # (night, per-setting results) of the last segment, to join runs across segments
+    nights_seen = set()
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # map() keeps segment order, so runs can be joined across segment boundaries
+        for path, segment in pool.map(sweep_segment, segments, itertools.repeat(settings)):
+            if segment is None:
+                continue
+            nights_seen.add(segment["night"])
+            joined = previous is not None and previous[0] == segment["night"]
+            for i, result in enumerate(segment["results"]):
+                total = totals[i]
+                total["records"] += result["records"]
+                total["relabeled"] += result["relabeled"]
+                total["transitions"] += result["transitions"]
+                total["turns"] += result["turns"]
+                for code in range(len(POSTURES)):
+                    total["counts"][code] += result["counts"][code]
+                    total["dwell"][code] += result["dwell"][code]
+                if joined:
+                    before = previous[1][i]
+                    total["transitions"] += before["last"] != result["first"]
+                    if before["lastLying"] is not None and result["firstLying"] is not None:
+                        total["turns"] += before["lastLying"] != result["firstLying"]
+            previous = (segment["night"], segment["results"])
+
+    return {
+        "segments": len(segments),
+        "nights": sorted(nights_seen),
+        "elapsed": time.perf_counter() - started,
+        "settings": totals,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("directory", help="LANDMARK_RECORD_DIR of the recordings")
+    parser.add_argument("--z-margin", type=float, nargs="+", default=[Z_MARGIN],
+                        help=f"nose vs shoulder depth margins to try (current {Z_MARGIN})")
+    parser.add_argument("--side-dx", type=float, nargs="+", default=[SIDE_DX],
+                        help=f"shoulder/hip width limits for side lying to try (current {SIDE_DX})")
+    parser.add_argument("--nights", nargs="+", help="only these nights (YYYY-MM-DD, the evening's date)")
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: all cores)")
+    parser.add_argument("--json", action="store_true", help="print the full results as JSON")
+    args = parser.parse_args()
+
+    summary = sweep(args.directory, args.z_margin, args.side_dx, args.nights, args.workers)
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return
+    records = summary["settings"][0]["records"] if summary["settings"] else 0
+    print(f"Swept {records} records from {summary['segments']} segments ({len(summary['nights'])} nights) "
+          f"with {len(summary['settings'])} settings in {summary['elapsed']:.2f} s")
+    for total in summary["settings"]:
+        current = " (current)" if (total["zMargin"], total["sideDx"]) == (Z_MARGIN, SIDE_DX) else ""
+        print(f"z margin {total['zMargin']:g}, side dx {total['sideDx']:g}{current}: "
+              f"{total['transitions']} transitions, {total['turns']} turns, "
+              f"{total['relabeled']} relabeled")
+        seconds = sum(total["dwell"])
+        for code, name in enumerate(POSTURES):
+            if total["counts"][code]:
+                share = total["dwell"][code] / seconds if seconds else 0.0
+                print(f"    {name:<20} {total['counts'][code]:>8} records  "
+                      f"{total['dwell'][code] / 3600:7.2f} h  {share:6.1%}")
+
+if __name__ == "__main__":
+    main()
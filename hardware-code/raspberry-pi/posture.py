@@ -0,0 +1,110 @@
+# -----------------------------
+# Posture codes
+# -----------------------------
+# Postures travel as small integers; the names are only needed at the
+# edges (JSON payloads, logs). The order is part of the binary window
+# format (codec.py) and the backend's decoder, so only append to it.
+POSTURES = (
+    "Unknown",
+    "Supine (Face Up)",
+    "Prone (Face Down)",
+    "Left Side",
+    "Right Side",
+    "No person detected",
+)
+UNKNOWN = 0
+SUPINE = 1
+PRONE = 2
+LEFT_SIDE = 3
+RIGHT_SIDE = 4
+NO_PERSON = 5
+LYING = frozenset((SUPINE, PRONE, LEFT_SIDE, RIGHT_SIDE))   # postures a turn can go between
+_POSTURE_CODES = {name: code for code, name in enumerate(POSTURES)}
+
+def posture_code(posture):
+    """Code for a posture name (or an existing code); unknown names give UNKNOWN."""
+    if isinstance(posture, int):
+        return posture if 0 <= posture < len(POSTURES) else UNKNOWN
+    return _POSTURE_CODES.get(posture, UNKNOWN)
+
+def posture_name(code):
+    return POSTURES[code] if 0 <= code < len(POSTURES) else POSTURES[UNKNOWN]
+
+# -----------------------------
+# Per-window posture statistics
+# -----------------------------
+class PostureWindow:
+    """Posture samples of the current window.
+
+    counts  samples per code, a fixed-size list (O(1) update)
+    mode    most frequent posture other than Unknown, kept up to date on
+            every sample; on a tie the posture that got there first wins
+    runs    run-length log [code, start, end]: a posture holds from its
+            first sample until the next posture's (or the window end)
+    turns   changes between lying postures; Unknown and "No person" runs
+            in between don't count as a turn
+    The posture at the end of a window carries into the start of the next.
+    """
+
+    def __init__(self):
+        self.carry = None        # code holding at the end of the previous window
+        self.last_lying = None   # last lying posture seen, across windows
+        self.reset()
+
+    def reset(self):
+        self.counts = [0] * len(POSTURES)
+        self.total = 0
+        self.mode = UNKNOWN
+        self.runs = []
+        self.turns = 0
+
+    def add(self, posture, ts):
+        code = posture_code(posture)
+        self.counts[code] += 1
+        self.total += 1
+        if code != UNKNOWN and (self.mode == UNKNOWN or self.counts[code] > self.counts[self.mode]):
+            self.mode = code
+
+        if not self.runs or self.runs[-1][0] != code:
+            if self.runs:
+                self.runs[-1][2] = ts
+            self.runs.append([code, ts, ts])
+
+        if code in LYING:
+            if self.last_lying is not None and code != self.last_lying:
+                self.turns += 1
+            self.last_lying = code
+        return code
+
+    def close(self, window_start, window_end):
+        """Summary of the window [window_start, window_end); starts the next one.
+
+        Returns {"posture", "counts", "dwell", "transitions", "turns"} with
+        codes throughout. Dwell is seconds per code; transitions are
+        [code, start, end] offsets in seconds from window_start.
+        """
+        runs = self.runs
+        if runs and self.carry is not None and runs[0][1] > window_start:
+            # The previous window's posture holds until the first sample
+            if runs[0][0] == self.carry:
+                runs[0][1] = window_start
+            else:
+                runs.insert(0, [self.carry, window_start, runs[0][1]])
+        if runs:
+            runs[-1][2] = max(runs[-1][2], window_end)
+
+        dwell = [0.0] * len(POSTURES)
+        for code, start, end in runs:
+            dwell[code] += end - start
+        summary = {
+            "posture": self.mode,
+            "counts": list(self.counts),
+            "dwell": [round(seconds, 1) for seconds in dwell],
+            "transitions": [[code, round(start - window_start, 1), round(end - window_start, 1)]
+                            for code, start, end in runs],
+            "turns": self.turns,
+        }
+        # A window without samples (e.g. ESP32 disconnected) carries nothing
+        self.carry = runs[-1][0] if runs else None
+        self.reset()
+        return summary
@@ -0,0 +1,78 @@
+import json
+import os
+import struct
+import threading
+import time
+
+# -----------------------------
+# Night recorder
+# -----------------------------
+# Append-only binary log of everything that feeds the window pipeline:
+# raw BLE notifications, Pi sensor samples and, per window, the inputs that
+# aren't samples (light, microphone features and sound events). replay.py
+# reads it back.
+#
+#   file    RECORD_MAGIC, then records
+#   record  B kind, d wall-clock time, H payload length, payload
+#
+# Notification payloads are the raw frame bytes; sample payloads are the
+# JSON array [name, value]; window payloads are the JSON object
+# {"start", "end", "light", "acoustics", "events"}, written just before the
+# window [start, end) is flushed.
+RECORD_MAGIC = b"SDREC1\n"
+KIND_NOTIFICATION = 1
+KIND_SAMPLE = 2
+KIND_WINDOW = 3
+_RECORD = struct.Struct("<BdH")
+
+class Recorder:
+    def __init__(self, path):
+        new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        self.file = open(path, "ab")
+        self.lock = threading.Lock()
+        if new_file:
+            self.file.write(RECORD_MAGIC)
+
+    def _write(self, kind, payload, ts):
+        payload = bytes(payload)[:0xFFFF]
+        record = _RECORD.pack(kind, time.time() if ts is None else ts, len(payload)) + payload
+        with self.lock:
+            self.file.write(record)
+
+    def notification(self, data, ts=None):
+        self._write(KIND_NOTIFICATION, data, ts)
+
+    def sample(self, name, value, ts=None):
+        self._write(KIND_SAMPLE, json.dumps([name, value]).encode(), ts)
+
+    def window(self, start, end, light, acoustics, ts=None):
+        """`acoustics` is the (summary, events) pair pipeline.acoustics takes."""
+        summary, events = acoustics or (None, [])
+        window = {"start": start, "end": end, "light": bool(light), "acoustics": summary, "events": events}
+        self._write(KIND_WINDOW, json.dumps(window).encode(), ts)
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+def read_records(path):
+    """Yield (kind, wall time, payload) in file order; samples as (name,
+    value), windows as dicts."""
+    with open(path, "rb") as f:
+        if f.read(len(RECORD_MAGIC)) != RECORD_MAGIC:
+            raise ValueError(f"{path} is not a SleepDuck recording")
+        while True:
+            header = f.read(_RECORD.size)
+            if len(header) < _RECORD.size:
+                return
+            kind, ts, length = _RECORD.unpack(header)
+            payload = f.read(length)
+            if len(payload) < length:
+                return   # truncated last record (recorder was killed)
+            if kind == KIND_SAMPLE:
+                name, value = json.loads(payload)
+                yield kind, ts, (name, value)
+            elif kind == KIND_WINDOW:
+                yield kind, ts, json.loads(payload)
+            else:
+                yield kind, ts, payload
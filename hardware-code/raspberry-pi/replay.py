@@ -0,0 +1,159 @@
+"""Replay a recorded night through the window pipeline, no hardware needed.
+
+Record on the Pi with RECORD_PATH=night.rec python sendData.py, then:
+
+    python replay.py night.rec               # real time (1x)
+    python replay.py night.rec --speed 60    # 60x
+    python replay.py night.rec --speed 0     # as fast as possible (benchmark)
+
+The light state, microphone features ("acoustics") and sound/event
+messages come from the window records sendData writes before each flush,
+so they replay as they were published. Recordings made before those
+records existed replay without them (light off, no acoustics, no events).
+"""
+import argparse
+import time
+from pipeline import WindowPipeline, next_window_boundary
+from outbox import Outbox, OutboxSender
+from recorder import read_records, KIND_NOTIFICATION, KIND_SAMPLE, KIND_WINDOW
+
+# -----------------------------
+# Local MQTT stand-in
+# -----------------------------
+class _PublishInfo:
+    rc = 0
+
+    def __init__(self, mid):
+        self.mid = mid
+
+    def is_published(self):
+        return True
+
+class LocalBroker:
+    """Accepts every publish immediately and keeps per-topic totals."""
+
+    def __init__(self, keep_messages=False):
+        self.keep_messages = keep_messages
+        self.messages = []
+        self.topics = {}   # topic -> [messages, bytes]
+        self.mid = 0
+
+    def publish(self, topic, payload, qos=0):
+        self.mid += 1
+        size = len(payload.encode() if isinstance(payload, str) else payload)
+        totals = self.topics.setdefault(topic, [0, 0])
+        totals[0] += 1
+        totals[1] += size
+        if self.keep_messages:
+            self.messages.append((topic, payload))
+        return _PublishInfo(self.mid)
+
+# -----------------------------
+# Replay
+# -----------------------------
+def _window_key(end):
+    return round(end, 3)
+
+def _flush(pipeline, window_start, window_end, inputs):
+    # The light and acoustics sendData set before flushing this window
+    if inputs is not None:
+        pipeline.light = inputs["light"]
+        pipeline.acoustics = (inputs["acoustics"], inputs["events"])
+    pipeline.flush(window_start, window_end)
+
+def replay(path, speed=1.0, interval=10, payload_format="json", publish_mode="always",
+           heartbeat=300, outbox_path=":memory:", verbose=False, broker=None):
+    """Feed a recording through WindowPipeline; returns a summary dict.
+
+    `speed` is the playback rate relative to the recording (0 = no pacing).
+    Windows are closed on the same clock-aligned boundaries as sendData.
+    """
+    broker = broker or LocalBroker()
+    outbox = Outbox(outbox_path)
+    sender = OutboxSender(broker, outbox)
+    sender.connected = True
+    pipeline = WindowPipeline(sender.send, payload_format, publish_mode, heartbeat,
+                              log=print if verbose else None)
+
+    latest = {}
+    window_inputs = {}   # recorded window end -> window record
+    notifications = 0
+    windows = 0
+    first_ts = None
+    window_start = window_end = None
+    started = time.perf_counter()
+
+    for kind, ts, payload in read_records(path):
+        if first_ts is None:
+            first_ts = ts
+            window_start = ts
+            window_end = next_window_boundary(ts, interval)
+
+        if speed > 0:
+            delay = (ts - first_ts) / speed - (time.perf_counter() - started)
+            if delay > 0:
+                time.sleep(delay)
+
+        if kind == KIND_WINDOW:
+            # Written as its window closed; the window is flushed by the next
+            # record past its end (or at the end of the recording)
+            window_inputs[_window_key(payload["end"])] = payload
+            continue
+
+        while ts >= window_end:
+            _flush(pipeline, window_start, window_end, window_inputs.pop(_window_key(window_end), None))
+            sender.poll()
+            windows += 1
+            window_start = window_end
+            window_end += interval
+
+        if kind == KIND_NOTIFICATION:
+            pipeline.add_notification(payload, latest, latest.get("posture", "Unknown"), ts)
+            notifications += 1
+        elif kind == KIND_SAMPLE:
+            name, value = payload
+            latest[name] = value
+
+    # Close the last, partial window
+    if first_ts is not None:
+        _flush(pipeline, window_start, window_end, window_inputs.pop(_window_key(window_end), None))
+        sender.poll()
+        windows += 1
+
+    elapsed = time.perf_counter() - started
+    outbox.close()
+    return {
+        "notifications": notifications,
+        "windows": windows,
+        "elapsed": elapsed,
+        "notificationsPerSecond": notifications / elapsed if elapsed > 0 else 0.0,
+        "topics": {topic: {"messages": m, "bytes": b} for topic, (m, b) in broker.topics.items()},
+        "frames": pipeline.decoder.stats(),
+        "publish": pipeline.change_filter.stats(),
+        "outbox": sender.stats(),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("recording")
+    parser.add_argument("--speed", type=float, default=1.0, help="playback rate, 0 = as fast as possible")
+    parser.add_argument("--interval", type=int, default=10, help="window length in seconds")
+    parser.add_argument("--format", default="json", choices=("json", "binary", "both"))
+    parser.add_argument("--mode", default="always", choices=("always", "change"))
+    parser.add_argument("--heartbeat", type=int, default=300)
+    parser.add_argument("--outbox", default=":memory:", help="outbox database (default in memory)")
+    parser.add_argument("-v", "--verbose", action="store_true", help="print every window like sendData")
+    args = parser.parse_args()
+
+    summary = replay(args.recording, args.speed, args.interval, args.format, args.mode,
+                     args.heartbeat, args.outbox, args.verbose)
+    print(f"Replayed {summary['notifications']} notifications into {summary['windows']} windows "
+          f"in {summary['elapsed']:.2f} s ({summary['notificationsPerSecond']:.0f} notifications/s)")
+    for topic, totals in sorted(summary["topics"].items()):
+        print(f"    {topic}: {totals['messages']} messages, {totals['bytes']} bytes")
+    print(f"    frames: {summary['frames']}")
+    print(f"    publish: {summary['publish']}")
+    print(f"    outbox: {summary['outbox']}")
+
+if __name__ == "__main__":
+    main()
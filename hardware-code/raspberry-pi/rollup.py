@@ -0,0 +1,93 @@
+import math
+from aggregator import WindowAggregator
+from posture import POSTURES
+
+# -----------------------------
+# Multi-resolution rollups
+# -----------------------------
+class Rollup:
+    """Merges consecutive finer windows into one coarser window.
+
+    Windows are aligned to multiples of `interval` on the same clock as the
+    base windows, so a 1-minute rollup always covers six 10 s windows.
+    Postures are merged as per-code counts and dwell seconds plus turns.
+    """
+
+    def __init__(self, name, interval, fields):
+        self.name = name
+        self.interval = interval
+        self.window = WindowAggregator(fields)
+        self.posture_counts = [0] * len(POSTURES)
+        self.dwell = [0.0] * len(POSTURES)
+        self.turns = 0
+        self.window_start = None
+        self.windows = 0
+
+    def add(self, window, postures, window_start):
+        """`postures` has "counts", "dwell" (per posture code) and "turns"."""
+        if self.window_start is None:
+            self.window_start = math.floor(window_start / self.interval) * self.interval
+        self.window.merge(window)
+        for code, count in enumerate(postures["counts"]):
+            self.posture_counts[code] += count
+        for code, seconds in enumerate(postures["dwell"]):
+            self.dwell[code] += seconds
+        self.turns += postures["turns"]
+        self.windows += 1
+
+    def postures(self):
+        return {"counts": list(self.posture_counts), "dwell": list(self.dwell), "turns": self.turns}
+
+    def is_due(self, window_end):
+        return self.window_start is not None and window_end >= self.window_start + self.interval
+
+    def payload(self, window_end):
+        fields = {}
+        for name in self.window.fields():
+            summary = self.window[name].summary()
+            fields[name] = {key: summary[key] for key in ("mean", "min", "max", "count", "missing")}
+        return {
+            "resolution": self.name,
+            "windowStart": round(self.window_start, 3),
+            "windowEnd": round(window_end, 3),
+            "windows": self.windows,
+            "fields": fields,
+            "posture": {POSTURES[code]: count for code, count in enumerate(self.posture_counts) if count},
+            "dwell": {POSTURES[code]: round(seconds, 1) for code, seconds in enumerate(self.dwell) if seconds},
+            "turns": self.turns,
+        }
+
+    def reset(self):
+        self.window.reset()
+        self.posture_counts = [0] * len(POSTURES)
+        self.dwell = [0.0] * len(POSTURES)
+        self.turns = 0
+        self.window_start = None
+        self.windows = 0
+
+class RollupCascade:
+    """Chain of rollups where each level is fed by the one below it.
+
+    `levels` is a list of (name, interval) from finest to coarsest, e.g.
+    [("1m", 60), ("5m", 300)]. Only the first level sees base windows.
+    """
+
+    def __init__(self, levels, fields):
+        self.rollups = [Rollup(name, interval, fields) for name, interval in levels]
+
+    def add(self, window, postures, window_start, window_end):
+        """Add one base window; return [(name, payload)] for closed rollups."""
+        closed = []
+        source, source_postures, source_start = window, postures, window_start
+        for rollup in self.rollups:
+            rollup.add(source, source_postures, source_start)
+            if not rollup.is_due(window_end):
+                break
+            closed.append((rollup.name, rollup.payload(window_end)))
+            # Hand this level's totals up before clearing them
+            source = WindowAggregator(rollup.window.fields())
+            source.merge(rollup.window)
+            source_postures = rollup.postures()
+            source_start = rollup.window_start
+            rollup.reset()
+        return closed
@@ -1,16 +1,22 @@
+from startup import StartupTimer
+startup = StartupTimer()   # created first so the imports below are timed too
+
 import asyncio
-from bleak import BleakClient, BleakScanner
 from datetime import datetime
 import json
-import statistics
-from KY15 import send_humidity, send_temp
+from KY15 import send_humidity, send_temp, stop_reader as stop_dht_reader, READ_INTERVAL as DHT_READ_INTERVAL
 from KY18 import send_brightness
-from KY37 import send_sound
+from KY37 import send_sound, dc_tracker, pop_acoustics, stop_sampler as stop_sound_sampler
 from servo import turn_on as turn_on_light, turn_off as turn_off_light, set_up_servo
-from camera import send_pose
+from camera import send_pose, start_pose_worker, stop_pose_worker, wait_pose_ready
+from acquisition import Sensor, rate_from_env, get_sample, start_sensor_tasks, add_listener
 from dotenv import load_dotenv
-import gpiod
+import hal
 import paho.mqtt.client as mqtt
+from outbox import Outbox, OutboxSender
+from pipeline import WindowPipeline, PI_FIELDS, next_window_boundary
+from recorder import Recorder
+import metrics
 import ssl
 import time
 import os
@@ -18,6 +24,8 @@ import threading
 import signal
 import sys
 
+startup.mark("imports done")
+
 stop_event = threading.Event()
 
 def _signal_handler(sig, frame):
@@ -33,6 +41,23 @@ HOST = os.getenv("MQTT_HOST")
 PORT = int(os.getenv("MQTT_PORT", "8883"))
 USERNAME = os.getenv("MQTT_USERNAME")
 PASSWORD = os.getenv("MQTT_PASSWORD")
+OUTBOX_PATH = os.getenv("OUTBOX_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "outbox.db"))
+OUTBOX_MAX_MESSAGES = int(os.getenv("OUTBOX_MAX_MESSAGES", "50000"))
+OUTBOX_REPLAY_INTERVAL = 1   # seconds between outbox polls
+OUTBOX_REPLAY_BATCH = 20     # backlog messages replayed per poll
+# json: "sensor" + "posture" JSON topics (old consumers)
+# binary: one packed message on "window" (see codec.py)
+# both: publish both encodings
+PAYLOAD_FORMAT = os.getenv("PAYLOAD_FORMAT", "json").lower()
+# always: publish every window
+# change: only publish windows that moved past a deadband, plus heartbeats
+PUBLISH_MODE = os.getenv("PUBLISH_MODE", "always").lower()
+HEARTBEAT_INTERVAL = int(os.getenv("HEARTBEAT_INTERVAL", "300"))   # seconds
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9108"))               # 0 disables /metrics
+METRICS_MQTT_INTERVAL = int(os.getenv("METRICS_MQTT_INTERVAL", "0"))  # seconds, 0 disables
+RECORD_PATH = os.getenv("RECORD_PATH")   # record notifications + Pi samples for replay.py
+POSE_WARMUP_TIMEOUT = 60      # seconds to wait for the first pose inference
+STARTUP_REPORT_TIMEOUT = 60   # print the startup report by then even without BLE data
 
 # --- setup MQTT (rename to mqtt_client to avoid shadowing) ---
 def on_connect(mqtt_client, userdata, flags, rc):
@@ -42,9 +67,15 @@ def on_connect(mqtt_client, userdata, flags, rc):
         mqtt_client.subscribe(topic)
         print(f"    Subscribed to topic: {topic}")
         print("    MQTT connected OK")
+        outbox_sender.connected = True
+        startup.mark("MQTT connected")
     else:
         print("    MQTT connect failed, code:", rc)
 
+def on_disconnect(mqtt_client, userdata, rc):
+    print("    MQTT disconnected, rc =", rc)
+    outbox_sender.connected = False
+
 def on_message(client, userdata, msg):
     payload_raw = msg.payload.decode("utf-8", errors="ignore")
     print(f"[{msg.topic}] {payload_raw}")
@@ -84,48 +115,110 @@ mqtt_client = mqtt.Client()
 mqtt_client.on_connect = on_connect
 mqtt_client.on_message = on_message
 mqtt_client.on_publish = on_publish
+mqtt_client.on_disconnect = on_disconnect
 mqtt_client.on_log = on_log
 
+# Every window goes through the outbox so nothing is lost while offline
+outbox = Outbox(OUTBOX_PATH, max_messages=OUTBOX_MAX_MESSAGES)
+outbox_sender = OutboxSender(mqtt_client, outbox, batch_size=OUTBOX_REPLAY_BATCH)
+print(f"Outbox {OUTBOX_PATH}: {len(outbox)} message(s) waiting")
+
+OUTBOX_QUEUED = metrics.gauge(
+    "sleepduck_outbox_queued", "Messages stored in the outbox", fn=lambda: len(outbox))
+OUTBOX_INFLIGHT = metrics.gauge(
+    "sleepduck_outbox_inflight", "Messages published but not yet acknowledged",
+    fn=lambda: len(outbox_sender.inflight))
+MQTT_PUBLISHED = metrics.counter(
+    "sleepduck_mqtt_published_total", "MQTT publishes handed to the client",
+    fn=lambda: outbox_sender.sent)
+MQTT_FAILED = metrics.counter(
+    "sleepduck_mqtt_publish_failures_total", "MQTT publishes that failed or timed out",
+    fn=lambda: outbox_sender.failed)
+
 if USERNAME:
     mqtt_client.username_pw_set(USERNAME, PASSWORD)
 mqtt_client.tls_set(cert_reqs=ssl.CERT_NONE)
 mqtt_client.tls_insecure_set(True)
 
-try:
-    rc = mqtt_client.connect(HOST, PORT, keepalive=60)
-    print("MQTT connect rc (sync) =", rc)
-    mqtt_client.loop_start()
-except Exception as e:
-    print("Failed to connect/start MQTT:", e)
-    # You may want to retry with backoff in production
-
-time.sleep(1)                                   # Wait for on_connect to run
+def connect_mqtt():
+    """Connect in the MQTT network thread; windows wait in the outbox until
+    on_connect runs, so nothing has to block on the broker here."""
+    try:
+        mqtt_client.connect_async(HOST, PORT, keepalive=60)
+        mqtt_client.loop_start()
+    except Exception as e:
+        print("Failed to connect/start MQTT:", e)
 
 # --- BLE Settings ---
 DEVICE_NAME = "ESP32S3_BLE"
 CHARACTERISTIC_UUID = "6E400003-B5A3-F393-E0A9-E50E24DCCA9E"
 
 # --- Control update interval ---
-UPDATE_INTERVAL = 10    # seconds
+UPDATE_INTERVAL = 10    # seconds, windows close on multiples of this
 latest_payload = None   # store last sensor data
-last_update_time = 0    # track last DB write time
+
+# --- Sensor polling intervals (seconds) ---
+# Each interval stretches from min towards max while the readings' standard
+# deviation stays under "steady", and snaps back to min on a jump larger
+# than "change" (acquisition.AdaptiveRate). Override the range per sensor
+# with <NAME>_MIN_INTERVAL / <NAME>_MAX_INTERVAL, e.g. SOUND_MAX_INTERVAL=1.
+SENSOR_RATES = {
+    #              min  max  steady  change
+    "brightness": (1,   5,   0.5,    None),  # % of full scale
+    "sound":      (1,   5,   2.0,    10),    # peak level %
+}
+# temp/humid only copy KY15's last reading, whose reader thread already
+# adapts the DHT11 rate (TEMP_/HUMID_MIN_INTERVAL and _MAX_INTERVAL apply
+# there); polling the cache adaptively too would only add staleness, so it
+# is read as often as the DHT11 can be
+DHT_INTERVAL = DHT_READ_INTERVAL
+# Postures are categories, so they keep a fixed interval
+POSE_INTERVAL = float(os.getenv("POSTURE_INTERVAL", "1"))
+
+# --- Notification queue ---
+NOTIFICATION_QUEUE_SIZE = 256
+notification_queue = None   # created inside the event loop in main()
+dropped_notifications = 0
+
+# --- Window pipeline (see pipeline.py) ---
+pipeline = WindowPipeline(outbox_sender.send, PAYLOAD_FORMAT, PUBLISH_MODE, HEARTBEAT_INTERVAL)
+
+# --- Optional recording for replay.py ---
+recorder = Recorder(RECORD_PATH) if RECORD_PATH else None
+if recorder is not None:
+    add_listener(recorder.sample)
+    print(f"Recording notifications and samples to {RECORD_PATH}")
+
+add_listener(lambda name, value: startup.mark(f"first {name} sample"))
+
+# --- Metrics (see metrics.py) ---
+BLE_NOTIFICATIONS = metrics.counter(
+    "sleepduck_ble_notifications_total", "BLE notifications received from the ESP32")
+BLE_DROPPED = metrics.counter(
+    "sleepduck_ble_notifications_dropped_total", "Notifications dropped because the queue was full",
+    fn=lambda: dropped_notifications)
+BLE_MTU = metrics.gauge(
+    "sleepduck_ble_mtu_bytes", "ATT MTU negotiated with the ESP32",
+    fn=lambda: ble.mtu if ble is not None else None)
+BLE_SAMPLES_LOST = metrics.counter(
+    "sleepduck_ble_samples_lost_total", "ESP32 samples missing from the frame sequence",
+    fn=lambda: pipeline.decoder.lost)
+BLE_DEVICE_RESTARTS = metrics.counter(
+    "sleepduck_ble_device_restarts_total", "ESP32 restarts seen as its clock going backwards",
+    fn=lambda: pipeline.decoder.restarts)
+NOTIFICATION_QUEUE_DEPTH = metrics.gauge(
+    "sleepduck_notification_queue_depth", "Notifications waiting to be processed",
+    fn=lambda: notification_queue.qsize() if notification_queue else 0)
+NOTIFICATION_SECONDS = metrics.histogram(
+    "sleepduck_notification_handle_seconds", "Time to process one notification")
+WINDOW_FLUSH_SECONDS = metrics.histogram(
+    "sleepduck_window_flush_seconds", "Time to aggregate and queue one window")
 
 # --- LED PIN ---
 LED_PIN = 5 #GPIO5
 
-# --- Package ---
-sensorPayload = {}
-posturePayload = {}
-
-# --- Data to create average ---
-heart_rate = []
-motion = []
-humid = []
-temp = []
-sound = []
-brightness = []
+# --- Light state ---
 light = False
-posture = []
 
 # --- Setting Data ---
 turn_on_light_time = 0
@@ -153,106 +246,97 @@ def check_light_ideal_state(current_time):
         return current_time >= turn_on_light_time or current_time < turn_off_light_time
     
 # Set up
-chip = gpiod.Chip('gpiochip4')
-led_line = chip.get_line(LED_PIN)
-led_line.request(consumer="LED", type=gpiod.LINE_REQ_DIR_OUT)
-
-def safe_mean(lst, default=0):
-    try:
-        return statistics.mean(lst) if lst else default
-    except Exception:
-        return default
-
-def safe_mode(lst, default=None):
-    lst = list(filter(lambda x: x != "Unknown", lst))
-    try:
-        return statistics.mode(lst) if lst else default
-    except Exception:
-        return lst[-1] if lst else default
+led_line = hal.gpio_output("gpiochip4", LED_PIN, "LED")
 
 # This code run every 10 seconds
-async def push_data(now):
-    print("=======================================================")
-    now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    print(f"[{now}] Pushing data to MQTT broker...")
-    """Push data to MQTT broker."""
-    global heart_rate, motion, humid, temp, sound, brightness, light, posture, last_update_time
-
-    sensor_obj = {
-        "heartRate": safe_mean(heart_rate, 0),
-        "motion": safe_mean(motion, 0),
-        "humid": safe_mean(humid, 0),
-        "temp": safe_mean(temp, 0),
-        "sound": safe_mean(sound, 0),
-        "brightness": safe_mean(brightness, 0),
-        "light": light or False
-    }
-
-    posture_obj = {"posture": safe_mode(posture, "Unknown")}
-    
-    sensorPayload = json.dumps(sensor_obj)
-    posturePayload = json.dumps(posture_obj)
+async def push_data(window_start, window_end):
+    """Push the window [window_start, window_end) to MQTT broker."""
+    pipeline.light = light
+    pipeline.acoustics = pop_acoustics()
+    if recorder is not None:
+        recorder.window(window_start, window_end, light, pipeline.acoustics)
+    pipeline.flush(window_start, window_end)
+
+async def replay_outbox():
+    """Ack delivered messages and replay the backlog a batch at a time."""
+    while not stop_event.is_set():
+        try:
+            outbox_sender.poll()
+        except Exception as e:
+            print("Outbox poll failed:", e)
+        await asyncio.sleep(OUTBOX_REPLAY_INTERVAL)
+
+async def publish_metrics():
+    """Publish a metrics snapshot on the "metrics" topic every METRICS_MQTT_INTERVAL."""
+    while not stop_event.is_set():
+        await asyncio.sleep(METRICS_MQTT_INTERVAL)
+        try:
+            mqtt_client.publish("metrics", json.dumps(metrics.snapshot()), qos=0)
+        except Exception as e:
+            print("Metrics publish failed:", e)
+
+async def window_scheduler():
+    """Close a window on every UPDATE_INTERVAL boundary of the clock.
+
+    Boundaries are aligned to wall time once, then followed on the monotonic
+    clock so NTP steps don't stretch or shrink windows. A window is flushed
+    even if no notification arrived during it.
+    """
+    wall_start = time.time()
+    mono_start = time.monotonic()
+    window_start = wall_start
+    window_end = next_window_boundary(wall_start, UPDATE_INTERVAL)
+
+    while not stop_event.is_set():
+        deadline = mono_start + (window_end - wall_start)
+        await asyncio.sleep(max(0.0, deadline - time.monotonic()))
+        try:
+            with WINDOW_FLUSH_SECONDS.time():
+                await push_data(window_start, window_end)
+        except Exception as e:
+            print("Error pushing window:", e)
+
+        # Skip boundaries we slept through (e.g. system suspend)
+        elapsed_wall = wall_start + (time.monotonic() - mono_start)
+        window_start = window_end
+        window_end += UPDATE_INTERVAL
+        while window_end <= elapsed_wall:
+            window_start = window_end
+            window_end += UPDATE_INTERVAL
 
+# This code will trigger while ESP send data
+def notification_handler(sender, data):
+    """Called when notification is received from ESP32. Only enqueues."""
+    global dropped_notifications
+    BLE_NOTIFICATIONS.inc()
+    startup.mark("first BLE notification")
+    if recorder is not None:
+        recorder.notification(data)
     try:
-        info1 = mqtt_client.publish("sensor", sensorPayload, qos=0)
-        info2 = mqtt_client.publish("posture", posturePayload, qos=0)
-        print(f"    Published sensor: {sensorPayload}, mid={getattr(info1, 'mid', None)}, rc={getattr(info1, 'rc', None)}")
-        print(f"    Published posture: {posturePayload}, mid={getattr(info2, 'mid', None)}, rc={getattr(info2, 'rc', None)}")
-    except Exception as e:
-        print("MQTT publish failed:", e)
-    
-    last_update_time = datetime.now().timestamp()
-
-    # reset buffers
-    heart_rate.clear()
-    motion.clear()
-    humid.clear()
-    temp.clear()
-    sound.clear()
-    brightness.clear()
-    light = light
-    posture.clear()
+        notification_queue.put_nowait(data)
+    except asyncio.QueueFull:
+        dropped_notifications += 1
 
-# This code will trigger while ESP send data
-async def notification_handler(sender, data):
-    """Called when notification is received from ESP32."""
+async def handle_notification(data):
+    """Process one ESP32 notification using the latest Pi sensor samples."""
     print("=======================================================")
     now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
     print(f"[{now}] Dumping data ...")
-    global heart_rate, motion, humid, temp, sound, brightness, light, posture, last_update_time
+    global light
 
-    try:
-        text = data.decode()
-    except Exception:
-        text = None
-    
-    # Parse JSON from ESP32
-    sensor_data = {}
-    if text:
-        try:
-            sensor_data = json.loads(text)
-        except Exception:
-            print(f"Error : [{now}] Received non-JSON payload: {text}")
-   
-    # Collect from ESP32
-    heart_rate.append(sensor_data["heartRate"])
-    motion.append(sensor_data["motion"])
-
-    # Collect from Raspberry PI5
-    brightness.append(send_brightness())
-    humid.append(send_humidity())
-    temp.append(send_temp())
-    sound.append(send_sound())
-
-    # Try to collect data from camera
-    try:
-        posture_val = send_pose()
-        posture.append(str(posture_val))
-    except Exception:
-        posture.append("Unknown")
+    # Collect from Raspberry PI5 (latest samples from the polling tasks)
+    latest = {name: get_sample(name) for name in PI_FIELDS}
+    current_posture = get_sample("posture", "Unknown")
+
+    # Decode the ESP32 frame and add everything to the current window
+    samples = pipeline.add_notification(data, latest, current_posture)
+    if not samples:
+        print(f"Error : [{now}] Received undecodable payload: {bytes(data)!r}")
+        return
+    sensor_data = samples[-1]
 
     # Handle the heartrate for led sensor data
-    if (sensor_data["heartRate"] == 0 or brightness[-1] > 60):
+    if (sensor_data["heartRate"] == 0 or (latest["brightness"] or 0) > 60):
         led_line.set_value(1)
     else:
         led_line.set_value(0)
@@ -265,64 +349,131 @@ async def notification_handler(sender, data):
 
     print(current_light_ideal_state, light)
     if current_light_ideal_state != light:
+        # The servo sleeps while moving, keep it off the event loop
+        loop = asyncio.get_running_loop()
         if current_light_ideal_state:
-            turn_on_light()
+            await loop.run_in_executor(None, turn_on_light)
             light = True
         else:
-            turn_off_light()
+            await loop.run_in_executor(None, turn_off_light)
             light = False
 
     # LOG EVERY DATA FROM SENSOR
-    print(f"    Received from ESP32: {sensor_data}")
-    print(f"    Received from RaspberryPI: brightness: {str(brightness[-1])} humid: {str(humid[-1])} temp: {str(temp[-1])}  sound: {str(sound[-1])} light: {str(light)} posture: {str(posture[-1])}")
-
-    # Check interval to push update the data
-    current_ts = datetime.now().timestamp()
-    if current_ts - last_update_time >= UPDATE_INTERVAL:
-        await push_data(now)
+    print(f"    Received from ESP32: {len(samples)} sample(s), last {sensor_data}")
+    print(f"    Received from RaspberryPI: brightness: {latest['brightness']} humid: {latest['humid']} temp: {latest['temp']}  sound: {latest['sound']} light: {str(light)} posture: {current_posture}")
+    if dropped_notifications:
+        print(f"    Dropped notifications so far: {dropped_notifications}")
+
+    if not startup.reported:
+        startup.mark("first BLE sample processed")
+        startup.report()
+
+async def process_notifications():
+    """Drain the notification queue outside of the BLE callback."""
+    while True:
+        data = await notification_queue.get()
+        try:
+            with NOTIFICATION_SECONDS.time():
+                await handle_notification(data)
+        except Exception as e:
+            print("Error handling notification:", e)
+        finally:
+            notification_queue.task_done()
+
+async def warm_up_camera():
+    # The capture and inference processes were started by main(); this
+    # waits for MediaPipe to load there and run its first inference
+    await startup.run("pose model warmup", wait_pose_ready, POSE_WARMUP_TIMEOUT)
+
+async def warm_up():
+    """Bring up everything that isn't needed for the first BLE sample, in
+    parallel with the BLE scan."""
+    await asyncio.gather(
+        startup.run("MQTT connect", connect_mqtt),
+        startup.run("servo setup", set_up_servo),
+        warm_up_camera(),
+    )
+    # Report even if the ESP32 never shows up
+    await asyncio.sleep(max(0.0, STARTUP_REPORT_TIMEOUT - startup.elapsed()))
+    if not startup.reported:
+        startup.report()
 
 async def main():
-    # Scan for the device
-    devices = await BleakScanner.discover()
-    esp32_address = None
-    for d in devices:
-        if d.name == DEVICE_NAME:
-            esp32_address = d.address
-            break
-
-    if esp32_address is None:
-        print("ESP32 device not found!")
-        return
+    global notification_queue
+    notification_queue = asyncio.Queue(maxsize=NOTIFICATION_QUEUE_SIZE)
+    warm_up_task = asyncio.create_task(warm_up())
+
+    # Each Pi sensor is polled by its own task. ADS1115 access is serialized
+    # by adc_bus, sound only reads the sampler's ring buffer, and temp/humid
+    # return the DHT11 reader thread's last good reading; posture reads the
+    # inference process's latest pose from shared memory.
+    read_fns = {"brightness": send_brightness, "sound": send_sound}
+    sensors = []
+    for name, (min_interval, max_interval, steady, change) in SENSOR_RATES.items():
+        rate = rate_from_env(name, min_interval, max_interval, steady, change)
+        sensors.append(Sensor(name, read_fns[name], rate.min_interval, adaptive=rate))
+    sensors.append(Sensor("temp", send_temp, DHT_INTERVAL))
+    sensors.append(Sensor("humid", send_humidity, DHT_INTERVAL))
+    sensors.append(Sensor("posture", send_pose, POSE_INTERVAL))
+    sensor_tasks, sensor_executor = start_sensor_tasks(sensors, stop_event)
+    consumer_task = asyncio.create_task(process_notifications())
+    window_task = asyncio.create_task(window_scheduler())
+    outbox_task = asyncio.create_task(replay_outbox())
+    metrics_task = asyncio.create_task(publish_metrics()) if METRICS_MQTT_INTERVAL > 0 else None
 
-    print(f"Connecting to {DEVICE_NAME} ({esp32_address})...")
-    
-    async with BleakClient(esp32_address) as ble_client:
-        connected = ble_client.is_connected
-        if connected:
-            print("Connected!")
-            await ble_client.start_notify(CHARACTERISTIC_UUID, notification_handler)
-            print("Listening for notifications... Press Ctrl+C to exit")
-            try:
-                while not stop_event.is_set():
-                    await asyncio.sleep(1)
-            except asyncio.CancelledError:
-                pass
-        else:
-            print("BLE connection failed (is_connected is False)")
+    try:
+        startup.mark("BLE scan started")
+        await listen_ble()
+    finally:
+        warm_up_task.cancel()
+        consumer_task.cancel()
+        window_task.cancel()
+        outbox_task.cancel()
+        if metrics_task is not None:
+            metrics_task.cancel()
+        for task in sensor_tasks:
+            task.cancel()
+        sensor_executor.shutdown(wait=False)
+
+ble = None
+
+async def listen_ble():
+    global ble
+    # Real ESP32 over bleak, or a simulated one (SLEEPDUCK_DRIVERS=sim)
+    ble = hal.ble_source(DEVICE_NAME, CHARACTERISTIC_UUID)
+    await ble.run(notification_handler, stop_event, startup.mark)
 
 if __name__ == "__main__":
-    set_up_servo()
+    # Pose capture and inference run in their own processes (camera.py) and
+    # hand the pose back through shared memory. Fork them first, before the
+    # metrics, sensor, MQTT and executor threads exist.
+    with startup.phase("pose processes start"):
+        start_pose_worker()
+    if METRICS_PORT:
+        try:
+            metrics.start_http_server(METRICS_PORT)
+            print(f"Metrics on http://0.0.0.0:{METRICS_PORT}/metrics")
+        except OSError as e:
+            print("Failed to start metrics server:", e)
     try:
         asyncio.run(main())
     except KeyboardInterrupt:
         print("Exiting on user interrupt")
         stop_event.set()
     finally:
+        stop_pose_worker()
+        stop_sound_sampler()
+        stop_dht_reader()
         try:
             mqtt_client.loop_stop()
             mqtt_client.disconnect()
         except Exception:
             pass
+        outbox.close()
+        if dc_tracker.offset is not None:
+            dc_tracker.save()
+        if recorder is not None:
+            recorder.close()
         try:
             if led_line:
                 led_line.set_value(0)
@@ -1,8 +1,8 @@
 
-from gpiozero import AngularServo
 from time import sleep
+import hal
 
-servo = AngularServo(18, min_pulse_width=0.0006, max_pulse_width=0.0023)
+servo = hal.servo(18, min_pulse_width=0.0006, max_pulse_width=0.0023)
 _last_angle = None
 _DEADBAND_DEG = 3
 
@@ -0,0 +1,74 @@
+import asyncio
+import threading
+import time
+from contextlib import contextmanager
+import metrics
+
+STARTUP_SECONDS = metrics.gauge(
+    "sleepduck_startup_seconds", "Seconds from process start until each startup phase or milestone")
+
+# -----------------------------
+# Startup timing
+# -----------------------------
+class StartupTimer:
+    """Times the startup phases (which may overlap) and one-off milestones
+    such as "first BLE sample processed", all relative to one start time."""
+
+    def __init__(self, log=print):
+        self.started = time.monotonic()
+        self.log = log
+        self.phases = {}       # name -> [start offset, duration or None while running]
+        self.milestones = {}   # name -> offset
+        self.reported = False
+        self._lock = threading.Lock()
+
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    def mark(self, name):
+        """Record a milestone; only the first occurrence counts."""
+        if name in self.milestones:
+            return
+        with self._lock:
+            if name in self.milestones:
+                return
+            offset = self.milestones[name] = self.elapsed()
+        STARTUP_SECONDS.set(offset, phase=name)
+
+    @contextmanager
+    def phase(self, name):
+        with self._lock:
+            entry = self.phases[name] = [self.elapsed(), None]
+        try:
+            yield
+        finally:
+            entry[1] = self.elapsed() - entry[0]
+            STARTUP_SECONDS.set(entry[0] + entry[1], phase=name)
+
+    async def run(self, name, fn, *args):
+        """Run a blocking startup step in the default executor as phase `name`.
+
+        Errors are printed, not raised, so one failing device does not stop
+        the other phases.
+        """
+        loop = asyncio.get_running_loop()
+        with self.phase(name):
+            try:
+                return await loop.run_in_executor(None, fn, *args)
+            except Exception as e:
+                self.log(f"Startup phase {name} failed:", e)
+
+    def report(self):
+        """Print every phase and milestone, ordered by when it started."""
+        self.reported = True
+        rows = [(start, name, duration) for name, (start, duration) in self.phases.items()]
+        rows += [(offset, name, 0.0) for name, offset in self.milestones.items()]
+        self.log("=======================================================")
+        self.log(f"Startup report ({self.elapsed():.2f} s since start)")
+        for start, name, duration in sorted(rows):
+            if duration is None:
+                self.log(f"    {name:<32} started {start:6.2f} s   still running")
+            elif name in self.milestones:
+                self.log(f"    {name:<32} at      {start:6.2f} s")
+            else:
+                self.log(f"    {name:<32} started {start:6.2f} s   took {duration:6.2f} s")
@@ -0,0 +1,39 @@
+import os
+import sys
+import unittest
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from acoustics import AcousticAnalyzer
+
+RATE = 860
+
+class FramesAcrossGapsTest(unittest.TestCase):
+    """Frames must not join samples from both sides of a sampling gap."""
+
+    def samples(self, start, count):
+        times = start + np.arange(count) / RATE
+        return times, np.full(count, 1.65)
+
+    def test_continuous_samples_fill_frames(self):
+        analyzer = AcousticAnalyzer(RATE)
+        times, values = self.samples(0.0, analyzer.frame_len * 3)
+        analyzer.process(times, values, 1.65)
+        self.assertEqual(analyzer.frames, 3)
+        self.assertEqual(analyzer.dropped_samples, 0)
+
+    def test_partial_frame_before_gap_is_dropped(self):
+        analyzer = AcousticAnalyzer(RATE)
+        before = analyzer.frame_len + 5
+        times, values = self.samples(0.0, before)
+        analyzer.process(times, values, 1.65)
+        self.assertEqual(analyzer.frames, 1)
+        # 10 ms pause (a brightness read) before the next batch
+        times, values = self.samples(times[-1] + 0.01, analyzer.frame_len * 2)
+        analyzer.process(times, values, 1.65)
+        self.assertEqual(analyzer.frames, 3)
+        self.assertEqual(analyzer.dropped_samples, 5)
+
+if __name__ == "__main__":
+    unittest.main()
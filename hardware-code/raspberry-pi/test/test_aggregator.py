@@ -0,0 +1,87 @@
+import os
+import random
+import statistics
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from aggregator import FieldStats, WindowAggregator
+
+def stats_of(values):
+    stats = FieldStats()
+    for value in values:
+        stats.add(value)
+    return stats
+
+class FieldStatsTest(unittest.TestCase):
+    """Streaming (Welford) and merged (Chan) statistics against the batch ones."""
+
+    def assert_matches(self, stats, values):
+        present = [v for v in values if v is not None]
+        self.assertEqual(stats.count, len(present))
+        self.assertEqual(stats.missing, len(values) - len(present))
+        self.assertAlmostEqual(stats.mean, statistics.fmean(present), places=9)
+        self.assertAlmostEqual(stats.variance, statistics.pvariance(present), places=9)
+        self.assertEqual(stats.min, min(present))
+        self.assertEqual(stats.max, max(present))
+        self.assertEqual(stats.last, present[-1])
+
+    def test_welford_matches_batch(self):
+        rng = random.Random(1)
+        values = [rng.gauss(25, 3) for _ in range(1000)]
+        self.assert_matches(stats_of(values), values)
+
+    def test_large_offset_keeps_precision(self):
+        # A naive sum of squares loses the variance at this offset
+        rng = random.Random(2)
+        values = [1e9 + rng.uniform(0, 1) for _ in range(1000)]
+        self.assertAlmostEqual(stats_of(values).variance, statistics.pvariance(values), places=6)
+
+    def test_none_is_missing(self):
+        values = [1.0, None, 3.0, None, 5.0]
+        self.assert_matches(stats_of(values), values)
+
+    def test_chan_merge_matches_batch(self):
+        rng = random.Random(3)
+        values = [rng.gauss(60, 8) if rng.random() > 0.1 else None for _ in range(997)]
+        for sizes in ((1, 996), (500, 497), (100, 300, 597), (996, 1)):
+            merged = FieldStats()
+            start = 0
+            for size in sizes:
+                merged.merge(stats_of(values[start:start + size]))
+                start += size
+            self.assert_matches(merged, values)
+
+    def test_merge_with_empty(self):
+        values = [2.0, 4.0, 9.0]
+        merged = FieldStats()
+        merged.merge(FieldStats())
+        merged.merge(stats_of(values))
+        merged.merge(stats_of([None]))
+        self.assert_matches(merged, values + [None])
+        self.assertIsNone(FieldStats().variance)
+        self.assertIsNone(FieldStats().summary()["mean"])
+
+class WindowAggregatorTest(unittest.TestCase):
+    def test_rollup_of_windows_matches_batch(self):
+        rng = random.Random(4)
+        rollup = WindowAggregator(["temp", "sound"])
+        window = WindowAggregator(["temp", "sound"])
+        temps, sounds = [], []
+        for _ in range(6):
+            for _ in range(rng.randint(0, 40)):
+                temp, sound = rng.uniform(20, 30), rng.uniform(0, 80)
+                temps.append(temp)
+                sounds.append(sound)
+                window.add("temp", temp)
+                window.add("sound", sound)
+            rollup.merge(window)
+            window.reset()
+        self.assertEqual(rollup.counts(), {"temp": len(temps), "sound": len(sounds)})
+        self.assertAlmostEqual(rollup.mean("temp"), statistics.fmean(temps), places=9)
+        self.assertAlmostEqual(rollup["sound"].variance, statistics.pvariance(sounds), places=9)
+        self.assertEqual(window.mean("temp", default=-1), -1)
+
+if __name__ == "__main__":
+    unittest.main()
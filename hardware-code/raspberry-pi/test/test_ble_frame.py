@@ -0,0 +1,69 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from ble_frame import DEFAULT_ATT_MTU, FrameDecoder, encode_frame, frame_size, max_samples
+
+def samples(count, hr=60):
+    return [(i * 250, hr, i == 0) for i in range(count)]
+
+class FrameDecoderTest(unittest.TestCase):
+    def setUp(self):
+        self.decoder = FrameDecoder()
+
+    def feed(self, seq, t0, count=3):
+        return self.decoder.decode(encode_frame(seq, t0, samples(count)))
+
+    def test_round_trip(self):
+        decoded = self.feed(7, 1000)
+        self.assertEqual([s["seq"] for s in decoded], [7, 8, 9])
+        self.assertEqual([s["deviceTime"] for s in decoded], [1000, 1250, 1500])
+        self.assertEqual([s["motion"] for s in decoded], [True, False, False])
+        self.assertEqual(self.decoder.lost, 0)
+
+    def test_sequence_gap_counts_lost_samples(self):
+        self.feed(0, 0)
+        self.feed(3, 750)
+        self.feed(9, 2250)   # frame with samples 6-8 never arrived
+        self.assertEqual(self.decoder.lost, 3)
+        self.assertEqual(self.decoder.restarts, 0)
+
+    def test_sequence_wraparound_is_not_a_gap(self):
+        self.feed(0xFFFE, 10_000)
+        decoded = self.feed(1, 10_750)
+        self.assertEqual(decoded[0]["seq"], 1)
+        self.assertEqual(self.decoder.lost, 0)
+        self.feed(7, 12_250)   # and gaps across the wrap still count
+        self.assertEqual(self.decoder.lost, 3)
+
+    def test_restart_after_long_uptime_is_not_loss(self):
+        # seq well past 0x8000, then the ESP32 reboots: seq and millis start over
+        self.feed(40_000, 10_000_000)
+        self.feed(0, 50)
+        self.assertEqual(self.decoder.lost, 0)
+        self.assertEqual(self.decoder.restarts, 1)
+        self.feed(6, 1550)   # loss after the restart is counted from the new sequence
+        self.assertEqual(self.decoder.lost, 3)
+
+    def test_restart_early_is_not_loss(self):
+        self.feed(30, 8000)
+        self.feed(3, 700)
+        self.assertEqual(self.decoder.lost, 0)
+        self.assertEqual(self.decoder.restarts, 1)
+
+    def test_truncated_and_legacy_frames(self):
+        frame = encode_frame(0, 0, samples(3))
+        self.assertEqual(self.decoder.decode(frame[:-1]), [])
+        self.assertEqual(self.decoder.bad_frames, 1)
+        legacy = self.decoder.decode(b'{"heartRate": 72, "motion": true}')
+        self.assertEqual(legacy, [{"seq": None, "deviceTime": None, "heartRate": 72, "motion": True}])
+
+    def test_default_mtu_fits_three_samples(self):
+        self.assertEqual(max_samples(DEFAULT_ATT_MTU), 3)
+        self.assertEqual(frame_size(3), DEFAULT_ATT_MTU - 3)
+        self.assertEqual(len(encode_frame(0, 0, samples(3))), frame_size(3))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import json
+import math
+import os
+import re
+import shutil
+import subprocess
+import sys
+import unittest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, ".."))
+
+from codec import WINDOW_FIELDS, _WINDOW, decode_window, encode_window
+from posture import POSTURES
+
+CODEC_JS = os.path.join(HERE, "..", "..", "..", "dashboard-backend", "codec.js")
+
+SENSOR = {"heartRate": 62.0, "motion": 0.25, "humid": 55.5, "temp": 24.5, "sound": None, "brightness": 1024.0}
+
+def js_strings(source, name):
+    """The string list assigned to `name` in codec.js."""
+    body = re.search(r"const %s = \[(.*?)\]" % name, source, re.S).group(1)
+    return tuple(re.findall(r"'([^']*)'", body))
+
+class WindowCodecTest(unittest.TestCase):
+    def test_round_trip(self):
+        data = encode_window(7, 1000.2, 1009.8, 40, SENSOR, "Left Side", True)
+        self.assertEqual(len(data), 29)
+        window = decode_window(data)
+        self.assertEqual((window["seq"], window["windowStart"], window["windowEnd"]), (7, 1000, 1010))
+        self.assertEqual((window["samples"], window["posture"], window["light"]), (40, "Left Side", True))
+        for name, value in SENSOR.items():
+            self.assertEqual(window[name], value)
+
+    def test_clamps_and_wraps(self):
+        window = decode_window(encode_window(2**32 + 5, 0, 0, 70000, {"brightness": 1e6}, 99, False))
+        self.assertEqual((window["seq"], window["samples"], window["posture"]), (5, 0xFFFF, "Unknown"))
+        self.assertEqual(window["brightness"], 65504.0)
+        self.assertIsNone(window["temp"])
+
+    def test_rejects_other_versions(self):
+        data = bytearray(encode_window(1, 0, 0, 0, {}, 0, False))
+        data[0] = 2
+        with self.assertRaises(ValueError):
+            decode_window(bytes(data))
+
+class DashboardCodecTest(unittest.TestCase):
+    """dashboard-backend/codec.js must read what codec.py writes."""
+
+    @classmethod
+    def setUpClass(cls):
+        if not os.path.exists(CODEC_JS):
+            raise unittest.SkipTest("dashboard-backend/codec.js not found")
+        with open(CODEC_JS) as f:
+            cls.source = f.read()
+
+    def test_same_layout(self):
+        self.assertEqual(js_strings(self.source, "WINDOW_FIELDS"), WINDOW_FIELDS)
+        self.assertEqual(js_strings(self.source, "POSTURES"), POSTURES)
+        # The float16 fields start after the 17-byte header
+        self.assertIn("17 + 2 * i", self.source)
+        self.assertEqual(_WINDOW.size, 17 + 2 * len(WINDOW_FIELDS))
+
+    @unittest.skipUnless(shutil.which("node"), "node not installed")
+    def test_node_decodes_python_windows(self):
+        windows = [
+            encode_window(1, 1000, 1010, 40, SENSOR, "Supine (Face Up)", True),
+            encode_window(2**32 - 1, 1010, 1020, 0, {}, "No person detected", False),
+            encode_window(3, 1020, 1030, 12, {"temp": -3.5, "sound": 0.000123}, 4, False),
+        ]
+        script = (
+            "const { decodeWindow } = require(%s);"
+            "const out = JSON.parse(process.argv[1]).map(h => decodeWindow(Buffer.from(h, 'hex')));"
+            "console.log(JSON.stringify(out));" % json.dumps(os.path.abspath(CODEC_JS))
+        )
+        result = subprocess.run(["node", "-e", script, json.dumps([w.hex() for w in windows])],
+                                capture_output=True, text=True, check=True)
+        for data, js in zip(windows, json.loads(result.stdout)):
+            py = decode_window(data)
+            for key in ("seq", "windowStart", "windowEnd", "samples", "light"):
+                self.assertEqual(js["sensor"][key], py[key], key)
+            self.assertEqual(js["posture"]["posture"], py["posture"])
+            for name in WINDOW_FIELDS:
+                if py[name] is None:
+                    self.assertIsNone(js["sensor"][name], name)
+                    self.assertIn(name, js["sensor"]["missing"])
+                else:
+                    self.assertTrue(math.isclose(js["sensor"][name], py[name], rel_tol=1e-12), name)
+
+if __name__ == "__main__":
+    unittest.main()
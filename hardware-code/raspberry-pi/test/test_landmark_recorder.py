@@ -0,0 +1,23 @@
+import os
+import sys
+import tempfile
+import unittest
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from landmark_recorder import LandmarkRecorder
+
+class SegmentSizeTest(unittest.TestCase):
+    """The size used to stay under max_bytes must match the files written."""
+
+    def test_segment_bytes_match_file_size(self):
+        for landmark_dtype in ("float16", "float32"):
+            with tempfile.TemporaryDirectory() as directory:
+                recorder = LandmarkRecorder(directory, landmark_dtype=landmark_dtype, segment_records=100)
+                recorder.record(np.zeros((33, 4), dtype=np.float32), pose=1, ts=1.7e9)
+                recorder.close()
+                self.assertEqual(recorder._segment_bytes(), os.path.getsize(recorder.path))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,40 @@
+import os
+import sys
+import unittest
+
+# Run against the simulated drivers, from any working directory
+os.environ.setdefault("SLEEPDUCK_DRIVERS", "sim")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import metrics
+
+class RenderBeforeReadingsTest(unittest.TestCase):
+    """/metrics must render while sensors have nothing to report yet."""
+
+    def test_dht_age_before_first_reading(self):
+        import KY15
+        self.assertIsNone(KY15.reader.age())
+        text = metrics.render()
+        self.assertIn("# TYPE sleepduck_dht_reading_age_seconds gauge", text)
+        self.assertNotIn("\nsleepduck_dht_reading_age_seconds ", text)
+
+    def test_sound_dc_offset_before_calibration(self):
+        import KY37
+        self.assertIsNone(KY37.dc_tracker.offset)
+        text = metrics.render()
+        self.assertIn("# TYPE sleepduck_sound_dc_offset_volts gauge", text)
+        self.assertNotIn("\nsleepduck_sound_dc_offset_volts ", text)
+
+    def test_none_values_are_left_out(self):
+        gauge = metrics.gauge("sleepduck_test_unset", "Gauge without a value", fn=lambda: None)
+        labelled = metrics.gauge("sleepduck_test_labelled", "Labelled gauge")
+        labelled.set(None, sensor="a")
+        labelled.set(2, sensor="b")
+        text = metrics.render()
+        self.assertNotIn("\nsleepduck_test_unset ", text)
+        self.assertIn('sleepduck_test_labelled{sensor="b"} 2.0', text)
+        self.assertNotIn('sensor="a"', text)
+        self.assertNotIn(gauge.name, metrics.snapshot())
+
+if __name__ == "__main__":
+    unittest.main()
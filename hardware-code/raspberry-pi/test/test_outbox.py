@@ -0,0 +1,107 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import paho.mqtt.client as mqtt
+from outbox import Outbox, OutboxSender
+
+class FakeInfo:
+    def __init__(self):
+        self.rc = mqtt.MQTT_ERR_SUCCESS
+        self.published = False
+
+    def is_published(self):
+        return self.published
+
+class FakeClient:
+    """Records publishes; PUBACKs arrive when the test says so."""
+
+    def __init__(self):
+        self.published = []   # (topic, payload, info)
+
+    def publish(self, topic, payload, qos=0):
+        info = FakeInfo()
+        self.published.append((topic, payload, info))
+        return info
+
+    def ack_all(self):
+        for _, _, info in self.published:
+            info.published = True
+
+class OutboxReplayTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "outbox.db")
+
+    def open(self):
+        outbox = Outbox(self.path)
+        self.addCleanup(outbox.close)
+        return outbox
+
+    def test_unacked_messages_replay_after_reopen(self):
+        client = FakeClient()
+        outbox = self.open()
+        sender = OutboxSender(client, outbox)
+        sender.connected = True
+        sender.send("sensor/window", b"one")
+        sender.send("sensor/window", b"two")
+        client.published[0][2].published = True   # only the first is acknowledged
+        sender.poll()
+        sender.connected = False
+        sender.send("sound/event", b"three")        # stored while offline
+        self.assertEqual(len(outbox), 2)
+        outbox.close()
+
+        # Restart: a new process opens the same file
+        client = FakeClient()
+        outbox = self.open()
+        self.assertEqual(len(outbox), 2)
+        sender = OutboxSender(client, outbox)
+        sender.connected = True
+        sender.poll()
+        self.assertEqual([(topic, payload) for topic, payload, _ in client.published],
+                         [("sensor/window", b"two"), ("sound/event", b"three")])
+        self.assertEqual(sender.replayed, 2)
+        client.ack_all()
+        sender.poll()
+        self.assertEqual(len(outbox), 0)
+        self.assertEqual(len(self.open()), 0)
+
+    def test_replay_is_batched_and_skips_inflight(self):
+        client = FakeClient()
+        sender = OutboxSender(client, self.open(), batch_size=3)
+        for i in range(7):
+            sender.send("t", bytes([i]))
+        sender.connected = True
+        sender.poll()
+        sender.poll()
+        self.assertEqual([payload for _, payload, _ in client.published], [bytes([i]) for i in range(6)])
+        client.ack_all()
+        sender.poll()
+        sender.poll()
+        self.assertEqual([payload for _, payload, _ in client.published][-1], bytes([6]))
+        self.assertEqual(len(client.published), 7)
+
+    def test_timed_out_publish_is_replayed(self):
+        client = FakeClient()
+        sender = OutboxSender(client, self.open(), inflight_timeout=-1)
+        sender.connected = True
+        sender.send("t", b"lost puback")
+        sender.poll()   # times out and, still in the outbox, is sent again
+        self.assertEqual([payload for _, payload, _ in client.published], [b"lost puback"] * 2)
+        self.assertEqual(sender.failed, 1)
+
+    def test_oldest_evicted_over_limit(self):
+        outbox = Outbox(self.path, max_messages=3)
+        self.addCleanup(outbox.close)
+        for i in range(5):
+            outbox.put("t", bytes([i]))
+        self.assertEqual([payload for _, _, payload in outbox.oldest(10)], [b"\x02", b"\x03", b"\x04"])
+        self.assertEqual(outbox.evicted, 2)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,44 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from ble_frame import encode_frame
+from pipeline import WindowPipeline
+
+PI_SAMPLES = {"brightness": 40.0, "humid": 55.0, "temp": 24.0, "sound": 10.0}
+
+class ChangePublishingTest(unittest.TestCase):
+    def setUp(self):
+        self.sent = []
+        self.pipeline = WindowPipeline(lambda topic, payload: self.sent.append(topic),
+                                       publish_mode="change", heartbeat=3600, log=None)
+        self.seq = 0
+        self.start = 1_000_000.0
+
+    def window(self, postures):
+        """One 10 s window with a notification per posture; returns the window
+        topics published (rollups go out on their own schedule)."""
+        self.sent.clear()
+        for i, posture in enumerate(postures):
+            frame = encode_frame(self.seq, int(self.start * 1000) & 0xFFFFFFFF, [(0, 60, False)])
+            self.seq += 1
+            self.pipeline.add_notification(frame, PI_SAMPLES, posture, ts=self.start + i)
+        self.pipeline.flush(self.start, self.start + 10)
+        self.start += 10
+        return [topic for topic in self.sent if topic in ("sensor", "posture")]
+
+    def test_windows_with_turns_publish_and_quiet_ones_after_them_dont(self):
+        supine = ["Supine (Face Up)"] * 5
+        self.assertEqual(self.window(supine), ["sensor", "posture"])   # first window
+        self.assertEqual(self.window(supine), [])
+        # Rolled over and back: the mode is still supine, but there were turns
+        turned = ["Supine (Face Up)", "Left Side", "Supine (Face Up)", "Supine (Face Up)", "Supine (Face Up)"]
+        self.assertEqual(self.window(turned), ["sensor", "posture"])
+        # Turns dropping back to 0 is not a change
+        self.assertEqual(self.window(supine), [])
+        self.assertEqual(self.pipeline.change_filter.suppressed, 2)
+
+if __name__ == "__main__":
+    unittest.main()
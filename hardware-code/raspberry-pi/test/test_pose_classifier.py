@@ -0,0 +1,82 @@
+import os
+import sys
+import unittest
+from types import SimpleNamespace
+import numpy as np
+
+os.environ.setdefault("SLEEPDUCK_DRIVERS", "sim")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import camera
+from pose_classifier import (Z_MARGIN, SIDE_DX, NOSE, LEFT_SHOULDER, RIGHT_SHOULDER, LEFT_HIP, RIGHT_HIP,
+                             X, Y, Z, VISIBILITY, classify)
+from posture import posture_code
+
+def as_mediapipe(row):
+    """One (33, 4) landmark set in the shape camera.detect_sleep_pose reads."""
+    return SimpleNamespace(landmark=[SimpleNamespace(x=float(x), y=float(y), z=float(z), visibility=float(v))
+                                     for x, y, z, v in row])
+
+class MatchesScalarClassifierTest(unittest.TestCase):
+    """pose_classifier.classify must label every landmark set like camera.detect_sleep_pose."""
+
+    @classmethod
+    def setUpClass(cls):
+        try:
+            camera.load()   # detect_sleep_pose looks the landmark indices up in MediaPipe
+        except ImportError as e:
+            raise unittest.SkipTest(f"MediaPipe not installed: {e}")
+
+    def assert_same(self, landmarks):
+        codes = classify(landmarks)
+        for i, row in enumerate(landmarks):
+            self.assertEqual(int(codes[i]), posture_code(camera.detect_sleep_pose(as_mediapipe(row))),
+                             f"landmark set {i}: {row[[NOSE, LEFT_SHOULDER, RIGHT_SHOULDER, LEFT_HIP, RIGHT_HIP]]}")
+
+    def test_random_landmarks(self):
+        rng = np.random.default_rng(7)
+        landmarks = rng.uniform(-0.5, 1.5, size=(2000, 33, 4))
+        landmarks[:, :, VISIBILITY] = rng.uniform(0, 1, size=(2000, 33))
+        self.assert_same(landmarks)
+
+    def test_recorded_precision(self):
+        # landmark_recorder stores float16 by default
+        rng = np.random.default_rng(8)
+        landmarks = rng.uniform(0, 1, size=(2000, 33, 4)).astype(np.float16)
+        self.assert_same(landmarks)
+
+    def test_coarse_values_hit_every_branch_and_tie(self):
+        # Values on a 0.05 grid land exactly on the thresholds and make
+        # equal shoulder heights common
+        rng = np.random.default_rng(9)
+        landmarks = rng.integers(0, 8, size=(4000, 33, 4)) * 0.05
+        codes = classify(landmarks)
+        self.assertEqual(set(np.unique(codes)), {0, 1, 2, 3, 4})
+        self.assert_same(landmarks)
+
+    def test_threshold_ties(self):
+        base = np.zeros((33, 4))
+        base[:, VISIBILITY] = 1.0
+        cases = []
+        for nose_z in (-Z_MARGIN, Z_MARGIN, 0.0):                # exactly on the depth margins
+            for shoulder_dx in (SIDE_DX, SIDE_DX - 0.01):       # exactly on the width limit
+                for left_y, right_y in ((0.5, 0.5), (0.6, 0.5), (0.5, 0.6)):   # level shoulders
+                    row = base.copy()
+                    row[NOSE, Z] = nose_z
+                    row[LEFT_SHOULDER, X], row[RIGHT_SHOULDER, X] = 0.5, 0.5 + shoulder_dx
+                    row[LEFT_HIP, X], row[RIGHT_HIP, X] = 0.5, 0.5 + shoulder_dx
+                    row[LEFT_SHOULDER, Y], row[RIGHT_SHOULDER, Y] = left_y, right_y
+                    cases.append(row)
+        self.assert_same(np.array(cases))
+
+    def test_missing_and_low_visibility_landmarks(self):
+        rng = np.random.default_rng(10)
+        landmarks = rng.uniform(0, 1, size=(500, 33, 4))
+        landmarks[:100] = 0.0                                   # nobody: all landmarks zero
+        landmarks[100:200, [LEFT_HIP, RIGHT_HIP]] = 0.0         # hips out of frame
+        landmarks[200:300, :, VISIBILITY] = 0.0                 # nothing visible
+        landmarks[300:400, :, VISIBILITY] = rng.uniform(0, 0.4, size=(100, 33))   # below vis_threshold
+        self.assert_same(landmarks)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from ble_frame import encode_frame
+from recorder import Recorder, read_records, KIND_WINDOW
+from replay import LocalBroker, replay
+
+ACOUSTICS = {"leq": 41.5, "lmax": 63.0, "peak": 0.2, "zcr": 120.0, "bands": {}, "noiseEvents": 1,
+             "snoreEvents": 0, "seconds": 10.0}
+EVENT = {"type": "noise", "start": 1003.0, "end": 1004.5, "peakDb": 63.0}
+
+class ReplayWindowInputsTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "night.rec")
+
+    def record(self):
+        recorder = Recorder(self.path)
+        for i in range(9):
+            recorder.sample("temp", 24.0, ts=1000.5 + i)
+            recorder.notification(encode_frame(i, i * 1000, [(0, 60, False)]), ts=1000.6 + i)
+        recorder.window(1000.5, 1010, True, (ACOUSTICS, [EVENT]), ts=1010.01)
+        recorder.notification(encode_frame(9, 10_000, [(0, 61, False)]), ts=1010.5)
+        recorder.window(1010, 1020, False, (None, []), ts=1020.01)
+        recorder.close()
+
+    def test_window_records_round_trip(self):
+        self.record()
+        windows = [payload for kind, _, payload in read_records(self.path) if kind == KIND_WINDOW]
+        self.assertEqual(windows[0], {"start": 1000.5, "end": 1010, "light": True,
+                                      "acoustics": ACOUSTICS, "events": [EVENT]})
+        self.assertIsNone(windows[1]["acoustics"])
+
+    def test_replay_publishes_recorded_acoustics_and_events(self):
+        self.record()
+        broker = LocalBroker(keep_messages=True)
+        summary = replay(self.path, speed=0, broker=broker)
+        self.assertEqual(summary["windows"], 2)
+        sensor = [json.loads(payload) for topic, payload in broker.messages if topic == "sensor"]
+        self.assertEqual(sensor[0]["acoustics"], ACOUSTICS)
+        self.assertTrue(sensor[0]["light"])
+        self.assertNotIn("acoustics", sensor[1])
+        self.assertFalse(sensor[1]["light"])
+        events = [json.loads(payload) for topic, payload in broker.messages if topic == "sound/event"]
+        self.assertEqual(events, [EVENT])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,43 @@
+import os
+import sys
+import tempfile
+import unittest
+
+os.environ.setdefault("SLEEPDUCK_DRIVERS", "sim")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from KY37 import DCOffsetTracker
+
+class DCOffsetTrackerTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.tracker = DCOffsetTracker(os.path.join(directory.name, "cal.json"), time_constant=600)
+        self.tracker.offset = 1.65
+
+    def feed(self, mean, seconds, batch=0.05):
+        for _ in range(int(round(seconds / batch))):
+            self.tracker.observe(mean, 0.01, batch)
+
+    def test_short_shift_barely_moves_offset(self):
+        # A few seconds of shifted but "quiet" batches (e.g. a low hum)
+        self.feed(1.95, 5)
+        self.assertLess(self.tracker.offset - 1.65, 0.003)
+
+    def test_follows_slow_drift(self):
+        self.feed(1.70, 1800)
+        self.assertAlmostEqual(self.tracker.offset, 1.70, delta=0.003)
+
+    def test_independent_of_batch_size(self):
+        self.feed(1.70, 600, batch=0.05)
+        small = self.tracker.offset
+        self.tracker.offset = 1.65
+        self.feed(1.70, 600, batch=0.5)
+        self.assertAlmostEqual(small, self.tracker.offset, places=6)
+
+    def test_loud_windows_are_ignored(self):
+        self.tracker.observe(2.5, 0.5, 0.05)
+        self.assertEqual(self.tracker.offset, 1.65)
+
+if __name__ == "__main__":
+    unittest.main()